@@ -1,32 +1,509 @@
 import json
-import azure_impl.storage_impl as storage_impl
-
-
-# Função para carregar e agregar os dados de um arquivo JSON
-def load_and_aggregate(file_paths):
-    aggregated_simulations = []
-    for file_path in file_paths:
-        storage_impl.get_file_from_container('temp', file_path, f'src/files/temp/{file_path}')
-        with open(f'src/files/temp/{file_path}', 'r') as f:
-            data = json.load(f)
-            aggregated_simulations.extend(data["simulations"])
-        
-        
-    return aggregated_simulations
-
-def aggregate_and_save(input_files):
-    # Carregar e agregar os dados dos arquivos
-    aggregated_simulations = load_and_aggregate(input_files)
-
-    # Salvar os dados agregados em um novo arquivo JSON
-    with open('src/files/output/monte_carlo_result_aggregated.json', 'w') as f:
-        json.dump({"simulations": aggregated_simulations}, f, indent=4)
-     
-    input_container_name = 'output'
-    storage_impl.create_container_if_not_exists(input_container_name)  # Use the new function   
-    storage_impl.upload_file_to_container('output', 'src/files/output/monte_carlo_result_aggregated.json')
-
-    print(f"Dados agregados salvos em aggregated_monte_carlo_input.json")
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+import config
+import tracing
+from backend import storage_impl
+from client import iter_simulations
+
+logger = logging.getLogger(__name__)
+
+# Gregas calculadas por montecarlo_app, na ordem dos seus estimadores
+GREEKS = ('delta', 'gamma', 'vega')
+
+
+def merge_quantile_sketches(sketches: list, counts: list) -> dict:
+    """
+    Merges quantile sketches of disjoint samples.
+
+    Each sketch defines a piecewise-linear distribution between its quantiles; the merged sketch holds
+    the quantiles of their mixture, weighted by the number of samples of each sketch.
+
+    Args:
+        sketches (list): The sketches, each with 'probabilities' and 'values'.
+        counts (list): The number of samples summarized by each sketch.
+
+    Returns:
+        dict: The merged sketch, on the probabilities of the first sketch.
+    """
+    probabilities = np.asarray(sketches[0]['probabilities'])
+    cdfs = []
+    for sketch in sketches:
+        quantiles = np.asarray(sketch['values'])
+        # Em valores repetidos, a distribuição acumulada vale a maior probabilidade do valor
+        unique, last = np.unique(quantiles[::-1], return_index=True)
+        cdfs.append((unique, np.asarray(sketch['probabilities'])[len(quantiles) - 1 - last]))
+    points = np.unique(np.concatenate([unique for unique, _ in cdfs]))
+    cdf = sum(count * np.interp(points, unique, cumulative, left=0.0, right=1.0) for (unique, cumulative), count in zip(cdfs, counts))
+    return {
+        'probabilities': probabilities.tolist(),
+        'values': np.interp(probabilities, cdf / sum(counts), points).tolist()
+    }
+
+
+def merge_moments(moments: list) -> tuple:
+    """
+    Merges the count, sum and M2 (sum of squared deviations from the mean) of disjoint samples.
+
+    The M2 of each pair is combined with the update of Chan et al., which stays exact when the
+    variance is small relative to the mean (unlike a sum of squares).
+
+    Args:
+        moments (list): The (count, sum, M2) of each sample; sums and M2 may be arrays.
+
+    Returns:
+        tuple: The count, sum and M2 of the union of the samples.
+    """
+    count, total, m2 = moments[0][0], np.asarray(moments[0][1]), np.asarray(moments[0][2])
+    for other_count, other_total, other_m2 in moments[1:]:
+        other_total, other_m2 = np.asarray(other_total), np.asarray(other_m2)
+        delta = other_total / other_count - total / count
+        m2 = m2 + other_m2 + delta**2 * count * other_count / (count + other_count)
+        count, total = count + other_count, total + other_total
+    return count, total, m2
+
+
+def merge_greeks(greeks: list, discount_factor: float) -> dict:
+    """
+    Merges the greeks of the path-range shards of a simulation from the count, sum and M2 of their estimators.
+
+    Args:
+        greeks (list): The 'greeks' results of each shard.
+        discount_factor (float): The discount factor of the simulation.
+
+    Returns:
+        dict: The greeks of the whole simulation, with their values and standard errors.
+    """
+    count, total, m2 = merge_moments([(item['count'], item['sum'], item['m2']) for item in greeks])
+    merged = {'method': greeks[0]['method'], 'count': count, 'sum': total.tolist(), 'm2': m2.tolist()}
+    for i, name in enumerate(GREEKS):
+        merged[name] = {
+            'value': float(discount_factor * total[i] / count),
+            'std_error': float(discount_factor * np.sqrt(m2[i] / count / count)),
+        }
+    return merged
+
+
+def merge_exposure_sketches(sketches: list) -> dict:
+    """
+    Merges the per-date exposure sketches of disjoint samples by adding their bin counts.
+
+    The merge is exact, so the merged sketch is the sketch of the whole sample whatever the
+    number of path ranges it was split into.
+
+    Args:
+        sketches (list): The sketches, each with 'relative_accuracy', 'min_value' and per-date
+            'zero_count', 'offset' (index of the first bin) and 'counts'.
+
+    Returns:
+        dict: The merged sketch.
+    """
+    merged = {**sketches[0], 'zero_count': [], 'offset': [], 'counts': []}
+    for date in range(len(sketches[0]['counts'])):
+        merged['zero_count'].append(sum(sketch['zero_count'][date] for sketch in sketches))
+        bins = [(sketch['offset'][date], sketch['counts'][date]) for sketch in sketches if sketch['counts'][date]]
+        if not bins:
+            merged['offset'].append(0)
+            merged['counts'].append([])
+            continue
+        offset = min(first for first, _ in bins)
+        counts = np.zeros(max(first + len(counts) for first, counts in bins) - offset, dtype=np.int64)
+        for first, bin_counts in bins:
+            counts[first - offset:first - offset + len(bin_counts)] += bin_counts
+        merged['offset'].append(offset)
+        merged['counts'].append(counts.tolist())
+    return merged
+
+
+def exposure_sketch_quantiles(sketch: dict, quantile: float) -> list:
+    """
+    Computes a quantile of each date from an exposure sketch.
+
+    The result is the representative value of the bin holding the sample of rank
+    floor(quantile * (n - 1)), within the relative accuracy of the sketch of that sample.
+
+    Args:
+        sketch (dict): The exposure sketch (see merge_exposure_sketches).
+        quantile (float): The quantile.
+
+    Returns:
+        list: The quantile of each date.
+    """
+    gamma = (1 + sketch['relative_accuracy']) / (1 - sketch['relative_accuracy'])
+    values = []
+    for zero_count, offset, counts in zip(sketch['zero_count'], sketch['offset'], sketch['counts']):
+        rank = np.floor(quantile * (zero_count + sum(counts) - 1))
+        if rank < zero_count:
+            values.append(0.0)
+            continue
+        i = int(np.searchsorted(zero_count + np.cumsum(counts), rank, side='right'))
+        values.append(float(2 * gamma ** (offset + i) / (gamma + 1)))
+    return values
+
+
+def merge_exposure_profiles(profiles: list, params: dict) -> dict:
+    """
+    Merges the exposure profiles of the path-range shards of a simulation and recomputes EE, PFE and CVA.
+
+    Args:
+        profiles (list): The 'exposure' results of each shard, on the same time grid.
+        params (dict): The simulation parameters (rate, PFE quantiles, hazard rate and recovery rate).
+
+    Returns:
+        dict: The exposure profile of the whole simulation.
+    """
+    count, total, m2 = merge_moments([(profile['count'], profile['sum'], profile['m2']) for profile in profiles])
+    times = np.asarray(profiles[0]['times'])
+    sketch = merge_exposure_sketches([profile['sketch'] for profile in profiles])
+
+    expected_exposure = total / count
+    discounted_expected_exposure = expected_exposure * np.exp(-params['risk_free_rate'] * times)
+    merged = {
+        'times': times.tolist(),
+        'count': count,
+        'sum': total.tolist(),
+        'm2': m2.tolist(),
+        'max': np.max([profile['max'] for profile in profiles], axis=0).tolist(),
+        'sketch': sketch,
+        'expected_exposure': expected_exposure.tolist(),
+        'discounted_expected_exposure': discounted_expected_exposure.tolist(),
+        'pfe': {
+            quantile: exposure_sketch_quantiles(sketch, float(quantile))
+            for quantile in profiles[0]['pfe']
+        },
+    }
+    if params.get('hazard_rate') is not None:
+        # CVA unilateral: (1 - R) * soma de DF(t_i) * EE(t_i) * PD(t_{i-1}, t_i)
+        survival = np.exp(-np.cumsum(np.asarray(params['hazard_rate'], dtype=float) * np.diff(times, prepend=0.0)))
+        default_probability = -np.diff(survival, prepend=1.0)
+        merged['cva'] = float((1 - params.get('recovery_rate', 0.4)) * np.dot(discounted_expected_exposure, default_probability))
+    return merged
+
+
+def merge_statistics(statistics: list) -> dict:
+    """
+    Merges the sufficient statistics (count, sum, M2, min/max and quantile sketch) of disjoint samples.
+
+    Args:
+        statistics (list): The statistics of each sample.
+
+    Returns:
+        dict: The statistics of the union of the samples.
+    """
+    count, total, m2 = merge_moments([(item['count'], item['sum'], item['m2']) for item in statistics])
+    merged = {
+        'count': count,
+        'sum': float(total),
+        'm2': float(m2),
+        'min': min(item['min'] for item in statistics),
+        'max': max(item['max'] for item in statistics),
+    }
+    if all('quantile_sketch' in item for item in statistics):
+        merged['quantile_sketch'] = merge_quantile_sketches(
+            [item['quantile_sketch'] for item in statistics],
+            [item['count'] for item in statistics]
+        )
+    return merged
+
+
+def merge_shard_group(group: list) -> dict:
+    """
+    Merges the path-range shards of one simulation back into a single simulation.
+
+    Args:
+        group (list): The shards of the simulation.
+
+    Returns:
+        dict: The merged simulation.
+    """
+    group = sorted(group, key=lambda shard: shard['parameters']['path_range'][0])
+    params = {key: value for key, value in group[0]['parameters'].items() if key != 'path_range'}
+
+    discount_factor = np.exp(-params['risk_free_rate'] * params['time_to_maturity'])
+    if all('statistics' in shard['results'] for shard in group):
+        # Resultados compactos: as estatísticas suficientes das faixas são combinadas (M2 pela fórmula de Chan)
+        statistics = merge_statistics([shard['results']['statistics'] for shard in group])
+        count = statistics['count']
+        mean = statistics['sum'] / count
+        variance = statistics['m2'] / count
+        results = {'statistics': statistics}
+        if all('raw_payoffs' in shard['results'] for shard in group):
+            results['raw_payoffs'] = [shard['results']['raw_payoffs'] for shard in group]
+        weights = [shard['results']['statistics']['count'] for shard in group]
+    else:
+        # As faixas são fatias consecutivas da mesma simulação: basta concatenar os valores e recalcular as estatísticas
+        option_values = np.concatenate([shard['results']['option_values'] for shard in group])
+        count = len(option_values)
+        mean = np.mean(option_values)
+        variance = np.var(option_values)
+        results = {'option_values': option_values.tolist()}
+        weights = [len(shard['results']['option_values']) for shard in group]
+
+    expected_option_value = mean * discount_factor
+    std_error = np.sqrt(variance / count)
+    results = {
+        'expected_option_value': expected_option_value,
+        'confidence_interval': [expected_option_value - 1.96 * std_error, expected_option_value + 1.96 * std_error],
+        **results
+    }
+    if all('greeks' in shard['results'] for shard in group):
+        results['greeks'] = merge_greeks([shard['results']['greeks'] for shard in group], discount_factor)
+    if all('exposure' in shard['results'] for shard in group):
+        results['exposure'] = merge_exposure_profiles([shard['results']['exposure'] for shard in group], params)
+    if all('variance_reduction_factor' in shard['results'] for shard in group):
+        results['variance_reduction_factor'] = float(np.average([shard['results']['variance_reduction_factor'] for shard in group], weights=weights))
+
+    simulation = {key: value for key, value in group[0].items() if key != 'shard_count'}
+    return {**simulation, 'parameters': params, 'results': results}
+
+
+class ShardMerger:
+    """
+    Holds back the path-range shards of simulations until every shard of the simulation was read.
+    """
+
+    def __init__(self):
+        self.pending = {}
+
+    def add(self, simulation: dict) -> list:
+        """
+        Adds a simulation read from a result part.
+
+        Args:
+            simulation (dict): The simulation (or path-range shard).
+
+        Returns:
+            list: The simulations that are complete after this one: the simulation itself if it was
+                not split, the merged simulation if this was its last shard, or nothing.
+        """
+        if simulation['parameters'].get('path_range') is None:
+            return [simulation]
+        group = self.pending.setdefault(simulation['simulation_index'], [])
+        group.append(simulation)
+        if len(group) == simulation.get('shard_count', 0):
+            return [merge_shard_group(self.pending.pop(simulation['simulation_index']))]
+        return []
+
+    def finish(self):
+        """
+        Checks that no simulation is still waiting for path-range shards.
+
+        A missing shard (e.g. a lost result part) would make the merged price and standard error
+        those of a subset of the paths, so it is an error rather than a partial merge.
+
+        Raises:
+            ValueError: If the shards of some simulation are missing.
+        """
+        missing = []
+        for simulation_index, group in sorted(self.pending.items()):
+            ranges = sorted(tuple(shard['parameters']['path_range']) for shard in group)
+            missing.append(f"simulation_index {simulation_index}: {group[0].get('shard_count', '?')} shards expected, "
+                           f"{len(group)} read (path ranges {ranges})")
+        if missing:
+            raise ValueError('Missing path-range shards: ' + '; '.join(missing))
+
+
+def iter_part_simulations(file_paths):
+    """
+    Downloads the result parts concurrently and streams their simulations in part order.
+
+    Args:
+        file_paths (list): The names of the result parts in the 'temp' container.
+
+    Yields:
+        dict: The simulations of each part, in order.
+    """
+    download_paths = [f'src/files/temp/{file_path}' for file_path in file_paths]
+    for download_path in storage_impl.get_files_from_container('temp', file_paths, download_paths):
+        yield from iter_simulations(download_path, {})
+
+
+class ResultAggregator:
+    """
+    Incremental writer for monte_carlo_result_aggregated.json.
+
+    Parts are downloaded and merged as they arrive, so they can be added while other Batch tasks
+    are still running. The aggregated file is written (and uploaded in blocks to the 'output'
+    container) in input order (simulation_index) as it is read: each simulation is written as soon
+    as every simulation before it was, and only the simulations that arrive ahead of that cursor are
+    spooled to a temporary file, with just their position in the spool kept in memory. Cache hits
+    are written when the aggregator is opened, so they do not hold back the cursor.
+    """
+
+    def __init__(self, cache=None, output_file: str = 'src/files/output/monte_carlo_result_aggregated.json'):
+        """
+        Args:
+            cache (ResultCache): Optional result cache; new results are stored and hits are appended.
+            output_file (str): The path of the local aggregated file.
+        """
+        self.cache = cache
+        self.output_file = output_file
+        self.cache_sidecar_file = 'src/files/temp/monte_carlo_result_cache.npy'
+        self.sidecars = {}
+        self.merger = ShardMerger()
+        self.count = 0
+        self.downloads = []
+        # Próximo simulation_index a gravar e posição (offset, tamanho) das simulações que chegaram antes dele
+        self.next_index = 0
+        self.spooled = {}
+
+    def __enter__(self):
+        input_container_name = 'output'
+        storage_impl.create_container_if_not_exists(input_container_name)  # Use the new function
+
+        self.stack = ExitStack()
+        self.stack.enter_context(tracing.span('aggregate', 'aggregate', output_file=self.output_file))
+        self.spool = self.stack.enter_context(tempfile.TemporaryFile(dir=os.path.dirname(os.path.abspath(self.output_file))))
+        self.executor = self.stack.enter_context(ThreadPoolExecutor(max_workers=config.TRANSFER_CONCURRENCY))
+
+        try:
+            # O upload em blocos começa com a primeira parte, enquanto as demais ainda são lidas
+            self.file = self.stack.enter_context(open(self.output_file, 'wb'))
+            self.uploader = self.stack.enter_context(storage_impl.BlockBlobUploader('output', os.path.basename(self.output_file)))
+            self._write('{"simulations":[')
+
+            # Resultados encontrados no cache, que não foram enviados ao Batch
+            if self.cache is not None:
+                self._write_cache_hits()
+        except BaseException:
+            self.stack.__exit__(*sys.exc_info())
+            raise
+        return self
+
+    def _write(self, data):
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        self.file.write(data)
+        self.uploader.write(data)
+
+    def _raw_payoffs(self, reference) -> np.ndarray:
+        # Payoffs brutos de uma simulação (ou das suas faixas), lidos dos .npy das partes no container 'temp'
+        references = reference if isinstance(reference, list) else [reference]
+        arrays = []
+        for item in references:
+            if item['file'] not in self.sidecars:
+                download_path = storage_impl.get_file_from_container('temp', item['file'], f"src/files/temp/{item['file']}")
+                self.sidecars[item['file']] = np.load(download_path, mmap_mode='r')
+            arrays.append(self.sidecars[item['file']][item['offset']:item['offset'] + item['count']])
+        return np.concatenate(arrays)
+
+    def _write_simulation(self, simulation: dict):
+        # Resultados recém-calculados entram no cache, com os payoffs brutos copiados para o próprio cache
+        if self.cache is not None and 'cache_key' in simulation:
+            raw_payoffs = simulation['results'].get('raw_payoffs')
+            self.cache.put(simulation, self._raw_payoffs(raw_payoffs) if raw_payoffs is not None else None)
+        data = json.dumps(simulation, separators=(',', ':')).encode('utf-8')
+        index = simulation.get('simulation_index', self.next_index)
+        if index != self.next_index:
+            # Chegou antes de uma simulação anterior (LPT, partes fora de ordem): espera no arquivo temporário
+            self.spool.seek(0, os.SEEK_END)
+            self.spooled[index] = (self.spool.tell(), len(data))
+            self.spool.write(data)
+            return
+        self._write_output(data)
+        self.next_index += 1
+        while self.next_index in self.spooled:
+            self._write_output(self._read_spooled(self.next_index))
+            self.next_index += 1
+
+    def _write_output(self, data: bytes):
+        self._write((b',' if self.count else b'') + data)
+        self.count += 1
+
+    def _read_spooled(self, index: int) -> bytes:
+        offset, size = self.spooled.pop(index)
+        self.spool.seek(offset)
+        return self.spool.read(size)
+
+    def _write_cache_hits(self):
+        # Os payoffs brutos dos acertos vão para um .npy próprio no container 'temp', referenciado como os das partes
+        with tempfile.TemporaryFile(dir=os.path.dirname(os.path.abspath(self.cache_sidecar_file))) as payoffs:
+            offset = 0
+            for simulation, raw_payoffs in self.cache.iter_hits():
+                if raw_payoffs is not None:
+                    payoffs.write(raw_payoffs.astype(np.float32).tobytes())
+                    simulation['results']['raw_payoffs'] = {'file': os.path.basename(self.cache_sidecar_file), 'offset': offset, 'count': len(raw_payoffs)}
+                    offset += len(raw_payoffs)
+                self._write_simulation(simulation)
+            if offset:
+                payoffs.seek(0)
+                with open(self.cache_sidecar_file, 'wb') as file:
+                    np.lib.format.write_array_header_1_0(file, {'descr': np.dtype(np.float32).str, 'fortran_order': False, 'shape': (offset,)})
+                    shutil.copyfileobj(payoffs, file)
+                storage_impl.upload_file_to_container('temp', self.cache_sidecar_file)
+
+    def _finish_output(self):
+        # Simulações que seguem faltando uma anterior (índices não contíguos na entrada, parte ausente) vão ao final,
+        # em ordem de simulation_index
+        for index in sorted(self.spooled):
+            self._write_output(self._read_spooled(index))
+        self._write(b']}')
+
+    def write_simulations(self, simulations):
+        """
+        Writes simulations read from result parts, merging path-range shards.
+
+        Args:
+            simulations (Iterable[dict]): The simulations.
+        """
+        for simulation in simulations:
+            for merged in self.merger.add(simulation):
+                self._write_simulation(merged)
+
+    def add_part(self, file_name: str):
+        """
+        Starts downloading a result part from the 'temp' container and writes every part
+        whose download already finished, in the order they were added.
+
+        Args:
+            file_name (str): The name of the result part.
+        """
+        download_path = f'src/files/temp/{file_name}'
+        self.downloads.append(self.executor.submit(storage_impl.get_file_from_container, 'temp', file_name, download_path))
+        self._drain(wait=False)
+
+    def wait_for_parts(self):
+        """
+        Writes every part added so far, waiting for the downloads that are still running.
+        """
+        self._drain(wait=True)
+
+    def _drain(self, wait: bool):
+        while self.downloads and (wait or self.downloads[0].done()):
+            download_path = self.downloads.pop(0).result()
+            self.write_simulations(iter_simulations(download_path, {}))
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            # O upload em blocos é descartado sem confirmar a lista de blocos
+            self.stack.__exit__(exc_type, exc_value, traceback)
+            return False
+
+        with self.stack:
+            self._drain(wait=True)
+            # Uma parte perdida deixaria uma simulação dividida com só parte dos caminhos: o agregado não é enviado
+            self.merger.finish()
+            self._finish_output()
+
+        if self.cache is not None:
+            removed = self.cache.evict()
+            logger.info(f'Result cache: {self.cache.report()} - {removed} entries evicted')
+
+        print(f"Dados agregados salvos em {self.output_file}")
+        return False
+
+
+def aggregate_and_save(input_files, cache=None):
+    # As simulações de cada parte são lidas e reunidas à medida que são baixadas, sem manter as partes inteiras em
+    # memória, e gravadas na ordem da entrada no arquivo local e no container 'output'
+    with ResultAggregator(cache) as aggregator:
+        aggregator.write_simulations(iter_part_simulations(input_files))
 
 def main():
     # Exemplo de uso
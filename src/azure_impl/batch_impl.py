@@ -1,6 +1,7 @@
 import logging
 import azure.batch.models as batchmodels
 import config
+import tracing
 from azure.batch import BatchServiceClient
 import datetime
 import sys
@@ -19,12 +20,18 @@ BATCH_CLIENT = BatchServiceClient(
     )
     
 
-def create_pool(pool_id: str):
+@tracing.traced('pool', 'pool_id')
+def create_pool(pool_id: str, node_count: int = config.POOL_NODE_COUNT, autoscale_formula: str = None, low_priority_node_count: int = 0):
     """
     Creates a pool with the specified pool ID.
 
+    If the pool already exists, it is resized to node_count, or its autoscale formula is replaced.
+
     Args:
         pool_id (str): The ID of the pool to be created.
+        node_count (int): The number of dedicated nodes (ignored when autoscale_formula is given).
+        autoscale_formula (str): Optional autoscale formula (see pool_planner.autoscale_formula).
+        low_priority_node_count (int): The number of low-priority nodes (ignored when autoscale_formula is given).
 
     Returns:
         None
@@ -41,16 +48,25 @@ def create_pool(pool_id: str):
         node_agent_sku_id="batch.node.ubuntu 20.04"
     )
 
-    start_task = batchmodels.StartTask(
-        command_line= """
+    application_version = get_lastest_version_batch_application(config.APP_ID)
+
+    if config.NODE_RUNTIME == 'wheelhouse':
+        # Runtime pré-compilado no pacote de aplicação, instalado uma única vez no diretório compartilhado do nó
+        package_dir = application_package_dir(config.APP_ID, application_version)
+        command_line = f"/bin/bash -c 'bash {package_dir}/setup_runtime.sh {package_dir}'"
+    else:
+        command_line = """
 /bin/bash -c '
 sudo -S apt-get update &&
 sudo -S apt-get install -y python3 python3-pip &&
-pip3 install numpy azure-storage-blob==12.8.1 &&
+pip3 install numpy scipy azure-storage-blob==12.8.1 &&
 env > env.txt &&
 python3 --version > python-version.txt
 '
-""",
+"""
+
+    start_task = batchmodels.StartTask(
+        command_line=command_line,
         user_identity=batchmodels.UserIdentity(
             auto_user=batchmodels.AutoUserSpecification(
                 scope=batchmodels.AutoUserScope.pool,
@@ -62,16 +78,31 @@ python3 --version > python-version.txt
 
     application_package_references= [batchmodels.ApplicationPackageReference(
             application_id=config.APP_ID,
-            version=get_lastest_version_batch_application(config.APP_ID)
+            version=application_version
     )]
     
+    # Tamanho fixo ou fórmula de autoscale
+    if autoscale_formula is None:
+        scale_settings = {'target_dedicated_nodes': node_count, 'target_low_priority_nodes': low_priority_node_count}
+    else:
+        scale_settings = {
+            'enable_auto_scale': True,
+            'auto_scale_formula': autoscale_formula,
+            'auto_scale_evaluation_interval': config.POOL_AUTOSCALE_EVALUATION_INTERVAL
+        }
+
     new_pool = batchmodels.PoolAddParameter(
         id=pool_id,
         virtual_machine_configuration=virtual_machine_configuration,
         vm_size=config.POOL_VM_SIZE,
-        target_dedicated_nodes=config.POOL_NODE_COUNT,
         start_task=start_task,
-        application_package_references=application_package_references
+        application_package_references=application_package_references,
+        # Uma tarefa por slot: cada tarefa usa POOL_CORES_PER_TASK núcleos da VM
+        task_slots_per_node=config.POOL_TASK_SLOTS_PER_NODE,
+        task_scheduling_policy=batchmodels.TaskSchedulingPolicy(
+            node_fill_type=batchmodels.ComputeNodeFillType(config.POOL_TASK_SCHEDULING)
+        ),
+        **scale_settings
     )
     
     try:
@@ -79,13 +110,50 @@ python3 --version > python-version.txt
     except batchmodels.BatchErrorException as err:
         if err.error.code == "PoolExists":
             logger.info(f"Pool already exists.")
-            pass
+            scale_pool(pool_id, node_count, autoscale_formula, low_priority_node_count)
         else:
             raise
     finally:
         print()
         
 
+def scale_pool(pool_id: str, node_count: int, autoscale_formula: str = None, low_priority_node_count: int = 0):
+    """
+    Applies a fixed size or an autoscale formula to an existing pool.
+
+    Args:
+        pool_id (str): The ID of the pool.
+        node_count (int): The number of dedicated nodes (ignored when autoscale_formula is given).
+        autoscale_formula (str): Optional autoscale formula.
+        low_priority_node_count (int): The number of low-priority nodes (ignored when autoscale_formula is given).
+
+    Returns:
+        None
+    """
+    pool = BATCH_CLIENT.pool.get(pool_id)
+
+    if autoscale_formula is not None:
+        logger.info(f'Enabling autoscale on pool [{pool_id}]...')
+        BATCH_CLIENT.pool.enable_auto_scale(
+            pool_id,
+            auto_scale_formula=autoscale_formula,
+            auto_scale_evaluation_interval=config.POOL_AUTOSCALE_EVALUATION_INTERVAL
+        )
+        return
+
+    if pool.enable_auto_scale:
+        BATCH_CLIENT.pool.disable_auto_scale(pool_id)
+
+    if pool.target_dedicated_nodes != node_count or (pool.target_low_priority_nodes or 0) != low_priority_node_count:
+        logger.info(f'Resizing pool [{pool_id}] to {node_count} dedicated and {low_priority_node_count} low-priority nodes...')
+        BATCH_CLIENT.pool.resize(pool_id, batchmodels.PoolResizeParameter(
+            target_dedicated_nodes=node_count,
+            target_low_priority_nodes=low_priority_node_count,
+            node_deallocation_option=batchmodels.ComputeNodeDeallocationOption.task_completion
+        ))
+
+
+@tracing.traced('pool', 'job_id')
 def create_job(job_id: str, pool_id: str):
     """
     Creates a job with the specified job ID and associates it with the specified pool ID.
@@ -132,6 +200,67 @@ def list_batch_application():
         raise
     
      
+def application_package_dir(application_id: str, application_version: str) -> str:
+    """
+    Returns the environment variable with the directory of an application package on the nodes.
+
+    Args:
+        application_id (str): The ID of the application.
+        application_version (str): The version of the application.
+
+    Returns:
+        str: The environment variable reference (expanded by the shell on the node).
+    """
+    return f'$AZ_BATCH_APP_PACKAGE_{application_id}_{application_version.replace(".", "_")}'
+
+
+def report_start_task_durations(pool_id: str):
+    """
+    Logs how long the start task took on each node of the pool.
+
+    Args:
+        pool_id (str): The ID of the pool.
+
+    Returns:
+        list: One dict per node with 'node_id', 'state' and 'seconds' (None while the start task runs).
+    """
+    report = []
+    node_list_options = batchmodels.ComputeNodeListOptions(select='id,allocationTime,startTaskInfo')
+    for node in BATCH_CLIENT.compute_node.list(pool_id, compute_node_list_options=node_list_options):
+        info = node.start_task_info
+        seconds = None
+        if info is not None and info.start_time is not None and info.end_time is not None:
+            seconds = (info.end_time - info.start_time).total_seconds()
+            # Alocação do nó até o início da StartTask, e a StartTask (instalação do runtime)
+            tracing.add_span('node_allocation', 'pool', node.allocation_time, info.start_time, lane=node.id)
+            tracing.add_span('start_task', 'start_task', info.start_time, info.end_time, lane=node.id)
+        report.append({'node_id': node.id, 'state': info.state if info is not None else None, 'seconds': seconds})
+        logger.info(f'Start task on node [{node.id}]: {report[-1]["state"]} - {seconds} s')
+    return report
+
+
+def trace_task_execution(job_id: str, task_ids: list):
+    """
+    Adds the queueing and compute time of each task, measured by Batch, to the trace of the run.
+
+    Args:
+        job_id (str): The ID of the job.
+        task_ids (list): The IDs of the tasks of the run.
+
+    Returns:
+        None
+    """
+    task_ids = set(task_ids)
+    task_list_options = batchmodels.TaskListOptions(select='id,creationTime,executionInfo,nodeInfo')
+    for task in BATCH_CLIENT.task.list(job_id, task_list_options=task_list_options):
+        if task.id not in task_ids or task.execution_info is None:
+            continue
+        node_id = task.node_info.node_id if task.node_info else 'unassigned'
+        tracing.add_span('queued', 'queue', task.creation_time, task.execution_info.start_time, lane=node_id, task_id=task.id)
+        tracing.add_span('compute', 'compute', task.execution_info.start_time, task.execution_info.end_time, lane=node_id,
+                         task_id=task.id, exit_code=task.execution_info.exit_code)
+
+
 def get_lastest_version_batch_application(application_id: str):
     """
     Gets the latest version of the specified batch application.
@@ -154,6 +283,7 @@ def get_lastest_version_batch_application(application_id: str):
         raise
     
 
+@tracing.traced('submit', 'job_id')
 def add_tasks(job_id: str, resource_input_files: list, timestap: int):
     """
     Adds tasks to the specified job.
@@ -164,24 +294,33 @@ def add_tasks(job_id: str, resource_input_files: list, timestap: int):
         timestap (int): The timestamp to be used in task IDs.
 
     Returns:
-        None
+        list: The IDs of the tasks, in the order of the input files.
     """
     application_id=config.APP_ID
     application_version = get_lastest_version_batch_application(application_id)
         
-    env_application_package_dir = f'$AZ_BATCH_APP_PACKAGE_{application_id}_{application_version.replace(".", "_")}'
+    env_application_package_dir = application_package_dir(application_id, application_version)
+
+    # Com o runtime do pacote de aplicação, as dependências são importadas do diretório compartilhado do nó
+    python_command = 'python3'
+    if config.NODE_RUNTIME == 'wheelhouse':
+        python_command = 'PYTHONPATH=$AZ_BATCH_NODE_SHARED_DIR/montecarlo-runtime/site-packages python3'
 
     logger.info(f'Creating tasks to job [{job_id}]...')
 
     tasks = []
 
+    # Tarefas interrompidas (ex.: nó de baixa prioridade preemptado) são reexecutadas e retomam do checkpoint
+    constraints = batchmodels.TaskConstraints(max_task_retry_count=config.TASK_MAX_RETRY_COUNT)
+
     for idx, input_file in enumerate(resource_input_files):
         
         id_task=f'Task-{timestap}-{idx}'        
         tasks.append(batchmodels.TaskAddParameter(
                 id=id_task,
-                command_line=f"/bin/bash -c 'python3 {env_application_package_dir}/montecarlo_app.py $HOME/{input_file.file_path}'",
-                resource_files=[input_file]
+                command_line=f"/bin/bash -c '{python_command} {env_application_package_dir}/montecarlo_app.py $HOME/{input_file.file_path} --workers {config.POOL_CORES_PER_TASK} --checkpoint-interval {config.CHECKPOINT_INTERVAL}'",
+                resource_files=[input_file],
+                constraints=constraints
             )
         )
         logger.info(f'Created tasks [{id_task}]')
@@ -189,6 +328,84 @@ def add_tasks(job_id: str, resource_input_files: list, timestap: int):
     BATCH_CLIENT.task.add_collection(job_id, tasks)
     print()
 
+    return [task.id for task in tasks]
+
+
+def iter_completed_tasks(job_id: str, timeout: datetime.timedelta, min_interval: float = 1.0, max_interval: float = 30.0,
+                         lookback: datetime.timedelta = datetime.timedelta(seconds=30)):
+    """
+    Monitors the tasks of the specified job and yields each task as soon as it completes.
+
+    Each poll costs one task-counts request; completed tasks are listed (only id, state and
+    stateTransitionTime) just when the completed count grows, and only those whose
+    stateTransitionTime is after the latest one already seen minus lookback, so each poll
+    lists the new completions rather than every completed task of the job. The lookback
+    covers completions that become visible to list queries after later ones; once the job is
+    done, the completed tasks are listed again, without the time filter, until every completion
+    counted by the job was yielded. The polling interval backs off from min_interval to
+    max_interval while nothing changes and resets when tasks complete.
+
+    Args:
+        job_id (str): The ID of the job.
+        timeout (datetime.timedelta): The timeout period.
+        min_interval (float): The initial polling interval, in seconds.
+        max_interval (float): The maximum polling interval, in seconds.
+        lookback (datetime.timedelta): How far before the latest seen completion each listing starts.
+
+    Yields:
+        batchmodels.CloudTask: Each completed task, with only id, state and stateTransitionTime populated.
+    """
+    timeout_expiration = datetime.datetime.now() + timeout
+    incomplete_options = batchmodels.TaskListOptions(filter="state ne 'completed'", select='id,state')
+    seen = set()
+    latest_transition = None
+    interval = min_interval
+
+    def list_completed(incremental=True):
+        nonlocal latest_transition
+        task_filter = "state eq 'completed'"
+        if incremental and latest_transition is not None:
+            since = (latest_transition - lookback).astimezone(datetime.timezone.utc)
+            task_filter += f" and stateTransitionTime gt datetime'{since.strftime('%Y-%m-%dT%H:%M:%S.%fZ')}'"
+        options = batchmodels.TaskListOptions(filter=task_filter, select='id,state,stateTransitionTime')
+        for task in BATCH_CLIENT.task.list(job_id, task_list_options=options):
+            if task.id not in seen:
+                seen.add(task.id)
+                if latest_transition is None or task.state_transition_time > latest_transition:
+                    latest_transition = task.state_transition_time
+                yield task
+
+    while datetime.datetime.now() < timeout_expiration:
+        counts = BATCH_CLIENT.job.get_task_counts(job_id).task_counts
+
+        listed = counts.completed > len(seen)
+        if listed:
+            yield from list_completed()
+            interval = min_interval
+        else:
+            interval = min(interval * 1.5, max_interval)
+
+        # As contagens podem estar defasadas: a conclusão é confirmada listando as tarefas não concluídas
+        if counts.active + counts.running == 0:
+            if not any(True for _ in BATCH_CLIENT.task.list(job_id, task_list_options=incomplete_options)):
+                # Uma conclusão pode ainda não aparecer na listagem: lista de novo (sem o filtro de data) até que
+                # todas as tarefas concluídas tenham sido entregues
+                if not listed:
+                    yield from list_completed()
+                while len(seen) < counts.completed:
+                    if datetime.datetime.now() >= timeout_expiration:
+                        raise RuntimeError(f"ERROR: {counts.completed - len(seen)} completed tasks were not listed "
+                                           "within timeout period of " + str(timeout))
+                    time.sleep(interval)
+                    interval = min(interval * 1.5, max_interval)
+                    yield from list_completed(incremental=False)
+                return
+
+        time.sleep(interval)
+
+    raise RuntimeError("ERROR: Tasks did not reach 'Completed' state within "
+                       "timeout period of " + str(timeout))
+
 
 def wait_for_tasks_to_complete(job_id: str, timeout: datetime.timedelta):
     """
@@ -201,26 +418,14 @@ def wait_for_tasks_to_complete(job_id: str, timeout: datetime.timedelta):
     Returns:
         bool: True if all tasks completed within the timeout period, otherwise raises an exception.
     """
-    timeout_expiration = datetime.datetime.now() + timeout
-
     print(f"Monitoring all tasks for 'Completed' state, timeout in {timeout}...", end='')
 
-    while datetime.datetime.now() < timeout_expiration:
+    for task in iter_completed_tasks(job_id, timeout):
         print('.', end='')
         sys.stdout.flush()
-        tasks = BATCH_CLIENT.task.list(job_id)
-
-        incomplete_tasks = [task for task in tasks if
-                            task.state != batchmodels.TaskState.completed]
-        if not incomplete_tasks:
-            print()
-            return True
-
-        time.sleep(1)
 
     print()
-    raise RuntimeError("ERROR: Tasks did not reach 'Completed' state within "
-                       "timeout period of " + str(timeout))
+    return True
 
 
 def print_task_output(job_id: str, timestap: str):
@@ -236,13 +441,13 @@ def print_task_output(job_id: str, timestap: str):
     """
     logger.info('Printing task output...')
 
-    tasks = BATCH_CLIENT.task.list(job_id)
+    # Uma única listagem com id e nó de cada tarefa, sem um task.get por tarefa
+    tasks = BATCH_CLIENT.task.list(job_id, task_list_options=batchmodels.TaskListOptions(select='id,nodeInfo'))
 
     for task in tasks:
-        node_id = BATCH_CLIENT.task.get(job_id, task.id).node_info.node_id
         if str(timestap) in task.id:
             logger.info(f"Task: {task.id}")
-            logger.info(f"Node: {node_id}")
+            logger.info(f"Node: {task.node_info.node_id if task.node_info else None}")
             print()
             
 
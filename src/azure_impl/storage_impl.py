@@ -1,14 +1,18 @@
 import config
+import tracing
 import os
+import base64
 import logging
 import datetime
+from concurrent.futures import ThreadPoolExecutor
 import azure.batch.models as batchmodels
 from azure.storage.blob import (
+    BlobBlock,
     BlobServiceClient,
     BlobSasPermissions,
     generate_blob_sas
 )
-from azure.core.exceptions import ResourceExistsError
+from azure.core.exceptions import ResourceExistsError, ResourceNotFoundError
 
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -43,13 +47,15 @@ def create_container_if_not_exists(container_name: str):
         logger.info(f'Container [{container_name}] already exists.')
 
 
-def upload_file_to_container(container_name: str, file_path: str) -> batchmodels.ResourceFile:
+@tracing.traced('upload', 'container_name', 'file_path')
+def upload_file_to_container(container_name: str, file_path: str, max_concurrency: int = config.BLOB_MAX_CONCURRENCY) -> batchmodels.ResourceFile:
     """
     Uploads a file to the specified container.
 
     Args:
         container_name (str): The name of the container to upload the file to.
         file_path (str): The path of the file to upload.
+        max_concurrency (int): The number of parallel connections used to upload the blob in chunks.
 
     Returns:
         batchmodels.ResourceFile: The resource file with the SAS URL.
@@ -60,7 +66,7 @@ def upload_file_to_container(container_name: str, file_path: str) -> batchmodels
     logger.info(f'Uploading file {file_path} to container [{container_name}]...')
 
     with open(file_path, "rb") as data:
-        blob_client.upload_blob(data, overwrite=True)
+        blob_client.upload_blob(data, overwrite=True, max_concurrency=max_concurrency)
 
     sas_token = generate_blob_sas(
         config.STORAGE_ACCOUNT_NAME,
@@ -108,21 +114,215 @@ def generate_sas_url(
     return f"https://{account_name}.{account_domain}/{container_name}/{blob_name}?{sas_token}"
 
 
-def get_file_from_container(container_name: str, blob_name: str, download_path: str) -> bytes:
+@tracing.traced('download', 'container_name', 'blob_name')
+def get_file_from_container(container_name: str, blob_name: str, download_path: str, max_concurrency: int = config.BLOB_MAX_CONCURRENCY) -> str:
     """
-    Downloads a file from the specified container.
+    Downloads a file from the specified container, streaming it to disk.
 
     Args:
         container_name (str): The name of the container.
         blob_name (str): The name of the blob to download.
         download_path (str): The path to download the file to.
+        max_concurrency (int): The number of parallel connections used to download the blob in chunks.
 
     Returns:
-        bytes: The downloaded file content.
+        str: The path of the downloaded file.
     """
     blob_client = BLOB_SERVICE_CLIENT.get_blob_client(container_name, blob_name)
 
     with open(download_path, "wb") as download_file:
-        download_file.write(blob_client.download_blob().readall())
+        blob_client.download_blob(max_concurrency=max_concurrency).readinto(download_file)
 
     logger.info(f'Blob {blob_name} downloaded to {download_path}.')
+    return download_path
+
+
+def upload_files_to_container(container_name: str, file_paths: list, max_workers: int = config.TRANSFER_CONCURRENCY) -> list:
+    """
+    Uploads many files to the specified container through a bounded thread pool.
+
+    Args:
+        container_name (str): The name of the container to upload the files to.
+        file_paths (list): The paths of the files to upload.
+        max_workers (int): The maximum number of files uploaded at once.
+
+    Returns:
+        list: The resource files with the SAS URLs, in the order of file_paths.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(lambda file_path: upload_file_to_container(container_name, file_path), file_paths))
+
+
+def get_files_from_container(container_name: str, blob_names: list, download_paths: list, max_workers: int = config.TRANSFER_CONCURRENCY):
+    """
+    Downloads many blobs from the specified container through a bounded thread pool.
+
+    Downloads run ahead of the caller, which receives each path as soon as that blob
+    (and every blob before it) is on disk.
+
+    Args:
+        container_name (str): The name of the container.
+        blob_names (list): The names of the blobs to download.
+        download_paths (list): The paths to download the blobs to.
+        max_workers (int): The maximum number of blobs downloaded at once.
+
+    Yields:
+        str: The path of each downloaded file, in the order of blob_names.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(get_file_from_container, container_name, blob_name, download_path)
+            for blob_name, download_path in zip(blob_names, download_paths)
+        ]
+        for future in futures:
+            yield future.result()
+
+
+def upload_bytes_to_container(container_name: str, blob_name: str, data: bytes):
+    """
+    Uploads in-memory data as a blob to the specified container.
+
+    Args:
+        container_name (str): The name of the container.
+        blob_name (str): The name of the blob.
+        data (bytes): The blob content.
+
+    Returns:
+        None
+    """
+    BLOB_SERVICE_CLIENT.get_blob_client(container_name, blob_name).upload_blob(data, overwrite=True)
+
+
+def get_blob_bytes(container_name: str, blob_name: str):
+    """
+    Downloads a blob into memory.
+
+    Args:
+        container_name (str): The name of the container.
+        blob_name (str): The name of the blob.
+
+    Returns:
+        bytes: The blob content, or None if the blob does not exist.
+    """
+    try:
+        return BLOB_SERVICE_CLIENT.get_blob_client(container_name, blob_name).download_blob().readall()
+    except ResourceNotFoundError:
+        return None
+
+
+def blob_exists(container_name: str, blob_name: str) -> bool:
+    """
+    Checks whether a blob exists.
+
+    Args:
+        container_name (str): The name of the container.
+        blob_name (str): The name of the blob.
+
+    Returns:
+        bool: True if the blob exists.
+    """
+    try:
+        BLOB_SERVICE_CLIENT.get_blob_client(container_name, blob_name).get_blob_properties()
+        return True
+    except ResourceNotFoundError:
+        return False
+
+
+def list_blobs_with_properties(container_name: str) -> list:
+    """
+    Lists the blobs of a container with their size and last modification time.
+
+    Args:
+        container_name (str): The name of the container.
+
+    Returns:
+        list: Tuples (name, size, last_modified) for each blob.
+    """
+    container_client = BLOB_SERVICE_CLIENT.get_container_client(container_name)
+    return [(blob.name, blob.size, blob.last_modified) for blob in container_client.list_blobs()]
+
+
+def delete_blob(container_name: str, blob_name: str):
+    """
+    Deletes a blob.
+
+    Args:
+        container_name (str): The name of the container.
+        blob_name (str): The name of the blob.
+
+    Returns:
+        None
+    """
+    BLOB_SERVICE_CLIENT.get_blob_client(container_name, blob_name).delete_blob()
+
+
+class BlockBlobUploader:
+    """
+    Uploads a blob incrementally as a list of blocks, staging each block while the caller keeps writing.
+
+    At most max_concurrency blocks are in flight, so memory stays bounded by
+    (max_concurrency + 1) x block_size regardless of the blob size.
+    """
+
+    def __init__(self, container_name: str, blob_name: str, block_size: int = 4 * 1024 * 1024, max_concurrency: int = config.TRANSFER_CONCURRENCY):
+        """
+        Args:
+            container_name (str): The name of the container to upload the blob to.
+            blob_name (str): The name of the blob.
+            block_size (int): The size of each staged block, in bytes.
+            max_concurrency (int): The maximum number of blocks staged in parallel.
+        """
+        self.blob_client = BLOB_SERVICE_CLIENT.get_blob_client(container_name, blob_name)
+        self.block_size = block_size
+        self.max_concurrency = max_concurrency
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrency)
+        self.buffer = bytearray()
+        self.block_ids = []
+        self.pending = []
+
+        logger.info(f'Uploading blob {blob_name} to container [{container_name}] in blocks...')
+
+    def write(self, data: bytes):
+        """
+        Appends data to the blob, staging full blocks in the background.
+
+        Args:
+            data (bytes): The data to append.
+        """
+        self.buffer += data
+        while len(self.buffer) >= self.block_size:
+            self._stage(bytes(self.buffer[:self.block_size]))
+            del self.buffer[:self.block_size]
+
+    def _stage(self, block: bytes):
+        # Os ids dos blocos precisam ter o mesmo tamanho dentro do blob
+        block_id = base64.b64encode(f'{len(self.block_ids):08d}'.encode()).decode()
+        self.block_ids.append(block_id)
+        if len(self.pending) >= self.max_concurrency:
+            self.pending.pop(0).result()
+        self.pending.append(self.executor.submit(self.blob_client.stage_block, block_id, block))
+
+    @tracing.traced('upload')
+    def close(self):
+        """
+        Stages the remaining data and commits the block list.
+        """
+        if self.buffer or not self.block_ids:
+            self._stage(bytes(self.buffer))
+            self.buffer.clear()
+        for future in self.pending:
+            future.result()
+        self.executor.shutdown()
+        self.blob_client.commit_block_list([BlobBlock(block_id=block_id) for block_id in self.block_ids])
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            # Sem commit: cancela os blocos ainda na fila (o cancel_futures do shutdown só existe a partir do Python 3.9)
+            for future in self.pending:
+                future.cancel()
+            self.executor.shutdown()
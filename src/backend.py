@@ -0,0 +1,23 @@
+"""
+Selects the implementation of storage_impl and batch_impl from config.BACKEND.
+
+'azure' uses Azure Blob Storage and Azure Batch (azure_impl); 'local' maps containers onto
+directories and runs the tasks as local processes (local_impl), without Azure credentials.
+The modules are imported on first use, so the Azure clients are only built in the 'azure' backend.
+"""
+
+import importlib
+import config
+
+BACKEND_PACKAGES = {
+    'azure': 'azure_impl',
+    'local': 'local_impl',
+}
+
+
+def __getattr__(name):
+    if name not in ('storage_impl', 'batch_impl'):
+        raise AttributeError(f"module 'backend' has no attribute '{name}'")
+    if config.BACKEND not in BACKEND_PACKAGES:
+        raise ValueError(f"Unknown backend '{config.BACKEND}'. Supported: {', '.join(BACKEND_PACKAGES)}")
+    return importlib.import_module(f'{BACKEND_PACKAGES[config.BACKEND]}.{name}')
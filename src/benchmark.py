@@ -0,0 +1,269 @@
+import argparse
+import datetime
+import importlib.util
+import itertools
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+import numpy as np
+import config
+
+# Os estágios usam o backend local (local_impl): nenhum recurso do Azure é usado
+config.BACKEND = 'local'
+
+from client import effective_num_steps, iter_simulations, split_json, split_json_streaming
+from agreggator import ResultAggregator, aggregate_and_save
+from backend import storage_impl
+from generate_portfolio import write_portfolio
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_PATH = os.path.join(SRC_DIR, 'src-montecarlo-app', 'montecarlo_app_template.py')
+
+PORTFOLIO_FILE_NAME = 'benchmark_portfolio.json'
+KERNEL_RESULTS_FILE = 'kernel_results.json'
+
+
+def load_app():
+    """
+    Loads the montecarlo_app module from its template.
+
+    Returns:
+        module: The montecarlo_app module.
+    """
+    spec = importlib.util.spec_from_file_location('montecarlo_app', APP_PATH)
+    app = importlib.util.module_from_spec(spec)
+    sys.modules['montecarlo_app'] = app
+    spec.loader.exec_module(app)
+    return app
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss é informado em KB no Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def bench_kernel(options: dict) -> dict:
+    """
+    Times monte_carlo_option_pricing on the first kernel_trades simulations of the portfolio, in one process.
+    """
+    app = load_app()
+    metadata = {}
+    simulations = list(itertools.islice(iter_simulations(f'src/files/input/{PORTFOLIO_FILE_NAME}', metadata), options['kernel_trades']))
+    root_seed = np.random.SeedSequence(options['seed'])
+
+    path_steps = 0
+    start = time.perf_counter()
+    for index, simulation in enumerate(simulations):
+        params = simulation['parameters']
+        simulation['results'] = app.monte_carlo_option_pricing(params, seed_sequence=app.child_seed(root_seed, index), result_mode=options['result_mode'])
+        path_steps += params['num_simulations'] * effective_num_steps(params)
+    seconds = time.perf_counter() - start
+
+    # Os resultados do kernel alimentam os estágios de serialização e agregação
+    with open(KERNEL_RESULTS_FILE, 'w') as file:
+        json.dump(simulations, file)
+
+    return {
+        'seconds': seconds,
+        'trades': len(simulations),
+        'path_steps': path_steps,
+        'path_steps_per_second': path_steps / seconds,
+    }
+
+
+def bench_serialization(options: dict) -> dict:
+    """
+    Times the compact JSON serialization of the result file, as written by montecarlo_app.
+    """
+    with open(KERNEL_RESULTS_FILE, 'r') as file:
+        simulations = json.load(file)
+
+    start = time.perf_counter()
+    result_json = json.dumps({'seed': options['seed'], 'simulations': simulations}, separators=(',', ':'))
+    with open('serialization_result.json', 'w') as file:
+        file.write(result_json)
+    seconds = time.perf_counter() - start
+
+    return {'seconds': seconds, 'bytes': len(result_json), 'mb_per_second': len(result_json) / 1e6 / seconds}
+
+
+def bench_split_json(options: dict) -> dict:
+    """
+    Times client.split_json, including the download of the input file from the local 'input' container.
+    """
+    input_bytes = os.path.getsize(storage_impl.blob_path('input', PORTFOLIO_FILE_NAME))
+    start = time.perf_counter()
+    parts = split_json(PORTFOLIO_FILE_NAME, options['num_parts'])
+    seconds = time.perf_counter() - start
+    return {'seconds': seconds, 'bytes': input_bytes, 'mb_per_second': input_bytes / 1e6 / seconds, 'parts': len(parts)}
+
+
+def bench_split_json_streaming(options: dict) -> dict:
+    """
+    Times client.split_json_streaming (without uploading the parts).
+    """
+    input_bytes = os.path.getsize(storage_impl.blob_path('input', PORTFOLIO_FILE_NAME))
+    start = time.perf_counter()
+    parts, _ = split_json_streaming(PORTFOLIO_FILE_NAME, options['num_parts'], upload=False)
+    seconds = time.perf_counter() - start
+    return {'seconds': seconds, 'bytes': input_bytes, 'mb_per_second': input_bytes / 1e6 / seconds, 'parts': len(parts)}
+
+
+def bench_aggregate_and_save(options: dict) -> dict:
+    """
+    Times agreggator.aggregate_and_save on result parts built from the parts of split_json,
+    with the results of the kernel stage repeated over all simulations.
+    """
+    with open(KERNEL_RESULTS_FILE, 'r') as file:
+        results = itertools.cycle([simulation['results'] for simulation in json.load(file)])
+
+    result_files = []
+    result_bytes = 0
+    for part in sorted(os.listdir('src/files/temp')):
+        if not part.startswith('monte_carlo_input_part_'):
+            continue
+        with open(os.path.join('src/files/temp', part), 'r') as file:
+            data = json.load(file)
+        for simulation in data['simulations']:
+            simulation['results'] = next(results)
+        result_file = os.path.join('src/files/temp', part.replace('input', 'result'))
+        with open(result_file, 'w') as file:
+            json.dump(data, file, separators=(',', ':'))
+        storage_impl.upload_file_to_container('temp', result_file)
+        result_files.append(os.path.basename(result_file))
+        result_bytes += os.path.getsize(result_file)
+
+    start = time.perf_counter()
+    aggregate_and_save(result_files)
+    seconds = time.perf_counter() - start
+    return {'seconds': seconds, 'bytes': result_bytes, 'mb_per_second': result_bytes / 1e6 / seconds}
+
+
+def bench_pipelined_aggregation(options: dict) -> dict:
+    """
+    Times the pipelined aggregation after the last task completes: every result part of the
+    aggregate_and_save stage but the last is added to a ResultAggregator and written (as if its
+    task completed long before), then the time from adding the last part to closing the
+    aggregator is measured. This is the time the pipelined orchestrator adds after the Batch job.
+    """
+    result_files = sorted(name for name in os.listdir('src/files/temp') if name.startswith('monte_carlo_result_part_'))
+    last_part_bytes = os.path.getsize(os.path.join('src/files/temp', result_files[-1]))
+
+    with ResultAggregator() as aggregator:
+        for result_file in result_files[:-1]:
+            aggregator.add_part(result_file)
+            aggregator.wait_for_parts()
+        start = time.perf_counter()
+        aggregator.add_part(result_files[-1])
+    seconds = time.perf_counter() - start
+    return {'seconds': seconds, 'bytes': last_part_bytes, 'mb_per_second': last_part_bytes / 1e6 / seconds, 'parts': len(result_files)}
+
+
+STAGES = {
+    'kernel': bench_kernel,
+    'serialization': bench_serialization,
+    'split_json': bench_split_json,
+    'split_json_streaming': bench_split_json_streaming,
+    'aggregate_and_save': bench_aggregate_and_save,
+    'pipelined_aggregation': bench_pipelined_aggregation,
+}
+
+
+def run_stage(name: str, work_dir: str, options: dict) -> dict:
+    # Executado em um processo novo, para que o pico de RSS seja o do estágio
+    os.chdir(work_dir)
+    metrics = STAGES[name](options)
+    metrics['peak_rss_mb'] = peak_rss_mb()
+    return metrics
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=SRC_DIR, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(num_trades: int, kernel_trades: int = 200, num_parts: int = config.NUM_PARTS, seed: int = 0, result_mode: str = 'statistics') -> dict:
+    """
+    Generates a synthetic portfolio and times each stage of the pipeline on it, in a scratch directory.
+
+    Args:
+        num_trades (int): The number of simulations of the portfolio.
+        kernel_trades (int): The number of simulations priced by the kernel stage.
+        num_parts (int): The number of parts of the split stages.
+        seed (int): The seed of the portfolio and of the pricing.
+        result_mode (str): The result mode of the kernel ('statistics' keeps large portfolios small).
+
+    Returns:
+        dict: The report, with the portfolio description and the metrics of each stage.
+    """
+    options = {'kernel_trades': kernel_trades, 'num_parts': num_parts, 'seed': seed, 'result_mode': result_mode}
+    report = {
+        'commit': git_commit(),
+        'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'portfolio': {'trades': num_trades, **options},
+        'stages': {},
+    }
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        for directory in ('src/files/input', 'src/files/temp', 'src/files/output'):
+            os.makedirs(os.path.join(work_dir, directory))
+        portfolio_path = os.path.join(work_dir, 'src/files/input', PORTFOLIO_FILE_NAME)
+        report['portfolio']['bytes'] = write_portfolio(portfolio_path, num_trades, seed)
+        os.makedirs(os.path.join(work_dir, storage_impl.STORAGE_DIR, 'input'))
+        shutil.copyfile(portfolio_path, os.path.join(work_dir, storage_impl.STORAGE_DIR, 'input', PORTFOLIO_FILE_NAME))
+
+        for name in STAGES:
+            with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as executor:
+                report['stages'][name] = executor.submit(run_stage, name, work_dir, options).result()
+            print(f"{name}: {json.dumps(report['stages'][name])}")
+
+    return report
+
+
+def compare_reports(report: dict, baseline: dict):
+    """
+    Prints the throughput of each stage relative to a baseline report.
+    """
+    for name, metrics in report['stages'].items():
+        previous = baseline.get('stages', {}).get(name)
+        if previous is None:
+            continue
+        key = 'path_steps_per_second' if 'path_steps_per_second' in metrics else 'mb_per_second'
+        change = metrics[key] / previous[key] - 1
+        print(f"{name}: {key} {change:+.1%} vs {baseline.get('commit')} (peak RSS {metrics['peak_rss_mb']:.0f} MB vs {previous['peak_rss_mb']:.0f} MB)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Mede cada estágio do pipeline em uma carteira sintética.')
+    parser.add_argument('--trades', type=int, default=1000, help='Tamanho da carteira (ex.: 1000 a 1000000)')
+    parser.add_argument('--kernel-trades', type=int, default=200, help='Simulações precificadas no estágio do kernel')
+    parser.add_argument('--parts', type=int, default=config.NUM_PARTS)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--result-mode', choices=('full', 'statistics'), default='statistics')
+    parser.add_argument('--output', help='Arquivo JSON do relatório (padrão: src/files/benchmark/benchmark_<commit>.json)')
+    parser.add_argument('--baseline', help='Relatório anterior para comparação')
+    args = parser.parse_args()
+
+    report = run_benchmark(args.trades, args.kernel_trades, args.parts, args.seed, args.result_mode)
+
+    output = args.output or os.path.join(SRC_DIR, 'files', 'benchmark', f"benchmark_{report['commit'] or 'local'}_{args.trades}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as file:
+        json.dump(report, file, indent=4)
+    print(f"Relatório salvo em {output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r') as file:
+            compare_reports(report, json.load(file))
+
+if __name__ == "__main__":
+    main()
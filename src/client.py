@@ -1,40 +1,655 @@
+import hashlib
+import heapq
 import json
-import azure_impl.storage_impl as storage_impl
+import logging
+import math
+from concurrent.futures import ThreadPoolExecutor
+import config
+import tracing
+from backend import storage_impl
+from result_cache import RESULT_OPTIONS
 
-def split_json(input_file_name):
-    
+logger = logging.getLogger(__name__)
+
+# Tipos de opção que podem ser precificados sobre caminhos compartilhados (payoff max(±(U − K), 0))
+SHARED_PATH_OPTION_TYPES = ('call', 'put', 'asian_call', 'asian_put')
+
+
+def content_hash(value) -> int:
+    """
+    Hashes a JSON value into a 64-bit integer, independently of key order and formatting.
+
+    Args:
+        value: The JSON value.
+
+    Returns:
+        int: The first 8 bytes of the SHA-256 of its canonical JSON.
+    """
+    canonical = json.dumps(value, sort_keys=True, separators=(',', ':')).encode('utf-8')
+    return int.from_bytes(hashlib.sha256(canonical).digest()[:8], 'big')
+
+
+def default_seed(metadata: dict) -> int:
+    """
+    Derives the seed of an input file without 'seed' from its top-level fields.
+
+    The simulations are left out, so adding or removing trades keeps the seed (and the cached results
+    of the other trades); the result options are left out, so they do not change the prices.
+
+    Args:
+        metadata (dict): The top-level fields of the input file other than the simulations.
+
+    Returns:
+        int: The seed.
+    """
+    return content_hash({key: value for key, value in metadata.items() if key not in ('seed', *RESULT_OPTIONS)})
+
+
+def seed_key(params: dict) -> int:
+    """
+    Computes the key of the random substream of a simulation from its parameters.
+
+    montecarlo_app seeds each simulation with the substream of its seed_key, so the result of a trade
+    does not depend on its position in the input file. Simulations with the same parameters use the
+    same substream (and share one cache entry). The fields set by the client (path_group, path_range)
+    are left out.
+
+    Args:
+        params (dict): The simulation parameters.
+
+    Returns:
+        int: The seed key.
+    """
+    return content_hash({key: value for key, value in params.items() if key not in ('path_group', 'path_range')})
+
+
+def effective_num_steps(params: dict) -> int:
+    """
+    Returns the number of time steps montecarlo_app simulates for a simulation.
+
+    European calls and puts only use S_T, which is sampled exactly in a single step whatever num_steps
+    is, unless full paths are requested (full_paths or an exposure grid).
+
+    Args:
+        params (dict): The simulation parameters.
+
+    Returns:
+        int: The number of simulated steps.
+    """
+    if params.get('option_type', 'call') in ('call', 'put') and not params.get('exposure_grid') and not params.get('full_paths', False):
+        return 1
+    return params['num_steps']
+
+
+def estimate_cost(params: dict, calibration: dict = None) -> float:
+    """
+    Estimates the relative cost of a simulation (or of its path range) as paths x simulated steps
+    (see effective_num_steps).
+
+    Args:
+        params (dict): The simulation parameters.
+        calibration (dict): Optional calibration with 'path_step_cost' (cost of one path step)
+            and 'simulation_overhead' (fixed cost per simulation).
+
+    Returns:
+        float: The estimated cost.
+    """
+    calibration = calibration or {}
+    num_paths = params['num_simulations']
+    if params.get('path_range') is not None:
+        num_paths = params['path_range'][1] - params['path_range'][0]
+    path_steps = num_paths * effective_num_steps(params)
+    return calibration.get('simulation_overhead', 0.0) + calibration.get('path_step_cost', 1.0) * path_steps
+
+
+def estimate_group_cost(params_list: list, calibration: dict = None) -> float:
+    """
+    Estimates the cost of simulations priced together over shared paths (see assign_path_groups).
+
+    The paths are simulated once; each further simulation only adds the evaluation of its payoff on them.
+
+    Args:
+        params_list (list): The parameters of the simulations of the group.
+        calibration (dict): Optional cost calibration (see estimate_cost), with 'payoff_cost'
+            (cost of one payoff evaluation on one path).
+
+    Returns:
+        float: The estimated cost.
+    """
+    calibration = calibration or {}
+    params = params_list[0]
+    num_paths = params['num_simulations']
+    if params.get('path_range') is not None:
+        num_paths = params['path_range'][1] - params['path_range'][0]
+    payoff_cost = calibration.get('simulation_overhead', 0.0) + calibration.get('payoff_cost', 1.0) * num_paths
+    return estimate_cost(params, calibration) + (len(params_list) - 1) * payoff_cost
+
+
+def can_split_by_path_range(params: dict) -> bool:
+    """
+    Checks whether a simulation can be split across parts by path range.
+
+    Only seeded pseudo-random simulations without a control variate or adaptive path count
+    produce shards that are exact slices of the unsplit simulation.
+
+    Args:
+        params (dict): The simulation parameters.
+
+    Returns:
+        bool: True if the simulation can be split by path range.
+    """
+    variance_reduction = params.get('variance_reduction') or []
+    if isinstance(variance_reduction, str):
+        variance_reduction = [variance_reduction]
+    return (
+        params.get('generator', 'pseudo_random') == 'pseudo_random'
+        and params.get('target_ci_halfwidth') is None
+        and not any(method.startswith('control_variate') for method in variance_reduction)
+    )
+
+
+def split_by_path_range(simulation: dict, num_shards: int) -> list:
+    """
+    Splits a simulation into shards that each cover a contiguous range of its paths.
+
+    Args:
+        simulation (dict): The simulation to split.
+        num_shards (int): The number of shards.
+
+    Returns:
+        list: The shards, each with a 'path_range' [start, end) in its parameters and the total 'shard_count'.
+    """
+    params = simulation['parameters']
+    variance_reduction = params.get('variance_reduction') or []
+    # Com variáveis antitéticas, as faixas precisam conter pares completos de caminhos
+    step = 2 if 'antithetic' in variance_reduction else 1
+    num_units = params['num_simulations'] // step
+    num_shards = max(1, min(num_shards, num_units))
+
+    shards = []
+    for i in range(num_shards):
+        start = (num_units * i // num_shards) * step
+        end = (num_units * (i + 1) // num_shards) * step
+        shards.append({**simulation, 'shard_count': num_shards, 'parameters': {**params, 'path_range': [start, end]}})
+    return shards
+
+
+def path_group_key(params: dict):
+    """
+    Computes the key of the simulations that can be priced over the same paths.
+
+    Simulations with the same underlying (spot, volatility, rate, maturity), path count, effective
+    step count and antithetic setting only differ by their payoff, so one set of paths serves all of
+    them. Only European and Asian options priced with seeded pseudo-random numbers can share paths.
+
+    Args:
+        params (dict): The simulation parameters.
+
+    Returns:
+        tuple: The key, or None if the simulation cannot share paths.
+    """
+    option_type = params.get('option_type', 'call')
+    if (
+        option_type not in SHARED_PATH_OPTION_TYPES
+        or not can_split_by_path_range(params)
+        or params.get('path_range') is not None
+        or params.get('exposure_grid')
+        or params.get('full_paths', False)
+        or params.get('greeks') is not None
+    ):
+        return None
+    variance_reduction = params.get('variance_reduction') or []
+    if isinstance(variance_reduction, str):
+        variance_reduction = [variance_reduction]
+    return (
+        params['stock_price'], params['volatility'], params['risk_free_rate'], params['time_to_maturity'],
+        params['num_simulations'], effective_num_steps(params), 'antithetic' in variance_reduction,
+    )
+
+
+def path_group_id(key: tuple) -> int:
+    """
+    Computes the 'path_group' parameter of the simulations with a path_group_key.
+
+    The group is the hash of the shared market and grid key only, not of its members, so adding or
+    removing a trade of the group does not re-key it (nor change the paths of the other members).
+
+    Args:
+        key (tuple): The key returned by path_group_key.
+
+    Returns:
+        int: The path group.
+    """
+    return content_hash(list(key))
+
+
+def assign_path_groups(simulations: list) -> int:
+    """
+    Marks the simulations that can share paths with a 'path_group' parameter.
+
+    The group is derived from the path_group_key (see path_group_id); montecarlo_app prices each group
+    once, seeding its paths from the group, so the simulations of a group use common random numbers.
+
+    Args:
+        simulations (list): The simulations, with their seed_key.
+
+    Returns:
+        int: The number of groups with more than one simulation.
+    """
+    groups = {}
+    for simulation in simulations:
+        key = path_group_key(simulation['parameters'])
+        if key is not None:
+            groups.setdefault(key, []).append(simulation)
+
+    num_groups = 0
+    for key, members in groups.items():
+        if len(members) > 1:
+            group = path_group_id(key)
+            for simulation in members:
+                simulation['parameters'] = {**simulation['parameters'], 'path_group': group}
+            num_groups += 1
+    return num_groups
+
+
+def plan_partitions(simulations: list, num_parts: int, calibration: dict = None):
+    """
+    Distributes simulations across parts with longest-processing-time bin packing.
+
+    The simulations of a path group stay together. Simulations (or groups) whose cost exceeds the
+    ideal cost of one part are first split by path range.
+
+    Args:
+        simulations (list): The simulations to distribute.
+        num_parts (int): The number of parts.
+        calibration (dict): Optional cost calibration (see estimate_cost).
+
+    Returns:
+        tuple: The list of parts (lists of simulations) and a report with the predicted
+            cost of each part and the imbalance (max part cost / mean part cost).
+    """
+    # As simulações de um path_group formam uma única unidade, precificada sobre os mesmos caminhos
+    units = []
+    groups = {}
+    for simulation in simulations:
+        group = simulation['parameters'].get('path_group')
+        if group is None:
+            units.append([simulation])
+        elif group in groups:
+            groups[group].append(simulation)
+        else:
+            groups[group] = [simulation]
+            units.append(groups[group])
+
+    costs = [estimate_group_cost([simulation['parameters'] for simulation in unit], calibration) for unit in units]
+    total_cost = sum(costs)
+    target_cost = total_cost / num_parts if num_parts else total_cost
+
+    items = []
+    for unit, cost in zip(units, costs):
+        if cost > target_cost > 0 and can_split_by_path_range(unit[0]['parameters']):
+            # Todas as simulações do grupo recebem as mesmas faixas de caminhos
+            num_shards = math.ceil(cost / target_cost)
+            for shards in zip(*(split_by_path_range(simulation, num_shards) for simulation in unit)):
+                items.append((estimate_group_cost([shard['parameters'] for shard in shards], calibration), list(shards)))
+        else:
+            items.append((cost, unit))
+
+    # LPT: cada simulação (ou grupo), da mais cara para a mais barata, vai para a parte de menor custo acumulado
+    parts = [[] for _ in range(num_parts)]
+    heap = [(0.0, i) for i in range(num_parts)]
+    for cost, unit in sorted(items, key=lambda item: item[0], reverse=True):
+        part_cost, i = heapq.heappop(heap)
+        parts[i].extend(unit)
+        heapq.heappush(heap, (part_cost + cost, i))
+
+    part_costs = [0.0] * num_parts
+    for part_cost, i in heap:
+        part_costs[i] = part_cost
+    mean_cost = sum(part_costs) / num_parts if num_parts else 0.0
+    report = {
+        'part_costs': part_costs,
+        'imbalance': max(part_costs) / mean_cost if mean_cost else 1.0,
+    }
+    return parts, report
+
+
+def download_input_file(input_file_name: str) -> str:
+    """
+    Downloads an input file from the 'input' container to src/files/input.
+
+    Args:
+        input_file_name (str): The name of the input blob.
+
+    Returns:
+        str: The local path of the input file.
+    """
     input_container_name = 'input'
     storage_impl.create_container_if_not_exists(input_container_name)  # Use the new function
-    storage_impl.get_file_from_container('input', input_file_name, f'src/files/input/{input_file_name}')
-    
+    return storage_impl.get_file_from_container('input', input_file_name, f'src/files/input/{input_file_name}')
+
+
+@tracing.traced('split', 'input_file_name')
+def split_json(input_file_name, num_parts=config.NUM_PARTS, calibration=None, cache=None, download=True):
+
+    # O arquivo de entrada pode já ter sido baixado (ex.: para planejar o pool)
+    if download:
+        download_input_file(input_file_name)
+
     with open(f'src/files/input/{input_file_name}', 'r', encoding='utf-8') as file:
         data = json.load(file)
-    
-    num_nodes = 4
+
     simulations = data['simulations']
-    total_simulations = len(simulations)
-    chunk_size = (total_simulations + num_nodes - 1) // num_nodes  # Calcula o tamanho de cada parte
+
+    # As partes compartilham a semente para que as faixas de uma simulação dividida sejam fatias da mesma simulação;
+    # sem semente no arquivo, ela é derivada do conteúdo para que execuções repetidas encontrem o cache
+    data.setdefault('seed', default_seed({key: value for key, value in data.items() if key != 'simulations'}))
+
+    # Índice global de cada simulação (ordem do resultado) e chave da sua subsequência aleatória da semente
+    for index, simulation in enumerate(simulations):
+        simulation.setdefault('simulation_index', index)
+        simulation.setdefault('seed_key', seed_key(simulation['parameters']))
+
+    # Simulações do mesmo subjacente compartilham caminhos (o path_group faz parte da chave do cache)
+    if config.SHARED_PATHS:
+        logger.info(f'Path groups: {assign_path_groups(simulations)}')
+
+    # Simulações com resultado em cache não são enviadas ao Batch
+    if cache is not None:
+        metadata = {key: value for key, value in data.items() if key != 'simulations'}
+        simulations = [simulation for simulation in simulations if not cache.lookup(simulation, metadata)]
+        logger.info(f'Result cache: {cache.report()}')
+
+    # Distribui as simulações entre as partes pelo custo estimado
+    parts, report = plan_partitions(simulations, num_parts, calibration)
+    logger.info(f"Predicted part costs: {report['part_costs']} - imbalance: {report['imbalance']:.3f}")
 
     output_files = []
 
-    for i in range(num_nodes):
-        start_index = i * chunk_size
-        end_index = min(start_index + chunk_size, total_simulations)
-        chunk = simulations[start_index:end_index]
-        
-        output_data = {'simulations': chunk}
+    for i, chunk in enumerate(part for part in parts if part):
+        # Campos de nível raiz (semente, modo de resultado...) são repassados a todas as partes
+        output_data = {**{key: value for key, value in data.items() if key != 'simulations'}, 'simulations': chunk}
         output_file = f'src/files/temp/monte_carlo_input_part_{i+1}.json'
-        
+
         with open(output_file, 'w', encoding='utf-8') as outfile:
-            json.dump(output_data, outfile, ensure_ascii=False, indent=4)
-        
+            json.dump(output_data, outfile, ensure_ascii=False, separators=(',', ':'))
+
         output_files.append(output_file)
 
     return output_files
 
+def iter_json_simulations(file_path: str, metadata: dict, buffer_size: int = 1 << 16):
+    """
+    Streams the entries of the 'simulations' array of a JSON input file without loading the whole file.
+
+    Other top-level fields (e.g. 'seed') are stored in metadata as they are read.
+
+    Args:
+        file_path (str): The path of the JSON file.
+        metadata (dict): Receives the top-level fields other than 'simulations'.
+        buffer_size (int): The number of characters read from the file at a time.
+
+    Yields:
+        dict: Each simulation, in file order.
+
+    Raises:
+        json.JSONDecodeError: If the file is not valid JSON or ends before the object is closed; its pos
+            is the character offset in the file.
+    """
+    decoder = json.JSONDecoder()
+
+    with open(file_path, 'r', encoding='utf-8') as file:
+        buffer = ''
+        pos = 0
+        # Caracteres do arquivo anteriores ao buffer, para informar a posição dos erros no arquivo
+        consumed = 0
+        eof = False
+
+        def error(message, index):
+            offset = consumed + index
+            exception = json.JSONDecodeError(message, buffer, index)
+            exception.pos = offset
+            exception.args = (f'{message} in {file_path}: char {offset}',)
+            return exception
+
+        def truncated(expecting):
+            # O arquivo terminou antes de fechar o objeto ou o array de simulações
+            return error(f'Unexpected end of input, expecting {expecting}', pos)
+
+        def skip(chars):
+            # Avança sobre espaços e os delimitadores informados, lendo mais do arquivo quando necessário
+            nonlocal buffer, pos, eof, consumed
+            while True:
+                while pos < len(buffer) and (buffer[pos].isspace() or buffer[pos] in chars):
+                    pos += 1
+                if pos < len(buffer) or eof:
+                    return
+                consumed += len(buffer)
+                buffer, pos = file.read(buffer_size), 0
+                eof = not buffer
+
+        def decode():
+            # Um valor só é aceito quando há ao menos um caractere depois dele (ou no fim do arquivo),
+            # para que números no limite do buffer não sejam lidos pela metade
+            nonlocal buffer, pos, eof, consumed
+            while True:
+                try:
+                    value, end = decoder.raw_decode(buffer, pos)
+                    if end < len(buffer) or eof:
+                        pos = end
+                        return value
+                except json.JSONDecodeError as exception:
+                    if eof:
+                        raise error(exception.msg, exception.pos) from None
+                data = file.read(buffer_size)
+                eof = not data
+                consumed += pos
+                buffer, pos = buffer[pos:] + data, 0
+
+        skip('{')
+        while True:
+            skip(',')
+            if pos >= len(buffer):
+                raise truncated("'}'")
+            if buffer[pos] == '}':
+                return
+            key = decode()
+            skip(':')
+            if key != 'simulations':
+                metadata[key] = decode()
+                continue
+            skip('[')
+            while True:
+                skip(',')
+                if pos >= len(buffer):
+                    raise truncated("']'")
+                if buffer[pos] == ']':
+                    pos += 1
+                    break
+                yield decode()
+
+
+def iter_ndjson_simulations(file_path: str, metadata: dict):
+    """
+    Streams simulations from an NDJSON input file (one JSON object per line).
+
+    Lines without 'parameters' are treated as metadata (e.g. {"seed": 42}).
+
+    Args:
+        file_path (str): The path of the NDJSON file.
+        metadata (dict): Receives the fields of the metadata lines.
+
+    Yields:
+        dict: Each simulation, in file order.
+    """
+    with open(file_path, 'r', encoding='utf-8') as file:
+        for line in file:
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            if 'parameters' in item:
+                yield item
+            else:
+                metadata.update(item)
+
+
+def iter_simulations(file_path: str, metadata: dict):
+    """
+    Streams simulations from a JSON or NDJSON (.ndjson/.jsonl) input file.
+
+    Args:
+        file_path (str): The path of the input file.
+        metadata (dict): Receives the top-level fields other than the simulations.
+
+    Returns:
+        Iterator[dict]: The simulations, in file order.
+    """
+    if file_path.endswith(('.ndjson', '.jsonl')):
+        return iter_ndjson_simulations(file_path, metadata)
+    return iter_json_simulations(file_path, metadata)
+
+
+def set_path_group(simulation: dict, groups: dict, calibration: dict = None) -> float:
+    """
+    Sets the 'path_group' parameter of a simulation from the groups found by the first pass of split_json_streaming.
+
+    Args:
+        simulation (dict): The simulation.
+        groups (dict): The groups by path_group_key, with their 'path_group', 'count' and per-simulation 'cost'.
+        calibration (dict): Optional cost calibration (see estimate_cost).
+
+    Returns:
+        float: The estimated cost of the simulation.
+    """
+    group = groups.get(path_group_key(simulation['parameters'])) if groups else None
+    if group is None:
+        return estimate_cost(simulation['parameters'], calibration)
+    if group['count'] > 1:
+        simulation['parameters'] = {**simulation['parameters'], 'path_group': group['path_group']}
+    return group['cost']
+
+
+@tracing.traced('split', 'input_file_name')
+def split_json_streaming(input_file_name, num_parts=config.NUM_PARTS, calibration=None, upload=True, cache=None, download=True):
+    """
+    Splits the input file into parts while streaming it, uploading each part to the 'temp' container
+    as soon as it is closed.
+
+    A first pass only sums the estimated costs and finds the path groups; the second pass writes compact
+    parts with contiguous ranges of simulations of roughly equal cost, splitting simulations larger than
+    one part by path range. The simulations of a path group are not kept together: each part prices the
+    members it receives over the same paths, so a group may straddle parts.
+
+    Args:
+        input_file_name (str): The name of the input blob (JSON or NDJSON).
+        num_parts (int): The number of parts.
+        calibration (dict): Optional cost calibration (see estimate_cost).
+        upload (bool): Whether to upload the parts while splitting.
+        cache (ResultCache): Optional result cache; cached simulations are left out of the parts.
+        download (bool): Whether to download the input file (False if it is already in src/files/input).
+
+    Returns:
+        tuple: The list of part file paths and the list of uploaded resource files (empty if upload is False).
+    """
+    input_file_path = f'src/files/input/{input_file_name}'
+    if download:
+        download_input_file(input_file_name)
+
+    # Primeira passada: custo total e grupos de caminhos compartilhados, sem manter as simulações em memória
+    metadata = {}
+    total_cost = 0.0
+    groups = {}
+    for index, simulation in enumerate(iter_simulations(input_file_path, metadata)):
+        params = simulation['parameters']
+        key = path_group_key(params) if config.SHARED_PATHS else None
+        if key is None:
+            total_cost += estimate_cost(params, calibration)
+        elif key in groups:
+            groups[key]['count'] += 1
+        else:
+            groups[key] = {'path_group': path_group_id(key), 'params': params, 'count': 1}
+    for group in groups.values():
+        # Custo de cada simulação do grupo: o custo do grupo dividido igualmente
+        group['cost'] = estimate_group_cost([group['params']] * group['count'], calibration) / group['count']
+        total_cost += group['cost'] * group['count']
+    logger.info(f"Path groups: {sum(1 for group in groups.values() if group['count'] > 1)}")
+    metadata.setdefault('seed', default_seed(metadata))
+    header = json.dumps(metadata, ensure_ascii=False, separators=(',', ':'))[:-1]
+
+    # Simulações com resultado em cache ficam fora das partes (a semente só é conhecida após a primeira passada)
+    cached_indexes = set()
+    if cache is not None:
+        for index, simulation in enumerate(iter_simulations(input_file_path, {})):
+            simulation.setdefault('simulation_index', index)
+            simulation.setdefault('seed_key', seed_key(simulation['parameters']))
+            cost = set_path_group(simulation, groups, calibration)
+            if cache.lookup(simulation, metadata):
+                cached_indexes.add(index)
+                total_cost -= cost
+        logger.info(f'Result cache: {cache.report()}')
+    target_cost = total_cost / num_parts
+
+    if upload:
+        storage_impl.create_container_if_not_exists('temp')
+
+    output_files = []
+    part_costs = []
+    uploads = []
+    with ThreadPoolExecutor(max_workers=config.TRANSFER_CONCURRENCY) as executor:
+        outfile = None
+        cumulative_cost = 0.0
+
+        def close_part():
+            outfile.write(']}')
+            outfile.close()
+            if upload:
+                uploads.append(executor.submit(storage_impl.upload_file_to_container, 'temp', output_files[-1]))
+
+        # Segunda passada: grava cada simulação (ou faixa de caminhos) na parte corrente
+        for index, simulation in enumerate(iter_simulations(input_file_path, {})):
+            if index in cached_indexes:
+                continue
+            simulation.setdefault('simulation_index', index)
+            simulation.setdefault('seed_key', seed_key(simulation['parameters']))
+            cost = set_path_group(simulation, groups, calibration)
+            if cache is not None:
+                simulation['cache_key'] = cache.key(simulation, metadata)
+            if cost > target_cost > 0 and can_split_by_path_range(simulation['parameters']):
+                items = split_by_path_range(simulation, math.ceil(cost / target_cost))
+            else:
+                items = [simulation]
+
+            for item in items:
+                # A simulação vai para a parte em que cai o ponto médio do seu custo acumulado
+                item_cost = cost / len(items)
+                if outfile is not None and len(output_files) < num_parts and cumulative_cost + item_cost / 2 > target_cost * len(output_files):
+                    close_part()
+                    outfile = None
+
+                if outfile is None:
+                    output_files.append(f'src/files/temp/monte_carlo_input_part_{len(output_files)+1}.json')
+                    outfile = open(output_files[-1], 'w', encoding='utf-8')
+                    outfile.write(header + ',"simulations":[')
+                    part_costs.append(0.0)
+                else:
+                    outfile.write(',')
+                json.dump(item, outfile, ensure_ascii=False, separators=(',', ':'))
+
+                part_costs[-1] += item_cost
+                cumulative_cost += item_cost
+
+        if outfile is not None:
+            close_part()
+
+    mean_cost = sum(part_costs) / len(part_costs) if part_costs else 0.0
+    logger.info(f"Predicted part costs: {part_costs} - imbalance: {max(part_costs) / mean_cost if mean_cost else 1.0:.3f}")
+
+    return output_files, [future.result() for future in uploads]
+
+
 def main():
     # Exemplo de uso
-    split_json('monte_carlo_input.json', 4)
+    split_json('monte_carlo_input.json', config.NUM_PARTS)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -17,6 +17,7 @@
 # Please note that storing the batch and storage account keys in Azure Key Vault
 # is a better practice for Production usage.
 
+import datetime
 import os
 from dotenv import load_dotenv
 
@@ -35,9 +36,35 @@ STORAGE_ACCOUNT_NAME = os.getenv('STORAGE_ACCOUNT_NAME')
 STORAGE_ACCOUNT_KEY = os.getenv('STORAGE_ACCOUNT_KEY')
 STORAGE_ACCOUNT_DOMAIN = 'blob.core.windows.net' # Your storage account blob service domain
 
+BACKEND = os.getenv('XVA_BACKEND', 'azure')  # 'azure' (Batch + Blob Storage) or 'local' (local processes + directories)
+LOCAL_BACKEND_DIR = 'src/files/local'  # Local backend: containers and task working directories
+
 POOL_ID = 'xva-pool'  # Your Pool ID
 POOL_NODE_COUNT = 2  # Pool node count
 POOL_VM_SIZE = 'STANDARD_D2_v3'  # VM Type/Size
+POOL_VM_CORES = 2  # vCPUs of POOL_VM_SIZE
+POOL_CORES_PER_TASK = 1  # Processes (montecarlo_app --workers) of each task
+POOL_TASK_SLOTS_PER_NODE = max(POOL_VM_CORES // POOL_CORES_PER_TASK, 1)  # Tasks run at the same time on a node
+POOL_TASK_SCHEDULING = 'spread'  # 'spread' (tasks spread across nodes) or 'pack' (fill each node's slots first)
+POOL_SIZING = 'workload'  # 'fixed' (POOL_NODE_COUNT), 'workload' (sized by the input) or 'autoscale'
+POOL_MAX_NODES = 20  # Upper bound of the workload-driven or autoscaled pool
+POOL_TARGET_WALL_TIME = datetime.timedelta(minutes=10)  # Target time to run all tasks of an input
+POOL_NODE_PATH_STEPS_PER_SECOND = 5e7  # Measured throughput of one POOL_VM_SIZE node, all slots busy (path steps per second)
+POOL_AUTOSCALE_EVALUATION_INTERVAL = datetime.timedelta(minutes=5)  # Autoscale evaluation interval (minimum 5 minutes)
+POOL_LOW_PRIORITY_SHARE = 0.0  # Share of the planned nodes run as low-priority (preemptible) nodes
+TASK_MAX_RETRY_COUNT = 3  # Retries of a failed or preempted task; retries resume from the task checkpoint
+CHECKPOINT_INTERVAL = 60  # Seconds between checkpoints of the completed simulations of a task (0: no checkpoint)
 JOB_ID = 'xva-job'  # Job ID
 STANDARD_OUT_FILE_NAME = 'stdout.txt'  # Standard Output file
 APP_ID = "montecarlo_app"  # Application ID
+NODE_RUNTIME = 'pip'  # 'pip' (apt-get/pip on every node boot) or 'wheelhouse' (package built with --wheelhouse)
+NUM_PARTS = POOL_NODE_COUNT * POOL_TASK_SLOTS_PER_NODE  # Number of input parts (Batch tasks) created by client.split_json: one per task slot
+SHARED_PATHS = True  # Price simulations with the same underlying, path count and steps over shared paths (client.assign_path_groups)
+TRANSFER_CONCURRENCY = 4  # Number of blobs uploaded/downloaded in parallel
+BLOB_MAX_CONCURRENCY = 2  # Number of parallel connections (chunks) per blob transfer
+ENGINE_VERSION = '5'  # Version of the pricing engine; bump it whenever montecarlo_app results change
+CACHE_LOCATION = 'src/files/cache'  # Result cache: a local directory or 'container:<name>'
+CACHE_MAX_BYTES = 1024 * 1024 * 1024  # Result cache size limit
+CACHE_MAX_AGE = datetime.timedelta(days=7)  # Result cache entry age limit
+TRACE_DIR = 'src/files/trace'  # Stage timing trace of each orchestrator run (Chrome trace JSON)
+LOCAL_TASK_SLOTS = max((os.cpu_count() or 1) // POOL_CORES_PER_TASK, 1)  # Tasks run at the same time by the local backend
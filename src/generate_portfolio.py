@@ -0,0 +1,93 @@
+import argparse
+import json
+import numpy as np
+
+OPTION_TYPES = ('call', 'put', 'asian_call', 'asian_put')
+PATH_COUNTS = (1000, 5000, 10000, 50000)
+STEP_COUNTS = (1, 12, 52, 252)
+
+
+def iter_synthetic_simulations(num_trades: int, seed: int = 0, path_counts=PATH_COUNTS, step_counts=STEP_COUNTS, option_types=OPTION_TYPES):
+    """
+    Generates random but reproducible simulations, with varied path counts, step counts and option types.
+
+    Args:
+        num_trades (int): The number of simulations.
+        seed (int): The seed of the generator; the same seed gives the same portfolio.
+        path_counts (Sequence[int]): The num_simulations values to draw from.
+        step_counts (Sequence[int]): The num_steps values to draw from.
+        option_types (Sequence[str]): The option_type values to draw from.
+
+    Yields:
+        dict: Each simulation, in the input file format.
+    """
+    rng = np.random.default_rng(seed)
+    # Gerados em blocos para não manter carteiras grandes em memória
+    for start in range(0, num_trades, 10000):
+        n = min(10000, num_trades - start)
+        num_simulations = rng.choice(path_counts, n)
+        num_steps = rng.choice(step_counts, n)
+        option_type = rng.choice(option_types, n)
+        stock_price = rng.uniform(50, 150, n)
+        moneyness = rng.uniform(0.8, 1.2, n)
+        risk_free_rate = rng.uniform(0.0, 0.06, n)
+        volatility = rng.uniform(0.1, 0.5, n)
+        time_to_maturity = rng.uniform(0.25, 5.0, n)
+        for i in range(n):
+            yield {
+                "project": f"Trade sintetico {start + i + 1}",
+                "parameters": {
+                    "num_simulations": int(num_simulations[i]),
+                    "num_steps": int(num_steps[i]),
+                    "stock_price": round(float(stock_price[i]), 2),
+                    "strike_price": round(float(stock_price[i] * moneyness[i]), 2),
+                    "risk_free_rate": round(float(risk_free_rate[i]), 4),
+                    "volatility": round(float(volatility[i]), 4),
+                    "time_to_maturity": round(float(time_to_maturity[i]), 4),
+                    "option_type": str(option_type[i]),
+                }
+            }
+
+
+def write_portfolio(output_file: str, num_trades: int, seed: int = 0, **kwargs) -> int:
+    """
+    Writes a synthetic portfolio as a JSON input file, or as NDJSON if output_file ends in .ndjson/.jsonl.
+
+    The file is written while the simulations are generated, so any size fits in memory.
+
+    Args:
+        output_file (str): The path of the input file.
+        num_trades (int): The number of simulations.
+        seed (int): The seed of the generator.
+        **kwargs: Passed to iter_synthetic_simulations.
+
+    Returns:
+        int: The size of the file, in bytes.
+    """
+    simulations = iter_synthetic_simulations(num_trades, seed, **kwargs)
+    with open(output_file, 'w', encoding='utf-8') as file:
+        if output_file.endswith(('.ndjson', '.jsonl')):
+            for simulation in simulations:
+                file.write(json.dumps(simulation, ensure_ascii=False) + '\n')
+        else:
+            file.write('{"simulations": [')
+            for i, simulation in enumerate(simulations):
+                file.write((',\n' if i else '\n') + json.dumps(simulation, ensure_ascii=False))
+            file.write('\n]}\n')
+        return file.tell()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Gera uma carteira sintética no formato do arquivo de entrada.')
+    parser.add_argument('output_file', help='Arquivo de saída (.json, ou .ndjson/.jsonl)')
+    parser.add_argument('--trades', type=int, default=1000, help='Número de simulações (ex.: 1000 a 1000000)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--paths', type=int, nargs='+', default=list(PATH_COUNTS), help='Valores de num_simulations sorteados')
+    parser.add_argument('--steps', type=int, nargs='+', default=list(STEP_COUNTS), help='Valores de num_steps sorteados')
+    args = parser.parse_args()
+
+    size = write_portfolio(args.output_file, args.trades, args.seed, path_counts=args.paths, step_counts=args.steps)
+    print(f"{args.trades} simulações gravadas em {args.output_file} ({size / 1e6:.1f} MB)")
+
+if __name__ == "__main__":
+    main()
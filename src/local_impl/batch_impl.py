@@ -0,0 +1,326 @@
+import logging
+import config
+import tracing
+import datetime
+import os
+import shutil
+import subprocess
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeoutError
+import local_impl.storage_impl as storage_impl
+
+
+logger = logging.getLogger(__name__)
+
+# O mesmo ponto de entrada do pacote de aplicação, executado direto do template
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src-montecarlo-app', 'montecarlo_app_template.py')
+
+# Cada tarefa tem um diretório de trabalho em TASKS_DIR/<job>/<tarefa>/wd, como nos nós do Batch
+TASKS_DIR = os.path.abspath(os.path.join(config.LOCAL_BACKEND_DIR, 'tasks'))
+
+# Pools locais: um executor com um slot por tarefa simultânea
+POOLS = {}
+
+# Jobs locais: pool e tarefas de cada job
+JOBS = {}
+
+
+class LocalTask:
+    """
+    A task of a local job, with the fields of the Batch task that the pipeline uses.
+    """
+
+    def __init__(self, task_id: str):
+        self.id = task_id
+        self.future = None
+        self.creation_time = datetime.datetime.now(datetime.timezone.utc)
+        self.start_time = None
+        self.end_time = None
+        self.slot = None
+
+    @property
+    def state(self) -> str:
+        return 'completed' if self.future.done() else 'active'
+
+
+@tracing.traced('pool', 'pool_id')
+def create_pool(pool_id: str, node_count: int = config.POOL_NODE_COUNT, autoscale_formula: str = None, low_priority_node_count: int = 0):
+    """
+    Creates a local pool: a thread pool that runs each task as a montecarlo_app process.
+
+    The machine is a single node with config.LOCAL_TASK_SLOTS slots, so node_count,
+    autoscale_formula and low_priority_node_count are ignored.
+
+    Args:
+        pool_id (str): The ID of the pool to be created.
+        node_count (int): Ignored (see above).
+        autoscale_formula (str): Ignored (see above).
+        low_priority_node_count (int): Ignored (see above).
+
+    Returns:
+        None
+    """
+    logger.info(f'Creating pool [{pool_id}]...')
+    if pool_id in POOLS:
+        logger.info(f"Pool already exists.")
+        return
+    POOLS[pool_id] = ThreadPoolExecutor(max_workers=config.LOCAL_TASK_SLOTS)
+    logger.info(f'Pool [{pool_id}] has {config.LOCAL_TASK_SLOTS} task slots (requested: {node_count} nodes)')
+
+
+def scale_pool(pool_id: str, node_count: int, autoscale_formula: str = None, low_priority_node_count: int = 0):
+    """
+    Does nothing: a local pool always has config.LOCAL_TASK_SLOTS slots.
+    """
+
+
+@tracing.traced('pool', 'job_id')
+def create_job(job_id: str, pool_id: str):
+    """
+    Creates a job with the specified job ID and associates it with the specified pool ID.
+
+    Args:
+        job_id (str): The ID of the job to be created.
+        pool_id (str): The ID of the pool to associate with the job.
+
+    Returns:
+        None
+    """
+    logger.info(f'Creating job [{job_id}]...')
+    if job_id in JOBS:
+        logger.info(f"Job already exists.")
+        return
+    JOBS[job_id] = {'pool_id': pool_id, 'tasks': {}}
+
+
+def list_batch_application():
+    """
+    Lists the local application (the montecarlo_app template).
+
+    Returns:
+        None
+    """
+    logger.info(f'Applications')
+    print(f'Application Id = {config.APP_ID} - Path: {APP_PATH}')
+
+
+def application_package_dir(application_id: str, application_version: str) -> str:
+    """
+    Returns the directory of the local application.
+    """
+    return os.path.dirname(APP_PATH)
+
+
+def report_start_task_durations(pool_id: str):
+    """
+    Local pools have no start task.
+
+    Returns:
+        list: An empty list.
+    """
+    return []
+
+
+def trace_task_execution(job_id: str, task_ids: list):
+    """
+    Adds the queueing and compute time of each task to the trace of the run.
+
+    Args:
+        job_id (str): The ID of the job.
+        task_ids (list): The IDs of the tasks of the run.
+
+    Returns:
+        None
+    """
+    for task_id in task_ids:
+        task = JOBS[job_id]['tasks'][task_id]
+        tracing.add_span('queued', 'queue', task.creation_time, task.start_time, lane=task.slot, task_id=task.id)
+        tracing.add_span('compute', 'compute', task.start_time, task.end_time, lane=task.slot, task_id=task.id)
+
+
+def get_lastest_version_batch_application(application_id: str):
+    """
+    Returns the version of the local application.
+    """
+    return 'local'
+
+
+def run_task(task: LocalTask, task_dir: str, resource_file: storage_impl.ResourceFile) -> int:
+    """
+    Runs a task like a Batch node: downloads its resource file to the working directory
+    and runs montecarlo_app on it, saving stdout.txt and stderr.txt in the task directory.
+
+    A failed run is retried up to config.TASK_MAX_RETRY_COUNT times, resuming from its checkpoint.
+
+    Args:
+        task (LocalTask): The task, which receives its start and end times.
+        task_dir (str): The directory of the task.
+        resource_file (storage_impl.ResourceFile): The input file of the task.
+
+    Returns:
+        int: The exit code of the task.
+    """
+    task.start_time = datetime.datetime.now(datetime.timezone.utc)
+    task.slot = threading.current_thread().name
+    working_dir = os.path.join(task_dir, 'wd')
+    os.makedirs(working_dir, exist_ok=True)
+    input_path = os.path.join(working_dir, resource_file.file_path)
+    shutil.copyfile(resource_file.http_url, input_path)
+
+    # O app envia os resultados para o diretório local dos containers em vez do Blob Storage
+    env = {**os.environ, 'MONTECARLO_LOCAL_STORAGE_DIR': os.path.abspath(storage_impl.STORAGE_DIR)}
+    command = [sys.executable, APP_PATH, input_path, '--workers', str(config.POOL_CORES_PER_TASK),
+               '--checkpoint-interval', str(config.CHECKPOINT_INTERVAL)]
+
+    with open(os.path.join(task_dir, 'stdout.txt'), 'wb') as stdout, open(os.path.join(task_dir, 'stderr.txt'), 'wb') as stderr:
+        try:
+            for attempt in range(config.TASK_MAX_RETRY_COUNT + 1):
+                returncode = subprocess.run(command, cwd=working_dir, env=env, stdout=stdout, stderr=stderr).returncode
+                if returncode == 0:
+                    break
+                logger.warning(f'Task [{task.id}] failed with exit code {returncode} (attempt {attempt + 1})')
+            return returncode
+        finally:
+            task.end_time = datetime.datetime.now(datetime.timezone.utc)
+
+
+@tracing.traced('submit', 'job_id')
+def add_tasks(job_id: str, resource_input_files: list, timestap: int):
+    """
+    Adds tasks to the specified job; they start as soon as a slot of the pool is free.
+
+    Args:
+        job_id (str): The ID of the job.
+        resource_input_files (list): The list of input files for the tasks.
+        timestap (int): The timestamp to be used in task IDs.
+
+    Returns:
+        list: The IDs of the tasks, in the order of the input files.
+    """
+    logger.info(f'Creating tasks to job [{job_id}]...')
+
+    job = JOBS[job_id]
+    executor = POOLS[job['pool_id']]
+    task_ids = []
+
+    for idx, input_file in enumerate(resource_input_files):
+
+        id_task=f'Task-{timestap}-{idx}'
+        task_dir = os.path.join(TASKS_DIR, job_id, id_task)
+        task = LocalTask(id_task)
+        task.future = executor.submit(run_task, task, task_dir, input_file)
+        job['tasks'][id_task] = task
+        task_ids.append(id_task)
+        logger.info(f'Created tasks [{id_task}]')
+
+    print()
+    return task_ids
+
+
+def iter_completed_tasks(job_id: str, timeout: datetime.timedelta, min_interval: float = 1.0, max_interval: float = 30.0):
+    """
+    Yields each task of the specified job as soon as it completes.
+
+    Args:
+        job_id (str): The ID of the job.
+        timeout (datetime.timedelta): The timeout period.
+        min_interval (float): Unused; completions are notified without polling.
+        max_interval (float): Unused; completions are notified without polling.
+
+    Yields:
+        LocalTask: Each completed task.
+    """
+    tasks = {task.future: task for task in JOBS[job_id]['tasks'].values()}
+    try:
+        for future in as_completed(tasks, timeout=timeout.total_seconds()):
+            yield tasks[future]
+    except FuturesTimeoutError:
+        raise RuntimeError("ERROR: Tasks did not reach 'Completed' state within "
+                           "timeout period of " + str(timeout))
+
+
+def wait_for_tasks_to_complete(job_id: str, timeout: datetime.timedelta):
+    """
+    Waits for all tasks in the specified job to complete within the given timeout period.
+
+    Args:
+        job_id (str): The ID of the job.
+        timeout (datetime.timedelta): The timeout period.
+
+    Returns:
+        bool: True if all tasks completed within the timeout period, otherwise raises an exception.
+    """
+    print(f"Monitoring all tasks for 'Completed' state, timeout in {timeout}...", end='')
+
+    for task in iter_completed_tasks(job_id, timeout):
+        print('.', end='')
+        sys.stdout.flush()
+
+    print()
+    return True
+
+
+def print_task_output(job_id: str, timestap: str):
+    """
+    Prints the exit code of the tasks in the specified job, and the stderr of the failed ones.
+
+    Args:
+        job_id (str): The ID of the job.
+        timestap (str): The timestamp to filter tasks by.
+
+    Returns:
+        None
+    """
+    logger.info('Printing task output...')
+
+    for task in JOBS[job_id]['tasks'].values():
+        if str(timestap) in task.id and task.future.done():
+            exit_code = task.future.result()
+            logger.info(f"Task: {task.id}")
+            logger.info(f"Exit code: {exit_code}")
+            if exit_code != 0:
+                with open(os.path.join(TASKS_DIR, job_id, task.id, 'stderr.txt'), 'r') as stderr:
+                    logger.error(stderr.read())
+            print()
+
+
+def print_batch_exception(batch_exception):
+    """
+    Prints details of the specified exception.
+
+    Args:
+        batch_exception (Exception): The exception to print.
+
+    Returns:
+        None
+    """
+    logger.error('-------------------------------------------')
+    logger.error('Exception encountered:')
+    logger.error(str(batch_exception))
+    logger.error('-------------------------------------------')
+
+
+def delete_all_pools():
+    """
+    Deletes all pools, waiting for their running tasks.
+
+    Returns:
+        None
+    """
+    for pool_id, executor in list(POOLS.items()):
+        logger.info(f'Deleting pool [{pool_id}]...')
+        executor.shutdown()
+        del POOLS[pool_id]
+
+
+def delete_all_jobs():
+    """
+    Deletes all jobs.
+
+    Returns:
+        None
+    """
+    for job_id in list(JOBS):
+        logger.info(f'Deleting job [{job_id}]...')
+        del JOBS[job_id]
@@ -0,0 +1,256 @@
+import config
+import tracing
+import os
+import shutil
+import logging
+import datetime
+import collections
+from concurrent.futures import ThreadPoolExecutor
+
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+# Cada container é um diretório em STORAGE_DIR e cada blob um arquivo dentro dele
+STORAGE_DIR = os.path.join(config.LOCAL_BACKEND_DIR, 'storage')
+
+# Mesmos campos usados de batchmodels.ResourceFile: http_url aponta para o arquivo do blob
+ResourceFile = collections.namedtuple('ResourceFile', ['http_url', 'file_path'])
+
+
+def blob_path(container_name: str, blob_name: str) -> str:
+    """
+    Returns the local path of a blob.
+
+    Args:
+        container_name (str): The name of the container.
+        blob_name (str): The name of the blob.
+
+    Returns:
+        str: The path of the file that holds the blob.
+    """
+    return os.path.join(STORAGE_DIR, container_name, blob_name)
+
+
+def create_container_if_not_exists(container_name: str):
+    """
+    Creates a container if it does not already exist.
+
+    Args:
+        container_name (str): The name of the container to create.
+
+    Returns:
+        None
+    """
+    os.makedirs(os.path.join(STORAGE_DIR, container_name), exist_ok=True)
+
+
+@tracing.traced('upload', 'container_name', 'file_path')
+def upload_file_to_container(container_name: str, file_path: str, max_concurrency: int = config.BLOB_MAX_CONCURRENCY) -> ResourceFile:
+    """
+    Copies a file to the specified container.
+
+    Args:
+        container_name (str): The name of the container to upload the file to.
+        file_path (str): The path of the file to upload.
+        max_concurrency (int): Unused; kept for compatibility with azure_impl.storage_impl.
+
+    Returns:
+        ResourceFile: The resource file pointing to the blob.
+    """
+    blob_name = os.path.basename(file_path)
+    create_container_if_not_exists(container_name)
+
+    logger.info(f'Uploading file {file_path} to container [{container_name}]...')
+    shutil.copyfile(file_path, blob_path(container_name, blob_name))
+
+    return ResourceFile(http_url=os.path.abspath(blob_path(container_name, blob_name)), file_path=blob_name)
+
+
+@tracing.traced('download', 'container_name', 'blob_name')
+def get_file_from_container(container_name: str, blob_name: str, download_path: str, max_concurrency: int = config.BLOB_MAX_CONCURRENCY) -> str:
+    """
+    Copies a blob of the specified container to a local path.
+
+    Args:
+        container_name (str): The name of the container.
+        blob_name (str): The name of the blob to download.
+        download_path (str): The path to download the file to.
+        max_concurrency (int): Unused; kept for compatibility with azure_impl.storage_impl.
+
+    Returns:
+        str: The path of the downloaded file.
+    """
+    shutil.copyfile(blob_path(container_name, blob_name), download_path)
+
+    logger.info(f'Blob {blob_name} downloaded to {download_path}.')
+    return download_path
+
+
+def upload_files_to_container(container_name: str, file_paths: list, max_workers: int = config.TRANSFER_CONCURRENCY) -> list:
+    """
+    Copies many files to the specified container through a bounded thread pool.
+
+    Args:
+        container_name (str): The name of the container to upload the files to.
+        file_paths (list): The paths of the files to upload.
+        max_workers (int): The maximum number of files copied at once.
+
+    Returns:
+        list: The resource files, in the order of file_paths.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(lambda file_path: upload_file_to_container(container_name, file_path), file_paths))
+
+
+def get_files_from_container(container_name: str, blob_names: list, download_paths: list, max_workers: int = config.TRANSFER_CONCURRENCY):
+    """
+    Copies many blobs from the specified container through a bounded thread pool.
+
+    Args:
+        container_name (str): The name of the container.
+        blob_names (list): The names of the blobs to download.
+        download_paths (list): The paths to download the blobs to.
+        max_workers (int): The maximum number of blobs copied at once.
+
+    Yields:
+        str: The path of each downloaded file, in the order of blob_names.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(get_file_from_container, container_name, blob_name, download_path)
+            for blob_name, download_path in zip(blob_names, download_paths)
+        ]
+        for future in futures:
+            yield future.result()
+
+
+def upload_bytes_to_container(container_name: str, blob_name: str, data: bytes):
+    """
+    Writes in-memory data as a blob to the specified container.
+
+    Args:
+        container_name (str): The name of the container.
+        blob_name (str): The name of the blob.
+        data (bytes): The blob content.
+
+    Returns:
+        None
+    """
+    create_container_if_not_exists(container_name)
+    with open(blob_path(container_name, blob_name), 'wb') as file:
+        file.write(data)
+
+
+def get_blob_bytes(container_name: str, blob_name: str):
+    """
+    Reads a blob into memory.
+
+    Args:
+        container_name (str): The name of the container.
+        blob_name (str): The name of the blob.
+
+    Returns:
+        bytes: The blob content, or None if the blob does not exist.
+    """
+    try:
+        with open(blob_path(container_name, blob_name), 'rb') as file:
+            return file.read()
+    except FileNotFoundError:
+        return None
+
+
+def blob_exists(container_name: str, blob_name: str) -> bool:
+    """
+    Checks whether a blob exists.
+
+    Args:
+        container_name (str): The name of the container.
+        blob_name (str): The name of the blob.
+
+    Returns:
+        bool: True if the blob exists.
+    """
+    return os.path.isfile(blob_path(container_name, blob_name))
+
+
+def list_blobs_with_properties(container_name: str) -> list:
+    """
+    Lists the blobs of a container with their size and last modification time.
+
+    Args:
+        container_name (str): The name of the container.
+
+    Returns:
+        list: Tuples (name, size, last_modified) for each blob.
+    """
+    blobs = []
+    with os.scandir(os.path.join(STORAGE_DIR, container_name)) as entries:
+        for entry in entries:
+            if entry.is_file():
+                stat = entry.stat()
+                blobs.append((entry.name, stat.st_size, datetime.datetime.fromtimestamp(stat.st_mtime, datetime.timezone.utc)))
+    return blobs
+
+
+def delete_blob(container_name: str, blob_name: str):
+    """
+    Deletes a blob.
+
+    Args:
+        container_name (str): The name of the container.
+        blob_name (str): The name of the blob.
+
+    Returns:
+        None
+    """
+    os.remove(blob_path(container_name, blob_name))
+
+
+class BlockBlobUploader:
+    """
+    Writes a blob incrementally; the blob only appears in the container when it is closed,
+    like the block list commit of azure_impl.storage_impl.BlockBlobUploader.
+    """
+
+    def __init__(self, container_name: str, blob_name: str, block_size: int = 4 * 1024 * 1024, max_concurrency: int = config.TRANSFER_CONCURRENCY):
+        """
+        Args:
+            container_name (str): The name of the container to upload the blob to.
+            blob_name (str): The name of the blob.
+            block_size (int): The write buffer size, in bytes.
+            max_concurrency (int): Unused; kept for compatibility with azure_impl.storage_impl.
+        """
+        create_container_if_not_exists(container_name)
+        self.path = blob_path(container_name, blob_name)
+        self.file = open(f'{self.path}.uploading', 'wb', buffering=block_size)
+
+        logger.info(f'Uploading blob {blob_name} to container [{container_name}] in blocks...')
+
+    def write(self, data: bytes):
+        """
+        Appends data to the blob.
+
+        Args:
+            data (bytes): The data to append.
+        """
+        self.file.write(data)
+
+    @tracing.traced('upload')
+    def close(self):
+        """
+        Flushes the data and publishes the blob.
+        """
+        self.file.close()
+        os.replace(self.file.name, self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.file.close()
+            os.remove(self.file.name)
@@ -1,23 +1,55 @@
-from client import split_json
-from agreggator import aggregate_and_save
+from client import split_json, split_json_streaming, download_input_file
+from agreggator import aggregate_and_save, ResultAggregator
 from worker import run_batch_process
-import azure_impl.batch_impl as batch_impl
+from result_cache import create_result_cache
+from pool_planner import plan_pool
+import config
+import tracing
+from backend import batch_impl
 
-def orchestrate(input_file):
+def orchestrate(input_file, streaming=False, use_cache=False, pipelined=False, pool_sizing=config.POOL_SIZING):
+
+    # Trace com a duração de cada estágio da execução, salvo mesmo se a execução falhar
+    tracing.start_trace()
+    try:
+        run_pipeline(input_file, streaming, use_cache, pipelined, pool_sizing)
+    finally:
+        tracing.save_trace(config.TRACE_DIR)
+
+def run_pipeline(input_file, streaming, use_cache, pipelined, pool_sizing):
     
-    # Dividir o arquivo de entrada
-    files_input = split_json(input_file)
+    # Cache de resultados: só as simulações ausentes do cache são enviadas ao Batch
+    cache = create_result_cache() if use_cache else None
+
+    # Tamanho do pool e número de partes a partir do custo estimado do arquivo de entrada
+    pool_plan = plan_pool(download_input_file(input_file), pool_sizing)
+
+    # Dividir o arquivo de entrada (no modo streaming, as partes já são enviadas ao container 'temp' durante a divisão)
+    resource_files = None
+    if streaming:
+        files_input, resource_files = split_json_streaming(input_file, pool_plan['num_parts'], cache=cache, download=False)
+    else:
+        files_input = split_json(input_file, pool_plan['num_parts'], cache=cache, download=False)
     
     # Montar a lista de arquivos que será processado para agregar no final
     files_output_path = [file.replace('input', 'result') for file in files_input]
     files_output = [file.replace('src/files/temp/', '') for file in files_output_path]
     
      
-    # Rodar o processo batch
-    run_batch_process(files_input)
+    # Modo pipeline: cada resultado é baixado e agregado assim que sua tarefa termina, enquanto as demais ainda rodam
+    if pipelined:
+        with ResultAggregator(cache) as aggregator:
+            if files_input:
+                run_batch_process(files_input, resource_files, pool_plan=pool_plan,
+                                  on_task_completed=lambda index: aggregator.add_part(files_output[index]))
+        return
+
+    # Rodar o processo batch (se todas as simulações estavam em cache, não há partes)
+    if files_input:
+        run_batch_process(files_input, resource_files, pool_plan=pool_plan)
         
     # Agregar os resultados
-    aggregate_and_save(files_output)
+    aggregate_and_save(files_output, cache)
 
 def main():
     # Exemplo de uso
@@ -0,0 +1,124 @@
+import argparse
+import datetime
+import json
+import logging
+import math
+import config
+import tracing
+from client import estimate_cost, iter_simulations
+
+logger = logging.getLogger(__name__)
+
+POOL_SIZING_MODES = ('fixed', 'workload', 'autoscale')
+
+
+def autoscale_formula(max_nodes: int, tasks_per_node: int = 1, low_priority_share: float = 0.0) -> str:
+    """
+    Builds an autoscale formula that sizes the pool by the tasks of its jobs.
+
+    While tasks are queued ($ActiveTasks), the pool grows to fit the largest backlog seen in the last
+    five minutes ($PendingTasks counts queued and running tasks), so it does not shrink between task
+    submissions. Once nothing is queued it follows the running tasks down, reaching zero nodes when idle.
+    Nodes are only removed after their running tasks complete.
+
+    Args:
+        max_nodes (int): The maximum number of nodes (dedicated and low-priority).
+        tasks_per_node (int): The number of tasks a node runs at the same time.
+        low_priority_share (float): The share of the nodes that are low-priority (preemptible).
+
+    Returns:
+        str: The autoscale formula.
+    """
+    return (
+        '$active = max(0, $ActiveTasks.GetSample(1));\n'
+        '$pending = max(0, $PendingTasks.GetSample(1));\n'
+        '$backlog = $PendingTasks.GetSamplePercent(TimeInterval_Minute * 5) < 70 ? $pending : '
+        'max($pending, max($PendingTasks.GetSample(TimeInterval_Minute * 5)));\n'
+        '$tasks = $active > 0 ? $backlog : $pending;\n'
+        f'$nodes = min({max_nodes}, ceil($tasks / {tasks_per_node}));\n'
+        f'$TargetLowPriorityNodes = floor($nodes * {low_priority_share});\n'
+        '$TargetDedicatedNodes = $nodes - $TargetLowPriorityNodes;\n'
+        '$NodeDeallocationOption = taskcompletion;'
+    )
+
+
+@tracing.traced('plan')
+def plan_pool(input_file_path: str, pool_sizing: str = config.POOL_SIZING,
+              target_wall_time: datetime.timedelta = config.POOL_TARGET_WALL_TIME,
+              node_throughput: float = config.POOL_NODE_PATH_STEPS_PER_SECOND,
+              max_nodes: int = config.POOL_MAX_NODES, calibration: dict = None,
+              low_priority_share: float = config.POOL_LOW_PRIORITY_SHARE) -> dict:
+    """
+    Plans the pool size and the number of parts for an input file, without calling Azure.
+
+    The simulated path steps of all simulations (paths x effective steps, so a European call or put
+    counts a single step; see client.effective_num_steps) are divided by the throughput of one node
+    to get the node count that finishes the workload within the target wall time. Each node runs
+    config.POOL_TASK_SLOTS_PER_NODE tasks at the same time, so there is one part per task slot.
+    A low_priority_share of the nodes is requested as low-priority nodes; preempted tasks are retried
+    and resume from their checkpoint.
+
+    Args:
+        input_file_path (str): The path of the local input file (JSON or NDJSON).
+        pool_sizing (str): 'fixed' (config.POOL_NODE_COUNT and config.NUM_PARTS), 'workload' (fixed
+            size computed from the workload) or 'autoscale' (the computed size is the autoscale maximum).
+        target_wall_time (datetime.timedelta): The target time to run all tasks.
+        node_throughput (float): The path steps one node simulates per second.
+        max_nodes (int): The maximum number of nodes.
+        calibration (dict): Optional cost calibration (see client.estimate_cost); by default the cost is in path steps.
+        low_priority_share (float): The share of the nodes that are low-priority (preemptible).
+
+    Returns:
+        dict: The plan, with 'pool_sizing', 'total_path_steps', 'node_count' (dedicated nodes),
+            'low_priority_node_count', 'num_parts', 'estimated_wall_time_seconds' and 'autoscale_formula'
+            (None unless pool_sizing is 'autoscale').
+    """
+    if pool_sizing not in POOL_SIZING_MODES:
+        raise ValueError(f"Unknown pool sizing '{pool_sizing}'. Supported: {', '.join(POOL_SIZING_MODES)}")
+    if not 0.0 <= low_priority_share <= 1.0:
+        raise ValueError(f"low_priority_share must be between 0 and 1, got {low_priority_share}")
+
+    total_path_steps = sum(estimate_cost(simulation['parameters'], calibration) for simulation in iter_simulations(input_file_path, {}))
+    total_seconds = total_path_steps / node_throughput
+
+    if pool_sizing == 'fixed':
+        node_count, num_parts = config.POOL_NODE_COUNT, config.NUM_PARTS
+    else:
+        node_count = min(max(math.ceil(total_seconds / target_wall_time.total_seconds()), 1), max_nodes)
+        num_parts = node_count * config.POOL_TASK_SLOTS_PER_NODE
+
+    low_priority_node_count = math.floor(node_count * low_priority_share)
+
+    plan = {
+        'pool_sizing': pool_sizing,
+        'total_path_steps': total_path_steps,
+        'node_count': node_count - low_priority_node_count,
+        'low_priority_node_count': low_priority_node_count,
+        'num_parts': num_parts,
+        'estimated_wall_time_seconds': total_seconds / node_count,
+        'autoscale_formula': autoscale_formula(node_count, config.POOL_TASK_SLOTS_PER_NODE, low_priority_share) if pool_sizing == 'autoscale' else None,
+    }
+    logger.info(f"Pool plan: {plan['node_count']} dedicated and {low_priority_node_count} low-priority nodes, {num_parts} parts, "
+                f"{total_path_steps:.3g} path steps, ~{plan['estimated_wall_time_seconds']:.0f}s")
+    return plan
+
+
+def main():
+    # Planejamento offline (dry run): nenhum recurso do Azure é criado
+    parser = argparse.ArgumentParser(description='Plan the Batch pool size for a Monte Carlo input file.')
+    parser.add_argument('input_file', help='Local input file (JSON or NDJSON)')
+    parser.add_argument('--pool-sizing', choices=POOL_SIZING_MODES, default=config.POOL_SIZING)
+    parser.add_argument('--target-minutes', type=float, default=config.POOL_TARGET_WALL_TIME.total_seconds() / 60)
+    parser.add_argument('--node-throughput', type=float, default=config.POOL_NODE_PATH_STEPS_PER_SECOND,
+                        help='Path steps simulated per second by one node')
+    parser.add_argument('--max-nodes', type=int, default=config.POOL_MAX_NODES)
+    parser.add_argument('--low-priority-share', type=float, default=config.POOL_LOW_PRIORITY_SHARE,
+                        help='Share of the nodes run as low-priority (preemptible) nodes')
+    args = parser.parse_args()
+
+    plan = plan_pool(args.input_file, args.pool_sizing, datetime.timedelta(minutes=args.target_minutes),
+                     args.node_throughput, args.max_nodes, low_priority_share=args.low_priority_share)
+    print(json.dumps(plan, indent=4))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+import datetime
+import hashlib
+import io
+import json
+import logging
+import os
+import numpy as np
+import config
+from backend import storage_impl
+
+logger = logging.getLogger(__name__)
+
+# Campos de nível raiz do arquivo de entrada que alteram o conteúdo do resultado
+RESULT_OPTIONS = ('result_mode', 'raw_payoffs', 'quantile_sketch_size')
+
+# Arquivos de uma entrada: o resultado e, com raw_payoffs, os payoffs brutos
+ENTRY_SUFFIXES = ('.json', '.npy')
+
+
+class LocalCacheStore:
+    """
+    Stores cache entries as files in a local directory.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str, suffix: str = '.json') -> str:
+        return os.path.join(self.directory, f'{key}{suffix}')
+
+    def get(self, key: str, suffix: str = '.json'):
+        try:
+            with open(self._path(key, suffix), 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        # Atualiza a data de modificação para que a remoção por tamanho descarte as entradas menos usadas
+        os.utime(self._path(key, suffix))
+        return data
+
+    def contains(self, key: str) -> bool:
+        return os.path.exists(self._path(key))
+
+    def put(self, key: str, data: bytes, suffix: str = '.json'):
+        with open(self._path(key, suffix), 'wb') as f:
+            f.write(data)
+
+    def list(self) -> list:
+        entries = []
+        for name in os.listdir(self.directory):
+            key, suffix = os.path.splitext(name)
+            if suffix in ENTRY_SUFFIXES:
+                stat = os.stat(os.path.join(self.directory, name))
+                entries.append((key, stat.st_size, datetime.datetime.fromtimestamp(stat.st_mtime, datetime.timezone.utc)))
+        return entries
+
+    def delete(self, key: str):
+        for suffix in ENTRY_SUFFIXES:
+            try:
+                os.remove(self._path(key, suffix))
+            except FileNotFoundError:
+                pass
+
+
+class BlobCacheStore:
+    """
+    Stores cache entries as blobs in a storage container.
+    """
+
+    def __init__(self, container_name: str):
+        self.container_name = container_name
+        storage_impl.create_container_if_not_exists(container_name)
+
+    def get(self, key: str, suffix: str = '.json'):
+        return storage_impl.get_blob_bytes(self.container_name, f'{key}{suffix}')
+
+    def contains(self, key: str) -> bool:
+        return storage_impl.blob_exists(self.container_name, f'{key}.json')
+
+    def put(self, key: str, data: bytes, suffix: str = '.json'):
+        storage_impl.upload_bytes_to_container(self.container_name, f'{key}{suffix}', data)
+
+    def list(self) -> list:
+        return [
+            (os.path.splitext(name)[0], size, last_modified)
+            for name, size, last_modified in storage_impl.list_blobs_with_properties(self.container_name)
+            if os.path.splitext(name)[1] in ENTRY_SUFFIXES
+        ]
+
+    def delete(self, key: str):
+        for suffix in ENTRY_SUFFIXES:
+            if storage_impl.blob_exists(self.container_name, f'{key}{suffix}'):
+                storage_impl.delete_blob(self.container_name, f'{key}{suffix}')
+
+
+class ResultCache:
+    """
+    Content-addressed cache of simulation results.
+
+    The key of a simulation is the hash of its parameters, the input seed, its seed_key (which
+    selects its random substream and is derived from the trade content, not from its position in
+    the input file), the engine version and the result options, so a hit is exactly the result the
+    engine would produce again. Each entry holds the results (and, with raw_payoffs, the payoffs
+    as a .npy array next to them), not the simulation_index, so a trade keeps its entry when other
+    trades are added to or removed from the input file.
+    """
+
+    def __init__(self, store, max_bytes: int = config.CACHE_MAX_BYTES, max_age: datetime.timedelta = config.CACHE_MAX_AGE):
+        """
+        Args:
+            store: The storage backend (LocalCacheStore or BlobCacheStore).
+            max_bytes (int): The maximum total size of the cache; older entries are evicted first.
+            max_age (datetime.timedelta): Entries older than this are evicted.
+        """
+        self.store = store
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.hit_entries = []
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(simulation: dict, metadata: dict) -> str:
+        """
+        Computes the cache key of a simulation.
+
+        Args:
+            simulation (dict): The simulation, with its seed_key.
+            metadata (dict): The top-level fields of the input file (seed and result options).
+
+        Returns:
+            str: The hex SHA-256 of the canonical JSON of everything that determines the result.
+        """
+        content = {
+            'parameters': simulation['parameters'],
+            'seed': metadata.get('seed'),
+            'seed_key': simulation['seed_key'],
+            'engine_version': config.ENGINE_VERSION,
+            'options': {option: metadata[option] for option in RESULT_OPTIONS if option in metadata},
+        }
+        return hashlib.sha256(json.dumps(content, sort_keys=True, separators=(',', ':')).encode('utf-8')).hexdigest()
+
+    def lookup(self, simulation: dict, metadata: dict) -> bool:
+        """
+        Checks whether the result of a simulation is cached, recording the hit or miss.
+
+        On a hit, the key is kept with the fields of the simulation other than its parameters
+        (simulation_index...), which iter_hits joins back to the cached results. On a miss, the
+        key is stored in the simulation as 'cache_key' so its result can be added to the cache
+        after aggregation.
+
+        Args:
+            simulation (dict): The simulation, with its seed_key.
+            metadata (dict): The top-level fields of the input file.
+
+        Returns:
+            bool: True if the result is cached.
+        """
+        key = self.key(simulation, metadata)
+        if self.store.contains(key):
+            self.hits += 1
+            self.hit_entries.append((key, {field: value for field, value in simulation.items() if field not in ('parameters', 'results')}))
+            return True
+        self.misses += 1
+        simulation['cache_key'] = key
+        return False
+
+    def iter_hits(self):
+        """
+        Streams the cached simulations found by lookup.
+
+        Yields:
+            tuple: Each cached simulation, with the fields of the current input and the cached
+                results, and its raw payoffs (a float32 array), or None if they were not stored.
+        """
+        for key, fields in self.hit_entries:
+            data = self.store.get(key)
+            if data is None:
+                continue
+            entry = json.loads(data)
+            raw_payoffs = None
+            if 'raw_payoffs' in entry['results']:
+                raw_payoffs = np.load(io.BytesIO(self.store.get(key, '.npy')))
+            yield {**fields, 'parameters': entry['parameters'], 'results': entry['results']}, raw_payoffs
+
+    def put(self, simulation: dict, raw_payoffs=None):
+        """
+        Adds the result of a simulation to the cache, under the key recorded by lookup.
+
+        Args:
+            simulation (dict): The simulation with its results and 'cache_key'.
+            raw_payoffs (np.ndarray): The raw payoffs referenced by results['raw_payoffs'], stored with the entry.
+        """
+        key = simulation.pop('cache_key')
+        results = simulation['results']
+        if raw_payoffs is not None:
+            buffer = io.BytesIO()
+            np.save(buffer, raw_payoffs)
+            self.store.put(key, buffer.getvalue(), '.npy')
+            # A referência ao arquivo .npy da parte não vale fora desta execução: só a contagem é guardada
+            results = {**results, 'raw_payoffs': {'count': len(raw_payoffs)}}
+        entry = {'parameters': simulation['parameters'], 'results': results}
+        self.store.put(key, json.dumps(entry, separators=(',', ':')).encode('utf-8'))
+
+    def evict(self):
+        """
+        Removes entries older than max_age, then the oldest entries until the cache fits in max_bytes.
+
+        Returns:
+            int: The number of entries removed.
+        """
+        now = datetime.datetime.now(datetime.timezone.utc)
+        # O .json e o .npy de uma entrada contam juntos, com a data do mais recente
+        sizes = {}
+        modified = {}
+        for key, size, last_modified in self.store.list():
+            sizes[key] = sizes.get(key, 0) + size
+            modified[key] = max(modified.get(key, last_modified), last_modified)
+        removed = 0
+        total_bytes = sum(sizes.values())
+        for key in sorted(sizes, key=modified.get):
+            if now - modified[key] <= self.max_age and total_bytes <= self.max_bytes:
+                continue
+            self.store.delete(key)
+            total_bytes -= sizes[key]
+            removed += 1
+        return removed
+
+    def report(self) -> dict:
+        """
+        Returns the hit and miss counts of the lookups made so far.
+
+        Returns:
+            dict: The hits, misses and hit rate.
+        """
+        total = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses, 'hit_rate': self.hits / total if total else 0.0}
+
+
+def create_result_cache(location: str = config.CACHE_LOCATION) -> ResultCache:
+    """
+    Creates the result cache for a location: 'container:<name>' for a storage container,
+    or a local directory path.
+
+    Args:
+        location (str): The cache location.
+
+    Returns:
+        ResultCache: The cache.
+    """
+    if location.startswith('container:'):
+        return ResultCache(BlobCacheStore(location[len('container:'):]))
+    return ResultCache(LocalCacheStore(location))
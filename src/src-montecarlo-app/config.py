@@ -31,3 +31,7 @@ Create a .env FIle in the src directory
 STORAGE_ACCOUNT_NAME = os.getenv('STORAGE_ACCOUNT_NAME')
 STORAGE_ACCOUNT_KEY = os.getenv('STORAGE_ACCOUNT_KEY')
 
+# Runtime shipped in the application package (montecarlo_app_apppackage.py --wheelhouse).
+# Must match the python3 of the pool image (Ubuntu 20.04: Python 3.8).
+RUNTIME_PYTHON_VERSION = '3.8'
+RUNTIME_PLATFORM = 'manylinux2014_x86_64'
@@ -1,4 +1,9 @@
+import argparse
+import glob
+import hashlib
 import os
+import subprocess
+import sys
 import zipfile
 import config
 
@@ -9,12 +14,45 @@ def delete_file(file_path):
     else:
         print(f"File does not exist: {file_path}")
 
-def create_zip_file(zip_file_path, files_to_zip):
+def create_zip_file(zip_file_path, files_to_zip, base_dir=None):
+    # Com base_dir, os arquivos mantêm o caminho relativo a ele dentro do zip (ex.: wheelhouse/)
     with zipfile.ZipFile(zip_file_path, 'w') as zipf:
         for file in files_to_zip:
-            zipf.write(file, os.path.basename(file))
+            arcname = os.path.relpath(file, base_dir) if base_dir else os.path.basename(file)
+            zipf.write(file, arcname)
             print(f"Added {file} to zip file: {zip_file_path}")
 
+def build_wheelhouse(wheelhouse_dir, requirements_file='src/src-montecarlo-app/requirements.txt'):
+    """
+    Downloads the binary wheels of the app requirements for the Python of the pool nodes
+    and writes their SHA256SUMS, used by setup_runtime.sh as the runtime checksum.
+
+    Returns:
+        list: The paths of the wheels and of SHA256SUMS.
+    """
+    # Wheels de builds anteriores mudariam o checksum e seriam instaladas junto
+    for wheel in glob.glob(os.path.join(wheelhouse_dir, '*.whl')):
+        delete_file(wheel)
+
+    subprocess.run([
+        sys.executable, '-m', 'pip', 'download',
+        '--only-binary=:all:',
+        '--platform', config.RUNTIME_PLATFORM,
+        '--python-version', config.RUNTIME_PYTHON_VERSION,
+        '--dest', wheelhouse_dir,
+        '--requirement', requirements_file
+    ], check=True)
+
+    wheels = sorted(glob.glob(os.path.join(wheelhouse_dir, '*.whl')))
+    checksums_path = os.path.join(wheelhouse_dir, 'SHA256SUMS')
+    with open(checksums_path, 'w') as file:
+        for wheel in wheels:
+            with open(wheel, 'rb') as wheel_file:
+                digest = hashlib.sha256(wheel_file.read()).hexdigest()
+            file.write(f'{digest}  {os.path.basename(wheel)}\n')
+
+    return wheels + [checksums_path]
+
 def replace_storage_account_key():
     file_path_template = 'src/src-montecarlo-app/montecarlo_app_template.py'
     file_path = 'src/src-montecarlo-app/montecarlo_app.py'
@@ -32,14 +70,22 @@ def replace_storage_account_key():
 
 if __name__ == '__main__':
 
+    parser = argparse.ArgumentParser(description='Build the montecarlo_app application package.')
+    parser.add_argument('--wheelhouse', action='store_true',
+                        help='Ship the app dependencies as wheels, installed once per node by setup_runtime.sh')
+    args = parser.parse_args()
+
     replace_storage_account_key()
 
     zip_file_path = './src/src-montecarlo-app/montecarlo-app.zip'
     files_to_zip = [
-        './src/src-montecarlo-app/montecarlo_app.py'
+        './src/src-montecarlo-app/montecarlo_app.py',
+        './src/src-montecarlo-app/setup_runtime.sh'
     ]
+    if args.wheelhouse:
+        files_to_zip += build_wheelhouse('./src/src-montecarlo-app/wheelhouse')
     delete_file(zip_file_path)
-    create_zip_file(zip_file_path, files_to_zip)
+    create_zip_file(zip_file_path, files_to_zip, './src/src-montecarlo-app')
 
     app_file_path = 'src/src-montecarlo-app/montecarlo_app.py'
     delete_file(app_file_path)
\ No newline at end of file
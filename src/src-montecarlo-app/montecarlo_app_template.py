@@ -1,96 +1,1201 @@
 import numpy as np
 import json
+import math
 import argparse
 import os
-from azure.storage.blob import BlobServiceClient
+import hashlib
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from contextlib import nullcontext
+import shutil
+from itertools import repeat
 
-def upload_file_to_container(container_name: str, file_path: str):
+# scipy é opcional: só é necessário para o gerador quasi-aleatório (Sobol) e para o modo de exposição
+try:
+    from scipy.stats import qmc, t as student_t
+    from scipy.special import ndtr, ndtri
+except ImportError:
+    qmc = None
 
-    blobl_service_client =  BlobServiceClient(
+def get_blob_service_client():
+    from azure.storage.blob import BlobServiceClient
+
+    return BlobServiceClient(
         account_url="https://##STORAGE_ACCOUNT_NAME##.blob.core.windows.net/",
         credential="##STORAGE_ACCOUNT_KEY##",
     )
-        
-    blob_name = os.path.basename(file_path)
-    blob_client = blobl_service_client.get_blob_client(container_name, blob_name)
+
+
+def upload_file_to_container(container_name: str, file_path: str, blob_name: str = None):
+    blob_name = blob_name or os.path.basename(file_path)
+
+    # Backend local (local_impl.batch_impl): os containers são diretórios e o SDK do Azure não é necessário
+    local_storage_dir = os.environ.get("MONTECARLO_LOCAL_STORAGE_DIR")
+    if local_storage_dir:
+        destination = os.path.join(local_storage_dir, container_name, blob_name)
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        shutil.copyfile(file_path, destination + ".uploading")
+        os.replace(destination + ".uploading", destination)
+        return
+
+    blob_client = get_blob_service_client().get_blob_client(container_name, blob_name)
 
     with open(file_path, "rb") as data:
         blob_client.upload_blob(data, overwrite=True)
 
 
-# Função de Simulação de Monte Carlo para Estimar o Valor de uma Opção de Compra
-def monte_carlo_option_pricing(params):
+# Conteúdo dos blobs com o prefixo dado, em ordem de nome
+def download_blobs(container_name: str, prefix: str):
+    local_storage_dir = os.environ.get("MONTECARLO_LOCAL_STORAGE_DIR")
+    if local_storage_dir:
+        directory = os.path.join(local_storage_dir, container_name, prefix)
+        if not os.path.isdir(directory):
+            return []
+        names = sorted(name for name in os.listdir(directory) if not name.endswith(".uploading"))
+        contents = []
+        for name in names:
+            with open(os.path.join(directory, name), "rb") as f:
+                contents.append(f.read())
+        return contents
+
+    container_client = get_blob_service_client().get_container_client(container_name)
+    return [container_client.download_blob(blob.name).readall() for blob in container_client.list_blobs(name_starts_with=prefix)]
+
+
+def delete_blobs(container_name: str, prefix: str):
+    local_storage_dir = os.environ.get("MONTECARLO_LOCAL_STORAGE_DIR")
+    if local_storage_dir:
+        shutil.rmtree(os.path.join(local_storage_dir, container_name, prefix), ignore_errors=True)
+        # Blobs não deixam diretórios para trás: remove também os diretórios do prefixo que ficaram vazios
+        remove_empty_parents(os.path.join(local_storage_dir, container_name, prefix), os.path.join(local_storage_dir, container_name))
+        return
+
+    container_client = get_blob_service_client().get_container_client(container_name)
+    for blob in container_client.list_blobs(name_starts_with=prefix):
+        container_client.delete_blob(blob.name)
+
+
+# Remove os diretórios vazios acima de path, do mais interno para o mais externo, sem chegar a stop
+def remove_empty_parents(path, stop):
+    path, stop = os.path.abspath(path), os.path.abspath(stop)
+    parent = os.path.dirname(path.rstrip(os.sep))
+    while parent != stop and parent.startswith(stop + os.sep):
+        try:
+            os.rmdir(parent)
+        except OSError:
+            return
+        parent = os.path.dirname(parent)
+
+
+# Orçamento de memória (em bytes) para cada bloco de caminhos simulados
+MAX_CHUNK_BYTES = 32 * 1024 * 1024
+
+
+# Quantidade de caminhos por bloco para que a matriz (caminhos x passos) caiba no orçamento
+def chunk_rows(num_steps, max_chunk_bytes=MAX_CHUNK_BYTES):
+    return max(1, max_chunk_bytes // (8 * num_steps))
+
+
+# Payoffs que dependem apenas do preço terminal S_T
+TERMINAL_PAYOFFS = {
+    "call": lambda S_T, K: np.maximum(S_T - K, 0),
+    "put": lambda S_T, K: np.maximum(K - S_T, 0),
+}
+
+# Payoffs dependentes da trajetória (recebem a matriz caminhos x passos)
+PATH_PAYOFFS = {
+    "asian_call": lambda paths, K: np.maximum(paths.mean(axis=1) - K, 0),
+    "asian_put": lambda paths, K: np.maximum(K - paths.mean(axis=1), 0),
+}
+
+
+# Um produto é independente da trajetória quando o payoff só usa S_T e nenhuma grade de exposição foi pedida
+def is_path_independent(params):
+    return (
+        params.get("option_type", "call") in TERMINAL_PAYOFFS
+        and not params.get("exposure_grid")
+        and not params.get("full_paths", False)
+    )
+
+
+# Transforma (in-place) um bloco de normais (caminhos x passos) em preços, via soma acumulada dos incrementos do log-preço.
+# Com um único passo, é a amostragem exata de S_T pela solução fechada do GBM.
+def gbm_paths(z, S0, r, sigma, T):
+    dt = T / z.shape[1]
+    z *= sigma * np.sqrt(dt)
+    z += (r - 0.5 * sigma**2) * dt
+    np.cumsum(z, axis=1, out=z)
+    np.exp(z, out=z)
+    z *= S0
+    return z
+
+
+# Preço de Black-Scholes de uma opção europeia
+def black_scholes_price(S0, K, r, sigma, T, option_type="call"):
+    d1 = (math.log(S0 / K) + (r + 0.5 * sigma**2) * T) / (sigma * math.sqrt(T))
+    d2 = d1 - sigma * math.sqrt(T)
+    N = lambda x: 0.5 * (1 + math.erf(x / math.sqrt(2)))
+    if option_type == "put":
+        return K * math.exp(-r * T) * N(-d2) - S0 * N(-d1)
+    return S0 * N(d1) - K * math.exp(-r * T) * N(d2)
+
+
+# Métodos de redução de variância aceitos no campo "variance_reduction"
+VARIANCE_REDUCTION_METHODS = ("antithetic", "control_variate_stock", "control_variate_black_scholes")
+
+
+def parse_variance_reduction(params):
+    methods = params.get("variance_reduction") or []
+    if isinstance(methods, str):
+        methods = [methods]
+    for method in methods:
+        if method not in VARIANCE_REDUCTION_METHODS:
+            raise ValueError(f"Método de redução de variância não suportado: {method}")
+    controls = [method for method in methods if method.startswith("control_variate")]
+    if len(controls) > 1:
+        raise ValueError("Apenas uma variável de controle pode ser usada por simulação")
+    return "antithetic" in methods, controls[0] if controls else None
+
+
+# Variável de controle por caminho (não descontada) e seu valor esperado exato
+def control_variate(control, S_T, params):
     S0 = params["stock_price"]
     K = params["strike_price"]
     r = params["risk_free_rate"]
     sigma = params["volatility"]
     T = params["time_to_maturity"]
-    num_simulations = params["num_simulations"]
-    num_steps = params["num_steps"]
 
-    dt = T / num_steps
-    discount_factor = np.exp(-r * T)
-    
-    # Simulações de Monte Carlo
-    option_values = np.zeros(num_simulations)
-    
-    for i in range(num_simulations):
-        prices = np.zeros(num_steps + 1)
-        prices[0] = S0
-        
-        for t in range(1, num_steps + 1):
-            z = np.random.standard_normal()
-            prices[t] = prices[t-1] * np.exp((r - 0.5 * sigma**2) * dt + sigma * np.sqrt(dt) * z)
-        
-        option_values[i] = max(prices[-1] - K, 0)
-    
-    # Valor Esperado da Opção de Compra
-    expected_option_value = np.mean(option_values) * discount_factor
-    
-    # Cálculo do Intervalo de Confiança
-    std_error = np.std(option_values) / np.sqrt(num_simulations)
-    confidence_interval = (expected_option_value - 1.96 * std_error, expected_option_value + 1.96 * std_error)
-    
+    if control == "control_variate_stock":
+        return S_T, S0 * np.exp(r * T)
+    # Payoff da call europeia de mesmo strike, cujo valor é conhecido por Black-Scholes
+    return np.maximum(S_T - K, 0), black_scholes_price(S0, K, r, sigma, T) * np.exp(r * T)
+
+
+# Gregas calculadas no campo "greeks": "pathwise" (delta e vega pathwise, gamma por razão de verossimilhança, sobre os
+# mesmos caminhos do preço) ou "bump" (bump-and-reprice com números aleatórios comuns)
+GREEKS = ("delta", "gamma", "vega")
+GREEKS_METHODS = ("pathwise", "bump")
+DEFAULT_GREEKS_BUMP = 0.01
+
+
+# Estimadores por caminho (não descontados) de delta, gamma e vega (linhas). Delta e vega derivam o payoff ao longo do
+# caminho (dS_t/dS0 = S_t/S0 e dS_t/dσ = S_t·(ln(S_t/S0) − (r + σ²/2)·t)/σ); gamma, que o payoff com quina não permite
+# derivar duas vezes, usa o peso de razão de verossimilhança da normal z_1 do primeiro passo.
+def pathwise_greeks(paths, z_first, params):
+    S0 = params["stock_price"]
+    K = params["strike_price"]
+    r = params["risk_free_rate"]
+    sigma = params["volatility"]
+    T = params["time_to_maturity"]
+    option_type = params.get("option_type", "call")
+    dt = T / paths.shape[1]
+
+    if option_type in PATH_PAYOFFS:
+        times = dt * np.arange(1, paths.shape[1] + 1)
+        underlying = paths.mean(axis=1)
+        underlying_vega = (paths * (np.log(paths / S0) - (r + 0.5 * sigma**2) * times)).mean(axis=1) / sigma
+    else:
+        underlying = paths[:, -1]
+        underlying_vega = underlying * (np.log(underlying / S0) - (r + 0.5 * sigma**2) * T) / sigma
+
+    sign = -1.0 if option_type.endswith("put") else 1.0
+    exercised = sign * (underlying - K) > 0
+    payoffs = np.where(exercised, sign * (underlying - K), 0.0)
+    gamma_weight = (z_first**2 - 1) / (S0**2 * sigma**2 * dt) - z_first / (S0**2 * sigma * np.sqrt(dt))
+    return np.stack([
+        np.where(exercised, sign * underlying / S0, 0.0),
+        payoffs * gamma_weight,
+        np.where(exercised, sign * underlying_vega, 0.0),
+    ])
+
+
+# Payoffs (e variável de controle e estimadores pathwise das gregas, se pedidos) de um bloco de normais
+def evaluate_chunk(z, params, control=None):
+    option_type = params.get("option_type", "call")
+    z_first = z[:, 0].copy() if params.get("greeks") == "pathwise" else None
+    paths = gbm_paths(z, params["stock_price"], params["risk_free_rate"], params["volatility"], params["time_to_maturity"])
+    S_T = paths[:, -1]
+
+    if option_type in PATH_PAYOFFS:
+        payoffs = PATH_PAYOFFS[option_type](paths, params["strike_price"])
+    else:
+        payoffs = TERMINAL_PAYOFFS[option_type](S_T, params["strike_price"])
+
+    controls = control_variate(control, S_T, params)[0] if control else None
+    greeks = pathwise_greeks(paths, z_first, params) if z_first is not None else None
+    return payoffs, controls, greeks
+
+
+# Campos de mercado e de simulação que os trades de um grupo com caminhos compartilhados têm em comum
+GROUP_MARKET_KEYS = ("stock_price", "volatility", "risk_free_rate", "time_to_maturity", "num_simulations")
+
+
+# Payoffs (trades x caminhos) de um grupo de trades sobre o mesmo bloco de normais. Cada payoff é max(sinal·(U − K), 0),
+# com U = S_T (europeias) ou a média do caminho (asiáticas), avaliado em fatias de trades que cabem no orçamento de memória.
+def evaluate_group_chunk(z, group, control=None):
+    first = group[0]
+    paths = gbm_paths(z, first["stock_price"], first["risk_free_rate"], first["volatility"], first["time_to_maturity"])
+    option_types = [params.get("option_type", "call") for params in group]
+    strikes = np.array([params["strike_price"] for params in group], dtype=float)[:, None]
+    signs = np.array([-1.0 if option_type.endswith("put") else 1.0 for option_type in option_types])[:, None]
+    is_average = np.array([option_type in PATH_PAYOFFS for option_type in option_types])[:, None]
+
+    S_T = paths[:, -1]
+    average = paths.mean(axis=1) if is_average.any() else S_T
+    payoffs = np.empty((len(group), z.shape[0]))
+    step = max(1, MAX_CHUNK_BYTES // (8 * z.shape[0]))
+    for i in range(0, len(group), step):
+        underlying = np.where(is_average[i:i + step], average, S_T)
+        np.maximum(signs[i:i + step] * (underlying - strikes[i:i + step]), 0, out=payoffs[i:i + step])
+    return payoffs, None, None
+
+
+# M2 da união de duas amostras disjuntas a partir da contagem, soma e M2 de cada uma (fórmula de Chan et al.)
+def merge_m2(count_a, sum_a, m2_a, count_b, sum_b, m2_b):
+    delta = sum_b / count_b - sum_a / count_a
+    return m2_a + m2_b + delta**2 * count_a * count_b / (count_a + count_b)
+
+
+# Contagem, soma e M2 (soma dos quadrados dos desvios em relação à média) de cada linha de amostras
+def sample_moments(samples):
+    deviations = samples - samples.mean(axis=-1, keepdims=True)
+    return samples.shape[-1], samples.sum(axis=-1), np.einsum("ij,ij->i", deviations, deviations)
+
+
+# Contagem, soma e M2 da união de amostras disjuntas (None quando não há amostras)
+def merge_moments(a, b):
+    if a is None or b is None:
+        return a if b is None else b
+    return a[0] + b[0], a[1] + b[1], merge_m2(*a, *b)
+
+
+# Soma dos quadrados dos payoffs (por trade, quando há uma linha por trade de um grupo)
+def sum_of_squares(values):
+    return np.dot(values, values) if values.ndim == 1 else np.array([np.dot(row, row) for row in values])
+
+
+# Semente filha de índice `index`, equivalente a seed_sequence.spawn(index + 1)[index] sem alterar o estado do pai.
+# Permite derivar a subsequência de uma simulação (ou bloco) pelo seu índice, independentemente da ordem de execução.
+def child_seed(seed_sequence, index):
+    return np.random.SeedSequence(seed_sequence.entropy, spawn_key=seed_sequence.spawn_key + (index,))
+
+
+# Normais pseudoaleatórias (caminhos x passos) a partir do gerador global do numpy, consumido em ordem
+class PseudoRandomNormals:
+    parallel_safe = False
+
+    def __init__(self, num_steps):
+        self.num_steps = num_steps
+
+    def __call__(self, chunk_index, n):
+        return np.random.standard_normal((n, self.num_steps))
+
+
+# Normais pseudoaleatórias com uma subsequência independente por bloco de caminhos, derivada da semente da simulação.
+# O resultado de cada bloco não depende de qual processo o calcula, nem de quantos processos existem.
+class SeededNormals:
+    parallel_safe = True
+
+    def __init__(self, num_steps, seed_sequence):
+        self.num_steps = num_steps
+        self.seed_sequence = seed_sequence
+
+    def __call__(self, chunk_index, n):
+        rng = np.random.default_rng(child_seed(self.seed_sequence, chunk_index))
+        return rng.standard_normal((n, self.num_steps))
+
+
+# Ordem de construção da ponte browniana em uma grade uniforme de num_steps passos (tempo unitário por passo).
+# Cada entrada (i, l, r, peso_l, peso_r, desvio) preenche W[i] a partir de W[l] e W[r]; a primeira fixa W[num_steps].
+def brownian_bridge_plan(num_steps):
+    plan = [(num_steps, 0, 0, 0.0, 0.0, math.sqrt(num_steps))]
+    intervals = [(0, num_steps)]
+    while intervals:
+        next_intervals = []
+        for left, right in intervals:
+            if right - left < 2:
+                continue
+            mid = (left + right) // 2
+            weight_left = (right - mid) / (right - left)
+            weight_right = (mid - left) / (right - left)
+            std = math.sqrt((mid - left) * (right - mid) / (right - left))
+            plan.append((mid, left, right, weight_left, weight_right, std))
+            next_intervals += [(left, mid), (mid, right)]
+        intervals = next_intervals
+    return plan
+
+
+# Converte normais independentes em incrementos normalizados do movimento browniano via ponte browniana,
+# concentrando a variância do caminho nas primeiras dimensões do Sobol
+def brownian_bridge(z, plan):
+    W = np.zeros((z.shape[0], z.shape[1] + 1))
+    for k, (i, left, right, weight_left, weight_right, std) in enumerate(plan):
+        W[:, i] = weight_left * W[:, left] + weight_right * W[:, right] + std * z[:, k]
+    return np.diff(W, axis=1)
+
+
+# Normais quasi-aleatórias de uma sequência de Sobol embaralhada (uma dimensão por passo), consumida em ordem
+class SobolNormals:
+    parallel_safe = False
+
+    def __init__(self, num_steps, seed):
+        if qmc is None:
+            raise RuntimeError("O gerador 'sobol' requer o pacote scipy instalado no nó")
+
+        self.sampler = qmc.Sobol(d=num_steps, scramble=True, seed=seed)
+        self.plan = brownian_bridge_plan(num_steps) if num_steps > 1 else None
+
+    def __call__(self, chunk_index, n):
+        # Pontos exatamente em 0 ou 1 virariam normais infinitas
+        z = ndtri(np.clip(self.sampler.random(n), 1e-16, 1 - 1e-16))
+        return brownian_bridge(z, self.plan) if self.plan else z
+
+
+# Payoffs de um bloco de caminhos, com as somas dos payoffs brutos usadas na medida de redução de variância
+# (as primeiras row_offset linhas do bloco são sorteadas e descartadas, para simular só uma faixa de caminhos)
+def simulate_chunk(params, normals, chunk_index, n, num_steps, antithetic=False, control=None, row_offset=0):
+    z = normals(chunk_index, row_offset + n)[row_offset:]
+
+    # Um grupo de trades (lista de parâmetros) é avaliado sobre os mesmos caminhos, com uma linha de payoffs por trade
+    evaluate = evaluate_group_chunk if isinstance(params, list) else evaluate_chunk
+
+    if antithetic:
+        payoffs_mirror, controls_mirror, greeks_mirror = evaluate(-z, params, control)
+        payoffs, controls, greeks = evaluate(z, params, control)
+        raw_sum = payoffs.sum(axis=-1) + payoffs_mirror.sum(axis=-1)
+        raw_sum_sq = sum_of_squares(payoffs) + sum_of_squares(payoffs_mirror)
+        payoffs = 0.5 * (payoffs + payoffs_mirror)
+        if control:
+            controls = 0.5 * (controls + controls_mirror)
+        if greeks is not None:
+            greeks = 0.5 * (greeks + greeks_mirror)
+    else:
+        payoffs, controls, greeks = evaluate(z, params, control)
+        raw_sum = payoffs.sum(axis=-1)
+        raw_sum_sq = sum_of_squares(payoffs)
+
+    # As gregas pathwise seguem só como contagem, soma e M2 por grega
+    return payoffs, controls, raw_sum, raw_sum_sq, sample_moments(greeks) if greeks is not None else None
+
+
+# Número de blocos de caminhos necessários para num_samples amostras
+def count_chunks(num_samples, num_steps, antithetic=False, max_chunk_bytes=MAX_CHUNK_BYTES):
+    rows = chunk_rows(num_steps * (2 if antithetic else 1), max_chunk_bytes)
+    return -(-num_samples // rows)
+
+
+# Blocos da grade fixa que cobrem as amostras [first_sample, first_sample + num_samples): índice de cada bloco,
+# linhas descartadas no início do bloco, posição da primeira amostra do bloco na faixa e número de amostras
+def chunk_grid(num_samples, num_steps, antithetic=False, max_chunk_bytes=MAX_CHUNK_BYTES, chunk_offset=0, first_sample=0):
+    rows = chunk_rows(num_steps * (2 if antithetic else 1), max_chunk_bytes)
+    last_sample = first_sample + num_samples
+    grid = range(first_sample // rows, -(-last_sample // rows))
+    chunk_indexes = [chunk_offset + k for k in grid]
+    row_offsets = [max(first_sample - k * rows, 0) for k in grid]
+    starts = [max(k * rows, first_sample) - first_sample for k in grid]
+    sizes = [min((k + 1) * rows, last_sample) - first_sample - start for k, start in zip(grid, starts)]
+    return chunk_indexes, row_offsets, starts, sizes
+
+
+# Simula num_samples amostras em blocos de caminhos a partir de uma fonte de normais. Os blocos seguem uma grade
+# fixa, numerada a partir de chunk_offset; com first_sample > 0 só a faixa [first_sample, first_sample + num_samples)
+# da grade é simulada. Com um executor e uma fonte sem estado compartilhado, os blocos são distribuídos entre processos.
+def simulate_samples(params, num_samples, normals, num_steps, antithetic=False, control=None, max_chunk_bytes=MAX_CHUNK_BYTES, chunk_offset=0, executor=None, first_sample=0):
+    chunk_indexes, row_offsets, starts, sizes = chunk_grid(num_samples, num_steps, antithetic, max_chunk_bytes, chunk_offset, first_sample)
+
+    if executor is not None and normals.parallel_safe and len(starts) > 1:
+        chunks = executor.map(
+            simulate_chunk,
+            repeat(params), repeat(normals), chunk_indexes, sizes,
+            repeat(num_steps), repeat(antithetic), repeat(control), row_offsets
+        )
+    else:
+        chunks = map(
+            simulate_chunk,
+            repeat(params), repeat(normals), chunk_indexes, sizes,
+            repeat(num_steps), repeat(antithetic), repeat(control), row_offsets
+        )
+
+    option_values = None
+    controls = np.empty(num_samples) if control else None
+    raw_sum = raw_sum_sq = 0.0
+    greek_moments = None
+    for start, (payoffs, chunk_controls, chunk_sum, chunk_sum_sq, chunk_greeks) in zip(starts, chunks):
+        if option_values is None:
+            # Para um grupo de trades, uma linha de valores por trade
+            option_values = np.empty(payoffs.shape[:-1] + (num_samples,))
+        option_values[..., start:start + payoffs.shape[-1]] = payoffs
+        if control:
+            controls[start:start + len(payoffs)] = chunk_controls
+        raw_sum += chunk_sum
+        raw_sum_sq += chunk_sum_sq
+        greek_moments = merge_moments(greek_moments, chunk_greeks)
+
+    return option_values, controls, raw_sum, raw_sum_sq, greek_moments
+
+
+# Caminhos simulados no modo adaptativo antes que o critério de parada seja avaliado, quando min_simulations não é informado,
+# e amostras com payoff não nulo exigidas para que a variância amostral seja confiável
+DEFAULT_MIN_SIMULATIONS = 10000
+MIN_NONZERO_SAMPLES = 30
+
+
+# Simula lotes de amostras até que a meia-largura 1.96·σ/√n do intervalo de confiança atinja target_ci_halfwidth
+# ou até max_simulations caminhos. Mantém somas e somas de quadrados acumuladas (e os produtos cruzados com a
+# variável de controle, quando houver) para avaliar o critério sem revisitar as amostras. O critério só vale a partir
+# de min_simulations caminhos e de MIN_NONZERO_SAMPLES payoffs não nulos: numa opção muito fora do dinheiro, os
+# primeiros lotes podem ter todos (ou quase todos) os payoffs zerados, e σ ≈ 0 ali indica falta de amostras, não
+# convergência.
+def simulate_until_target(params, batch_samples, normals, num_steps, antithetic=False, control=None, max_chunk_bytes=MAX_CHUNK_BYTES, executor=None):
+    target = params["target_ci_halfwidth"]
+    paths_per_sample = 2 if antithetic else 1
+    max_samples = max(batch_samples, params.get("max_simulations", 100 * params["num_simulations"]) // paths_per_sample)
+    min_samples = min(max_samples, params.get("min_simulations", DEFAULT_MIN_SIMULATIONS) // paths_per_sample)
+
+    blocks = []
+    chunk_offset = 0
+    n = nonzero = sum_y = sum_yy = sum_x = sum_xx = sum_xy = 0.0
+    while n < max_samples:
+        batch = int(min(batch_samples, max_samples - n))
+        block = simulate_samples(params, batch, normals, num_steps, antithetic, control, max_chunk_bytes, chunk_offset, executor)
+        blocks.append(block)
+        chunk_offset += count_chunks(batch, num_steps, antithetic, max_chunk_bytes)
+
+        values, controls = block[0], block[1]
+        n += len(values)
+        nonzero += np.count_nonzero(values)
+        sum_y += values.sum()
+        sum_yy += np.dot(values, values)
+        variance = sum_yy / n - (sum_y / n)**2
+        if control:
+            sum_x += controls.sum()
+            sum_xx += np.dot(controls, controls)
+            sum_xy += np.dot(values, controls)
+            control_variance = sum_xx / n - (sum_x / n)**2
+            if control_variance > 0:
+                covariance = sum_xy / n - (sum_x / n) * (sum_y / n)
+                variance -= covariance**2 / control_variance
+
+        if n >= min_samples and nonzero >= MIN_NONZERO_SAMPLES and variance > 0 and 1.96 * np.sqrt(variance / n) <= target:
+            break
+
+    return blocks
+
+
+# Modos de resultado: "full" grava todos os option_values no JSON; "statistics" só as estatísticas suficientes
+RESULT_MODES = ("full", "statistics")
+
+
+# Estatísticas suficientes das amostras (não descontadas), com um esboço opcional de quantis. A dispersão vai como M2
+# (soma dos quadrados dos desvios em relação à média), que o agregador combina entre faixas sem cancelamento numérico
+def sample_statistics(values, quantile_sketch_size=0):
+    deviations = values - values.mean()
+    statistics = {
+        "count": int(len(values)),
+        "sum": float(values.sum()),
+        "m2": float(np.dot(deviations, deviations)),
+        "min": float(values.min()),
+        "max": float(values.max()),
+    }
+    if quantile_sketch_size:
+        probabilities = np.linspace(0, 1, quantile_sketch_size)
+        statistics["quantile_sketch"] = {
+            "probabilities": probabilities.tolist(),
+            "values": np.quantile(values, probabilities).tolist(),
+        }
+    return statistics
+
+
+# Razão entre a variância de um caminho sem redução e a variância efetiva do estimador por caminho
+def variance_reduction_factor(raw_sum, raw_sum_sq, num_paths, std_error):
+    plain_variance = raw_sum_sq / num_paths - (raw_sum / num_paths)**2
+    reduced_variance = std_error**2 * num_paths
+    return plain_variance / reduced_variance if reduced_variance > 0 else float("inf")
+
+
+# Resultado de uma simulação: valor esperado, intervalo de confiança (meia-largura critical_value · erro padrão) e os
+# valores por caminho conforme o result_mode. No modo "statistics" só as estatísticas suficientes vão para o JSON; os
+# payoffs, se pedidos, seguem em float32 para o arquivo binário auxiliar (.npy)
+def format_result(expected_option_value, std_error, option_values, result, result_mode="full", raw_payoffs=False, quantile_sketch_size=0, critical_value=1.96):
+    confidence_interval = (expected_option_value - critical_value * std_error, expected_option_value + critical_value * std_error)
+
+    if result_mode == "statistics":
+        result["statistics"] = sample_statistics(option_values, quantile_sketch_size)
+        if raw_payoffs:
+            result["option_values"] = option_values.astype(np.float32)
+    else:
+        result["option_values"] = option_values.tolist()
+
     return {
         "expected_option_value": expected_option_value,
         "confidence_interval": list(confidence_interval),  # Convertendo tupla para lista
-        "option_values": option_values.tolist()
+        **result
     }
 
-# Função para processar as simulações de Monte Carlo a partir de um arquivo JSON
-def process_monte_carlo_simulations(input_file):
+
+# Gregas por bump-and-reprice com números aleatórios comuns: as simulações com stock_price e volatility deslocados
+# (diferenças centrais, bump relativo greeks_bump) reutilizam as normais da simulação base, e as diferenças são tomadas
+# caminho a caminho. Retorna a contagem, a soma e o M2 dos estimadores (não descontados) de cada grega.
+def bump_and_reprice_greeks(params, base_values, num_samples, seed_sequence, num_steps, antithetic=False, max_chunk_bytes=MAX_CHUNK_BYTES, executor=None, first_sample=0):
+    bump = params.get("greeks_bump", DEFAULT_GREEKS_BUMP)
+    stock_bump = bump * params["stock_price"]
+    volatility_bump = bump * params["volatility"]
+
+    def reprice(**bumped):
+        bumped_params = {**params, **bumped, "greeks": None}
+        normals = SeededNormals(num_steps, seed_sequence)
+        return simulate_samples(bumped_params, num_samples, normals, num_steps, antithetic, None, max_chunk_bytes, executor=executor, first_sample=first_sample)[0]
+
+    stock_up = reprice(stock_price=params["stock_price"] + stock_bump)
+    stock_down = reprice(stock_price=params["stock_price"] - stock_bump)
+    volatility_up = reprice(volatility=params["volatility"] + volatility_bump)
+    volatility_down = reprice(volatility=params["volatility"] - volatility_bump)
+    return sample_moments(np.stack([
+        (stock_up - stock_down) / (2 * stock_bump),
+        (stock_up - 2 * base_values + stock_down) / stock_bump**2,
+        (volatility_up - volatility_down) / (2 * volatility_bump),
+    ]))
+
+
+# Gregas do resultado: valor descontado e erro padrão de cada uma, com a contagem, soma e M2 dos estimadores
+# (não descontados), que o agregador combina entre faixas de caminhos
+def greeks_result(method, moments, discount_factor):
+    count, sums, m2 = moments
+    result = {"method": method, "count": int(count), "sum": sums.tolist(), "m2": m2.tolist()}
+    for i, name in enumerate(GREEKS):
+        result[name] = {
+            "value": float(discount_factor * sums[i] / count),
+            "std_error": float(discount_factor * np.sqrt(m2[i] / count) / np.sqrt(count)),
+        }
+    return result
+
+
+# Quantis de PFE e precisão relativa do esboço de quantis por data usados no modo de exposição, quando não informados.
+# Exposições até EXPOSURE_SKETCH_MIN_VALUE entram no esboço como zero.
+DEFAULT_PFE_QUANTILES = (0.95, 0.99)
+DEFAULT_EXPOSURE_RELATIVE_ACCURACY = 0.01
+EXPOSURE_SKETCH_MIN_VALUE = 1e-9
+
+
+# Passos da simulação (1..num_steps) das datas de exposure_grid: um inteiro n dá n datas igualmente espaçadas até o
+# vencimento; uma lista dá as datas em anos. Cada data é arredondada para o passo mais próximo da grade de simulação.
+def exposure_steps(params):
+    T = params["time_to_maturity"]
+    num_steps = params["num_steps"]
+    grid = params["exposure_grid"]
+    times = np.arange(1, grid + 1) * T / grid if isinstance(grid, int) else np.asarray(grid, dtype=float)
+    if len(times) == 0 or times.min() <= 0 or times.max() > T:
+        raise ValueError("As datas de exposure_grid precisam estar em (0, time_to_maturity]")
+    return np.unique(np.clip(np.rint(times * num_steps / T).astype(int), 1, num_steps))
+
+
+# Valor de mercado (Black-Scholes) de uma opção europeia em cada caminho (linhas) e data (colunas) com prazo
+# restante tau; no vencimento (tau = 0), o payoff
+def black_scholes_values(S, K, r, sigma, tau, option_type="call"):
+    values = TERMINAL_PAYOFFS[option_type](S, K)
+    live = tau > 0
+    if live.any():
+        S, tau = S[:, live], tau[live]
+        vol = sigma * np.sqrt(tau)
+        d1 = (np.log(S / K) + (r + 0.5 * sigma**2) * tau) / vol
+        d2 = d1 - vol
+        discounted_strike = K * np.exp(-r * tau)
+        if option_type == "put":
+            values[:, live] = discounted_strike * ndtr(-d2) - S * ndtr(-d1)
+        else:
+            values[:, live] = S * ndtr(d1) - discounted_strike * ndtr(d2)
+    return values
+
+
+# Esboço de quantis mesclável com erro relativo limitado (como o DDSketch): por data, a contagem de exposições em cada
+# intervalo (γ^(i−1), γ^i], com γ = (1 + α)/(1 − α), e a contagem de exposições nulas. A mescla soma as contagens, de
+# modo que o esboço (e a PFE) não depende da divisão dos caminhos em blocos ou faixas
+def exposure_sketch(exposures, relative_accuracy):
+    gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+    positive = exposures > EXPOSURE_SKETCH_MIN_VALUE
+    bins = np.ceil(np.log(np.where(positive, exposures, 1.0)) / np.log(gamma)).astype(np.int64)
+    offsets = []
+    counts = []
+    for j in range(exposures.shape[1]):
+        column = bins[positive[:, j], j]
+        offsets.append(int(column.min()) if len(column) else 0)
+        counts.append(np.bincount(column - offsets[-1]) if len(column) else np.zeros(0, dtype=np.int64))
+    return {"zero_count": (~positive).sum(axis=0), "offset": offsets, "counts": counts}
+
+
+def merge_exposure_sketch(a, b):
+    offsets = []
+    counts = []
+    for offset_a, counts_a, offset_b, counts_b in zip(a["offset"], a["counts"], b["offset"], b["counts"]):
+        if not len(counts_a) or not len(counts_b):
+            offsets.append(offset_a if len(counts_a) else offset_b)
+            counts.append(counts_a if len(counts_a) else counts_b)
+            continue
+        offset = min(offset_a, offset_b)
+        merged = np.zeros(max(offset_a + len(counts_a), offset_b + len(counts_b)) - offset, dtype=np.int64)
+        merged[offset_a - offset:offset_a - offset + len(counts_a)] += counts_a
+        merged[offset_b - offset:offset_b - offset + len(counts_b)] += counts_b
+        offsets.append(offset)
+        counts.append(merged)
+    return {"zero_count": a["zero_count"] + b["zero_count"], "offset": offsets, "counts": counts}
+
+
+# Quantil q de cada data: o intervalo que contém a amostra de posição ⌊q·(n − 1)⌋, representado pelo ponto
+# 2γ^i/(γ + 1), a menos de α (relativo) de qualquer valor do intervalo
+def exposure_sketch_quantiles(sketch, quantile, relative_accuracy):
+    gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+    values = []
+    for zero_count, offset, counts in zip(sketch["zero_count"], sketch["offset"], sketch["counts"]):
+        rank = np.floor(quantile * (zero_count + np.sum(counts) - 1))
+        if rank < zero_count:
+            values.append(0.0)
+            continue
+        i = int(np.searchsorted(zero_count + np.cumsum(counts), rank, side="right"))
+        values.append(float(2 * gamma ** (offset + i) / (gamma + 1)))
+    return values
+
+
+# Estatísticas mescláveis da exposição (caminhos x datas) de um bloco: contagem, soma, M2, máximo e esboço de quantis
+# por data
+def exposure_statistics(exposures, relative_accuracy):
+    deviations = exposures - exposures.mean(axis=0)
+    return {
+        "count": exposures.shape[0],
+        "sum": exposures.sum(axis=0),
+        "m2": np.einsum("ij,ij->j", deviations, deviations),
+        "max": exposures.max(axis=0),
+        "sketch": exposure_sketch(exposures, relative_accuracy),
+    }
+
+
+def merge_exposure_statistics(a, b):
+    return {
+        "count": a["count"] + b["count"],
+        "sum": a["sum"] + b["sum"],
+        "m2": merge_m2(a["count"], a["sum"], a["m2"], b["count"], b["sum"], b["m2"]),
+        "max": np.maximum(a["max"], b["max"]),
+        "sketch": merge_exposure_sketch(a["sketch"], b["sketch"]),
+    }
+
+
+# Payoffs e perfil parcial de exposição de um bloco de caminhos. A matriz de caminhos do bloco só é usada para ler o
+# preço nas datas da grade; com variáveis antitéticas, os dois caminhos do par entram no perfil como amostras.
+def simulate_exposure_chunk(params, normals, chunk_index, n, num_steps, antithetic, steps, relative_accuracy, row_offset=0):
+    z = normals(chunk_index, row_offset + n)[row_offset:]
+    S0 = params["stock_price"]
+    K = params["strike_price"]
+    r = params["risk_free_rate"]
+    sigma = params["volatility"]
+    T = params["time_to_maturity"]
+    option_type = params.get("option_type", "call")
+    tau = T - steps * T / num_steps
+
+    payoffs = []
+    exposures = []
+    for block in ([-z, z] if antithetic else [z]):
+        paths = gbm_paths(block, S0, r, sigma, T)
+        payoffs.append(TERMINAL_PAYOFFS[option_type](paths[:, -1], K))
+        exposures.append(black_scholes_values(paths[:, steps - 1], K, r, sigma, tau, option_type))
+
+    raw_sum = sum(p.sum() for p in payoffs)
+    raw_sum_sq = sum(np.dot(p, p) for p in payoffs)
+    payoffs = 0.5 * (payoffs[0] + payoffs[1]) if antithetic else payoffs[0]
+    return payoffs, exposure_statistics(np.concatenate(exposures), relative_accuracy), raw_sum, raw_sum_sq
+
+
+# CVA unilateral: (1 − R) · Σ DF(t_i)·EE(t_i)·PD(t_{i−1}, t_i), com a probabilidade de default de cada intervalo dada pela
+# taxa de hazard (constante ou uma por intervalo da grade)
+def credit_valuation_adjustment(times, discounted_expected_exposure, hazard_rate, recovery_rate):
+    hazard = np.asarray(hazard_rate, dtype=float)
+    if hazard.ndim and hazard.shape != times.shape:
+        raise ValueError("hazard_rate precisa ser um número ou uma lista com uma taxa por data de exposição")
+    survival = np.exp(-np.cumsum(hazard * np.diff(times, prepend=0.0)))
+    default_probability = -np.diff(survival, prepend=1.0)
+    return float((1 - recovery_rate) * np.dot(discounted_expected_exposure, default_probability))
+
+
+# Perfil de exposição do resultado: as estatísticas mescláveis (que o agregador soma entre faixas de caminhos) e as
+# métricas derivadas delas (EE, EE descontada, PFE por quantil e CVA, se houver hazard_rate)
+def exposure_profile(params, times, statistics, relative_accuracy):
+    expected_exposure = statistics["sum"] / statistics["count"]
+    discounted_expected_exposure = expected_exposure * np.exp(-params["risk_free_rate"] * times)
+    profile = {
+        "times": times.tolist(),
+        "count": int(statistics["count"]),
+        "sum": statistics["sum"].tolist(),
+        "m2": statistics["m2"].tolist(),
+        "max": statistics["max"].tolist(),
+        "sketch": {
+            "relative_accuracy": relative_accuracy,
+            "min_value": EXPOSURE_SKETCH_MIN_VALUE,
+            "zero_count": [int(count) for count in statistics["sketch"]["zero_count"]],
+            "offset": statistics["sketch"]["offset"],
+            "counts": [counts.tolist() for counts in statistics["sketch"]["counts"]],
+        },
+        "expected_exposure": expected_exposure.tolist(),
+        "discounted_expected_exposure": discounted_expected_exposure.tolist(),
+        "pfe": {
+            str(quantile): exposure_sketch_quantiles(statistics["sketch"], quantile, relative_accuracy)
+            for quantile in params.get("pfe_quantiles", DEFAULT_PFE_QUANTILES)
+        },
+    }
+    if params.get("hazard_rate") is not None:
+        profile["cva"] = credit_valuation_adjustment(times, discounted_expected_exposure, params["hazard_rate"], params.get("recovery_rate", 0.4))
+    return profile
+
+
+# Modo de exposição (parâmetro exposure_grid): além do valor da opção, acumula bloco a bloco o perfil de exposição
+# nas datas da grade, sem manter a matriz de caminhos completa em memória
+def monte_carlo_exposure(params, max_chunk_bytes=MAX_CHUNK_BYTES, seed_sequence=None, executor=None, result_mode="full", raw_payoffs=False, quantile_sketch_size=0):
+    option_type = params.get("option_type", "call")
+    antithetic, control = parse_variance_reduction(params)
+    if qmc is None:
+        raise RuntimeError("O modo de exposição requer o pacote scipy instalado no nó")
+    if option_type not in TERMINAL_PAYOFFS:
+        raise ValueError(f"O modo de exposição só é suportado para opções europeias: {option_type}")
+    if control or params.get("generator", "pseudo_random") != "pseudo_random" or params.get("target_ci_halfwidth") is not None:
+        raise ValueError("O modo de exposição requer o gerador pseudo_random, sem variável de controle nem modo adaptativo")
+    if params.get("greeks") is not None:
+        raise ValueError("greeks não é suportado no modo de exposição")
+    if result_mode not in RESULT_MODES:
+        raise ValueError(f"Modo de resultado não suportado: {result_mode}")
+
+    T = params["time_to_maturity"]
+    num_steps = params["num_steps"]
+    steps = exposure_steps(params)
+    relative_accuracy = params.get("exposure_relative_accuracy", DEFAULT_EXPOSURE_RELATIVE_ACCURACY)
+    if not 0 < relative_accuracy < 1:
+        raise ValueError("exposure_relative_accuracy precisa estar entre 0 e 1")
+
+    paths_per_sample = 2 if antithetic else 1
+    num_samples = max(1, params["num_simulations"] // paths_per_sample)
+    first_sample = 0
+    if params.get("path_range") is not None:
+        if seed_sequence is None:
+            raise ValueError("path_range requer o gerador pseudo_random com semente")
+        first_sample = params["path_range"][0] // paths_per_sample
+        num_samples = params["path_range"][1] // paths_per_sample - first_sample
+
+    normals = SeededNormals(num_steps, seed_sequence) if seed_sequence is not None else PseudoRandomNormals(num_steps)
+    chunk_indexes, row_offsets, starts, sizes = chunk_grid(num_samples, num_steps, antithetic, max_chunk_bytes, 0, first_sample)
+    arguments = (
+        simulate_exposure_chunk, repeat(params), repeat(normals), chunk_indexes, sizes,
+        repeat(num_steps), repeat(antithetic), repeat(steps), repeat(relative_accuracy), row_offsets
+    )
+    chunks = executor.map(*arguments) if executor is not None and normals.parallel_safe and len(starts) > 1 else map(*arguments)
+
+    option_values = np.empty(num_samples)
+    statistics = None
+    raw_sum = raw_sum_sq = 0.0
+    for start, (payoffs, chunk_statistics, chunk_sum, chunk_sum_sq) in zip(starts, chunks):
+        option_values[start:start + len(payoffs)] = payoffs
+        statistics = chunk_statistics if statistics is None else merge_exposure_statistics(statistics, chunk_statistics)
+        raw_sum += chunk_sum
+        raw_sum_sq += chunk_sum_sq
+
+    discount_factor = np.exp(-params["risk_free_rate"] * T)
+    std_error = np.std(option_values) / np.sqrt(num_samples)
+    result = {}
+    if antithetic:
+        result["variance_reduction_factor"] = variance_reduction_factor(raw_sum, raw_sum_sq, num_samples * paths_per_sample, std_error)
+    result["exposure"] = exposure_profile(params, steps * T / num_steps, statistics, relative_accuracy)
+    return format_result(np.mean(option_values) * discount_factor, std_error, option_values, result, result_mode, raw_payoffs, quantile_sketch_size)
+
+
+# Função de Simulação de Monte Carlo para Estimar o Valor de uma Opção.
+# Sem seed_sequence, consome o gerador global do numpy na ordem do laço original (caminho a caminho, passo a passo).
+def monte_carlo_option_pricing(params, max_chunk_bytes=MAX_CHUNK_BYTES, seed_sequence=None, executor=None, result_mode="full", raw_payoffs=False, quantile_sketch_size=0):
+    if params.get("exposure_grid"):
+        return monte_carlo_exposure(params, max_chunk_bytes, seed_sequence, executor, result_mode, raw_payoffs, quantile_sketch_size)
+
+    r = params["risk_free_rate"]
+    T = params["time_to_maturity"]
+    num_simulations = params["num_simulations"]
+    option_type = params.get("option_type", "call")
+    generator = params.get("generator", "pseudo_random")
+
+    if option_type not in TERMINAL_PAYOFFS and option_type not in PATH_PAYOFFS:
+        raise ValueError(f"Tipo de opção não suportado: {option_type}")
+    if generator not in ("pseudo_random", "sobol"):
+        raise ValueError(f"Gerador não suportado: {generator}")
+    if result_mode not in RESULT_MODES:
+        raise ValueError(f"Modo de resultado não suportado: {result_mode}")
+    if generator == "sobol" and params.get("target_ci_halfwidth") is not None:
+        raise ValueError("target_ci_halfwidth não é suportado com o gerador 'sobol'")
+    greeks = params.get("greeks")
+    if greeks is not None and greeks not in GREEKS_METHODS:
+        raise ValueError(f"Método de gregas não suportado: {greeks}")
+    if greeks is not None and params.get("target_ci_halfwidth") is not None:
+        raise ValueError("greeks não é suportado com target_ci_halfwidth")
+    if greeks == "bump" and (generator != "pseudo_random" or seed_sequence is None):
+        raise ValueError("greeks 'bump' requer o gerador pseudo_random com semente (números aleatórios comuns)")
+
+    antithetic, control = parse_variance_reduction(params)
+    discount_factor = np.exp(-r * T)
+
+    # Numa call europeia o controle é o próprio payoff (beta 1, resíduo nulo) e numa put só repete a paridade
+    # put-call: o "estimador" seria a fórmula fechada com um intervalo de confiança de largura zero
+    if control == "control_variate_black_scholes" and option_type in TERMINAL_PAYOFFS:
+        raise ValueError("control_variate_black_scholes só é suportado para opções asiáticas; use control_variate_stock nas europeias")
+
+    # Produtos independentes da trajetória amostram S_T exatamente em um único passo
+    num_steps = 1 if is_path_independent(params) else params["num_steps"]
+
+    # Com variáveis antitéticas cada amostra é a média de um par (z, -z)
+    paths_per_sample = 2 if antithetic else 1
+    num_samples = max(1, num_simulations // paths_per_sample)
+
+    # Uma faixa de caminhos [início, fim) de uma simulação dividida entre várias partes
+    path_range = params.get("path_range")
+    first_sample = 0
+    if path_range is not None:
+        if generator != "pseudo_random" or control or params.get("target_ci_halfwidth") is not None or seed_sequence is None:
+            raise ValueError("path_range requer o gerador pseudo_random com semente, sem variável de controle nem modo adaptativo")
+        first_sample = path_range[0] // paths_per_sample
+        num_samples = path_range[1] // paths_per_sample - first_sample
+
+    # Simulações de Monte Carlo. No QMC randomizado, cada embaralhamento independente do Sobol
+    # usa uma potência de 2 de pontos e produz uma estimativa própria.
+    if generator == "sobol":
+        num_scrambles = params.get("qmc_scrambles", 8)
+        points = 1 << max(0, math.ceil(math.log2(max(1, num_samples // num_scrambles))))
+        scramble_seeds = [
+            np.random.default_rng(child_seed(seed_sequence, k)) if seed_sequence is not None else np.random.randint(2**32)
+            for k in range(num_scrambles)
+        ]
+        blocks = [
+            simulate_samples(params, points, SobolNormals(num_steps, scramble_seed), num_steps, antithetic, control, max_chunk_bytes)
+            for scramble_seed in scramble_seeds
+        ]
+    else:
+        num_scrambles = 1
+        if seed_sequence is not None:
+            normals = SeededNormals(num_steps, seed_sequence)
+        else:
+            normals = PseudoRandomNormals(num_steps)
+
+        if params.get("target_ci_halfwidth") is not None:
+            blocks = simulate_until_target(params, num_samples, normals, num_steps, antithetic, control, max_chunk_bytes, executor)
+        else:
+            blocks = [simulate_samples(params, num_samples, normals, num_steps, antithetic, control, max_chunk_bytes, executor=executor, first_sample=first_sample)]
+
+    option_values = np.concatenate([block[0] for block in blocks])
+    controls = np.concatenate([block[1] for block in blocks]) if control else None
+    raw_sum = sum(block[2] for block in blocks)
+    raw_sum_sq = sum(block[3] for block in blocks)
+    num_samples = len(option_values)
+    num_paths = num_samples * paths_per_sample
+
+    greek_moments = None
+    for block in blocks:
+        greek_moments = merge_moments(greek_moments, block[4])
+    if greeks == "bump":
+        # Antes do ajuste pela variável de controle: a diferença é tomada entre payoffs brutos
+        greek_moments = bump_and_reprice_greeks(params, option_values, num_samples, seed_sequence, num_steps, antithetic, max_chunk_bytes, executor, first_sample)
+
+    result = {}
+    if control:
+        expected_control = control_variate(control, np.empty(0), params)[1]
+        control_variance = np.var(controls)
+        beta = np.cov(option_values, controls, bias=True)[0, 1] / control_variance if control_variance > 0 else 0.0
+        option_values -= beta * (controls - expected_control)
+        result["control_variate_beta"] = beta
+
+    # Valor Esperado da Opção
+    expected_option_value = np.mean(option_values) * discount_factor
+
+    # Cálculo do Intervalo de Confiança (no QMC, a partir da dispersão entre os embaralhamentos)
+    if params.get("target_ci_halfwidth") is not None:
+        result["num_simulations_used"] = num_paths
+
+    # No QMC o erro vem de poucos embaralhamentos independentes: o intervalo usa o quantil t de Student com
+    # num_scrambles - 1 graus de liberdade, e não o normal
+    critical_value = 1.96
+    if generator == "sobol":
+        scramble_means = option_values.reshape(num_scrambles, -1).mean(axis=1)
+        std_error = np.std(scramble_means, ddof=1) / np.sqrt(num_scrambles) if num_scrambles > 1 else float("nan")
+        critical_value = float(student_t.ppf(0.975, num_scrambles - 1)) if num_scrambles > 1 else float("nan")
+        result["num_simulations_used"] = num_paths
+        result["qmc_scrambles"] = num_scrambles
+    else:
+        std_error = np.std(option_values) / np.sqrt(num_samples)
+
+    if antithetic or control or generator == "sobol":
+        result["variance_reduction_factor"] = variance_reduction_factor(raw_sum, raw_sum_sq, num_paths, std_error)
+    if greeks is not None:
+        result["greeks"] = greeks_result(greeks, greek_moments, discount_factor)
+
+    return format_result(expected_option_value, std_error, option_values, result, result_mode, raw_payoffs, quantile_sketch_size, critical_value)
+
+
+# Número de passos efetivo de um trade: um único passo quando o payoff só depende de S_T
+def effective_num_steps(params):
+    return 1 if is_path_independent(params) else params["num_steps"]
+
+
+# Precificação de um grupo de trades sobre o mesmo subjacente (campo path_group, atribuído pelo cliente) com um único
+# conjunto de caminhos: o custo cresce com o número de cenários de mercado, não de trades, e os números aleatórios
+# comuns mantêm estáveis as diferenças entre strikes. Retorna um resultado por trade, na ordem do grupo.
+def monte_carlo_group_pricing(group, max_chunk_bytes=MAX_CHUNK_BYTES, seed_sequence=None, executor=None, result_mode="full", raw_payoffs=False, quantile_sketch_size=0):
+    first = group[0]
+    antithetic, control = parse_variance_reduction(first)
+    num_steps = effective_num_steps(first)
+
+    if result_mode not in RESULT_MODES:
+        raise ValueError(f"Modo de resultado não suportado: {result_mode}")
+    for params in group:
+        option_type = params.get("option_type", "call")
+        if option_type not in TERMINAL_PAYOFFS and option_type not in PATH_PAYOFFS:
+            raise ValueError(f"Tipo de opção não suportado: {option_type}")
+        if (
+            any(params[key] != first[key] for key in GROUP_MARKET_KEYS)
+            or effective_num_steps(params) != num_steps
+            or parse_variance_reduction(params) != (antithetic, control)
+            or params.get("path_range") != first.get("path_range")
+        ):
+            raise ValueError("Os trades de um grupo precisam ter o mesmo subjacente, caminhos, passos e faixa de caminhos")
+        if control or params.get("generator", "pseudo_random") != "pseudo_random" or params.get("target_ci_halfwidth") is not None or params.get("greeks") is not None:
+            raise ValueError("Grupos com caminhos compartilhados requerem o gerador pseudo_random, sem variável de controle, modo adaptativo nem gregas")
+
+    paths_per_sample = 2 if antithetic else 1
+    num_samples = max(1, first["num_simulations"] // paths_per_sample)
+    first_sample = 0
+    if first.get("path_range") is not None:
+        if seed_sequence is None:
+            raise ValueError("path_range requer o gerador pseudo_random com semente")
+        first_sample = first["path_range"][0] // paths_per_sample
+        num_samples = first["path_range"][1] // paths_per_sample - first_sample
+
+    normals = SeededNormals(num_steps, seed_sequence) if seed_sequence is not None else PseudoRandomNormals(num_steps)
+    option_values, _, raw_sum, raw_sum_sq, _ = simulate_samples(group, num_samples, normals, num_steps, antithetic, None, max_chunk_bytes, executor=executor, first_sample=first_sample)
+
+    results = []
+    for i, params in enumerate(group):
+        discount_factor = np.exp(-params["risk_free_rate"] * params["time_to_maturity"])
+        values = option_values[i]
+        std_error = np.std(values) / np.sqrt(num_samples)
+        result = {}
+        if antithetic:
+            result["variance_reduction_factor"] = variance_reduction_factor(raw_sum[i], raw_sum_sq[i], num_samples * paths_per_sample, std_error)
+        results.append(format_result(np.mean(values) * discount_factor, std_error, values, result, result_mode, raw_payoffs, quantile_sketch_size))
+    return results
+
+
+# Uma simulação é dividida em blocos entre os processos quando tem ao menos tantos blocos quanto processos
+def is_chunk_parallel(params, workers, max_chunk_bytes=MAX_CHUNK_BYTES):
+    if params.get("generator", "pseudo_random") != "pseudo_random":
+        return False
+    antithetic = parse_variance_reduction(params)[0]
+    num_steps = 1 if is_path_independent(params) else params["num_steps"]
+    num_samples = max(1, params["num_simulations"] // (2 if antithetic else 1))
+    if params.get("path_range") is not None:
+        num_samples = (params["path_range"][1] - params["path_range"][0]) // (2 if antithetic else 1)
+    return count_chunks(num_samples, num_steps, antithetic, max_chunk_bytes) >= workers
+
+
+# Checkpoints de uma parte: os resultados concluídos são gravados em lotes, a cada `interval` segundos, como blobs no
+# container "temp" sob um prefixo derivado do nome e do conteúdo do arquivo de entrada. Quando a tarefa é reexecutada
+# (ex.: nó de baixa prioridade preemptado), as simulações já gravadas são lidas do checkpoint em vez de recalculadas.
+class Checkpointer:
+    container_name = "temp"
+
+    def __init__(self, input_file, interval):
+        with open(input_file, "rb") as f:
+            digest = hashlib.sha256(f.read()).hexdigest()[:16]
+        name = os.path.splitext(os.path.basename(input_file))[0]
+        self.prefix = f"checkpoint/{name}-{digest}/"
+        self.local_dir = os.path.join(os.path.dirname(os.path.abspath(input_file)), "checkpoint", f"{name}-{digest}")
+        self.interval = interval
+        self.seed = None
+        self.sequence = 0
+        self.pending = []
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.thread = None
+
+    # Semente e resultados (por posição na parte) dos checkpoints de execuções anteriores da tarefa
+    def load(self):
+        completed = {}
+        seed = None
+        for content in download_blobs(self.container_name, self.prefix):
+            checkpoint = json.loads(content)
+            seed = checkpoint["seed"]
+            completed.update((position, results) for position, results in checkpoint["results"])
+            self.sequence += 1
+        return seed, completed
+
+    def add(self, positions, results):
+        with self.lock:
+            self.pending.extend(zip(positions, results))
+
+    def flush(self):
+        with self.lock:
+            pending, self.pending = self.pending, []
+            sequence = self.sequence
+            self.sequence += 1 if pending else 0
+        if not pending:
+            return
+        # Payoffs brutos (float32) do modo "statistics" vão como listas
+        content = json.dumps({"seed": self.seed, "results": pending}, separators=(",", ":"), default=lambda value: value.tolist())
+        os.makedirs(self.local_dir, exist_ok=True)
+        checkpoint_file = os.path.join(self.local_dir, f"{sequence:06d}.json")
+        with open(checkpoint_file, "w") as f:
+            f.write(content)
+        upload_file_to_container(self.container_name, checkpoint_file, self.prefix + os.path.basename(checkpoint_file))
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            self.flush()
+
+    def __enter__(self):
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        return self
+
+    # Grava o que estiver pendente também quando a tarefa falha, para que a reexecução continue dali
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stopped.set()
+        self.thread.join()
+        self.flush()
+        return False
+
+    # Depois que o resultado da parte foi enviado, o checkpoint não é mais necessário
+    def delete(self):
+        delete_blobs(self.container_name, self.prefix)
+        shutil.rmtree(self.local_dir, ignore_errors=True)
+        remove_empty_parents(self.local_dir, os.path.dirname(os.path.dirname(self.local_dir)))
+
+
+# Função para processar as simulações de Monte Carlo a partir de um arquivo JSON.
+# Simulações pequenas são distribuídas inteiras entre os processos; as grandes têm seus blocos de caminhos
+# distribuídos. Cada simulação usa a subsequência de índice seed_key (derivado pelo cliente dos parâmetros do trade;
+# na falta dele, simulation_index) da semente do arquivo, de modo que os resultados são idênticos para qualquer
+# número de processos e qualquer posição do trade no arquivo.
+def process_monte_carlo_simulations(input_file, workers=None, checkpoint_interval=0):
     # Carregar a lista de simulações do JSON de entrada
     with open(input_file, 'r') as f:
         data = json.load(f)
         simulations = data["simulations"]
 
+    # Simulações concluídas em execuções anteriores desta tarefa
+    checkpointer = Checkpointer(input_file, checkpoint_interval) if checkpoint_interval else None
+    checkpoint_seed, completed = checkpointer.load() if checkpointer is not None else (None, {})
+    if completed:
+        print(f"Retomando do checkpoint: {len(completed)} de {len(simulations)} simulações concluídas")
+
+    # Sem semente no arquivo, sorteia uma (ou usa a do checkpoint) e a registra no resultado para permitir reproduzir a execução
+    seed = data.get("seed")
+    if seed is None:
+        seed = checkpoint_seed if checkpoint_seed is not None else np.random.SeedSequence().entropy
+    root_seed = np.random.SeedSequence(seed)
+    if checkpointer is not None:
+        checkpointer.seed = seed
+    workers = workers or os.cpu_count() or 1
+
+    result_mode = data.get("result_mode", "full")
+    raw_payoffs = data.get("raw_payoffs", False)
+    quantile_sketch_size = data.get("quantile_sketch_size", 0)
+    options = (result_mode, raw_payoffs, quantile_sketch_size)
+
+    # Registra os resultados no próximo checkpoint assim que a simulação (ou o grupo) termina
+    def record(positions, results):
+        if checkpointer is not None:
+            checkpointer.add(positions, results)
+
+    def record_when_done(positions, grouped):
+        def callback(future):
+            if future.exception() is None:
+                record(positions, future.result() if grouped else [future.result()])
+        return callback
+
     # Executar a Simulação para cada conjunto de parâmetros na lista
-    results = []
-    for simulation in simulations:
-        params = simulation["parameters"]
-        result = monte_carlo_option_pricing(params)
-        simulation["results"] = result
-        results.append(simulation)
+    with ProcessPoolExecutor(max_workers=workers) if workers > 1 else nullcontext() as executor, checkpointer or nullcontext():
+        pending = []
+        groups = {}
+        for position, simulation in enumerate(simulations):
+            params = simulation["parameters"]
+            if position in completed:
+                simulation["results"] = completed[position]
+                continue
+            # Trades com o mesmo path_group (e a mesma faixa de caminhos) são precificados juntos, com a semente do grupo
+            if params.get("path_group") is not None:
+                groups.setdefault((params["path_group"], tuple(params.get("path_range") or ())), []).append(position)
+                continue
+            seed_sequence = child_seed(root_seed, simulation.get("seed_key", simulation.get("simulation_index", position)))
+            if executor is None or is_chunk_parallel(params, workers):
+                pending.append((position, params, seed_sequence))
+            else:
+                simulation["results"] = executor.submit(monte_carlo_option_pricing, params, MAX_CHUNK_BYTES, seed_sequence, None, *options)
+                simulation["results"].add_done_callback(record_when_done([position], grouped=False))
 
-    # Converter todos os resultados para JSON
-    result_json = json.dumps({"simulations": results}, indent=4)
+        group_results = {}
+        for key, positions in groups.items():
+            group_params = [simulations[position]["parameters"] for position in positions]
+            seed_sequence = child_seed(root_seed, key[0])
+            if executor is None or is_chunk_parallel(group_params[0], workers):
+                group_results[key] = monte_carlo_group_pricing(group_params, MAX_CHUNK_BYTES, seed_sequence, executor, *options)
+                record(positions, group_results[key])
+            else:
+                group_results[key] = executor.submit(monte_carlo_group_pricing, group_params, MAX_CHUNK_BYTES, seed_sequence, None, *options)
+                group_results[key].add_done_callback(record_when_done(positions, grouped=True))
+
+        for position, params, seed_sequence in pending:
+            simulations[position]["results"] = monte_carlo_option_pricing(params, MAX_CHUNK_BYTES, seed_sequence, executor, *options)
+            record([position], [simulations[position]["results"]])
+
+        for key, positions in groups.items():
+            if isinstance(group_results[key], Future):
+                group_results[key] = group_results[key].result()
+            for position, result in zip(positions, group_results[key]):
+                simulations[position]["results"] = result
+
+        results = []
+        for simulation in simulations:
+            if isinstance(simulation["results"], Future):
+                simulation["results"] = simulation["results"].result()
+            results.append(simulation)
 
-    # Salvar em um arquivo JSON
     output_file = input_file.replace("input", "result")
+
+    # Payoffs brutos do modo "statistics" vão concatenados para um .npy float32, referenciado por offset em cada resultado
+    if result_mode == "statistics" and raw_payoffs:
+        sidecar_file = output_file.replace(".json", ".npy")
+        total = sum(len(simulation["results"]["option_values"]) for simulation in results)
+        sidecar = np.lib.format.open_memmap(sidecar_file, mode="w+", dtype=np.float32, shape=(total,))
+        offset = 0
+        for simulation in results:
+            values = simulation["results"].pop("option_values")
+            sidecar[offset:offset + len(values)] = values
+            simulation["results"]["raw_payoffs"] = {"file": os.path.basename(sidecar_file), "offset": offset, "count": len(values)}
+            offset += len(values)
+        sidecar.flush()
+        del sidecar
+
+        upload_file_to_container('temp', sidecar_file)
+
+    # Converter todos os resultados para JSON compacto
+    result_json = json.dumps({"seed": seed, "simulations": results}, separators=(',', ':'))
+
+    # Salvar em um arquivo JSON
     with open(output_file, 'w') as f:
         f.write(result_json)
 
     upload_file_to_container('temp', output_file)
 
+    if checkpointer is not None:
+        checkpointer.delete()
+
     #print(f"Resultados salvos em '{output_file}'")
     #print(result_json)
 
 def main():
     parser = argparse.ArgumentParser(description="Processar simulações de Monte Carlo a partir de um arquivo JSON.")
     parser.add_argument('input_file', type=str, help='Caminho para o arquivo JSON de entrada.')
+    parser.add_argument('--workers', type=int, default=None, help='Número de processos (padrão: os.cpu_count()).')
+    parser.add_argument('--checkpoint-interval', type=float, default=0, help='Intervalo (s) entre checkpoints das simulações concluídas (0: sem checkpoint).')
     args = parser.parse_args()
 
-    process_monte_carlo_simulations(args.input_file)
+    process_monte_carlo_simulations(args.input_file, args.workers, args.checkpoint_interval)
 
     #process_monte_carlo_simulations('src/files/temp/monte_carlo_input_part_1.json')
 
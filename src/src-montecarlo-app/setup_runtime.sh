@@ -0,0 +1,31 @@
+#!/bin/bash
+# Instala o runtime Python do app (wheelhouse do pacote de aplicação) uma única vez por nó.
+# Uso: setup_runtime.sh <diretório do pacote de aplicação>
+set -e
+
+start_time=$(date +%s.%N)
+package_dir="$1"
+runtime_dir="$AZ_BATCH_NODE_SHARED_DIR/montecarlo-runtime"
+checksum=$(sha256sum "$package_dir/wheelhouse/SHA256SUMS" | cut -d ' ' -f 1)
+
+# Um nó que reinicia ou volta ao pool já tem o runtime com o mesmo checksum: nada a instalar
+if [ -f "$runtime_dir/.checksum" ] && [ "$(cat "$runtime_dir/.checksum")" = "$checksum" ]; then
+    status=cached
+else
+    (cd "$package_dir/wheelhouse" && sha256sum --quiet -c SHA256SUMS)
+
+    # Wheels são arquivos zip: basta extraí-los no site-packages (não é preciso apt-get nem pip)
+    rm -rf "$runtime_dir.tmp"
+    mkdir -p "$runtime_dir.tmp/site-packages"
+    for wheel in "$package_dir"/wheelhouse/*.whl; do
+        python3 -m zipfile -e "$wheel" "$runtime_dir.tmp/site-packages"
+    done
+    echo "$checksum" > "$runtime_dir.tmp/.checksum"
+
+    rm -rf "$runtime_dir"
+    mv "$runtime_dir.tmp" "$runtime_dir"
+    status=installed
+fi
+
+end_time=$(date +%s.%N)
+echo "{\"runtime\": \"$status\", \"checksum\": \"$checksum\", \"seconds\": $(python3 -c "print(round($end_time - $start_time, 3))")}" | tee "$AZ_BATCH_NODE_SHARED_DIR/montecarlo-runtime-setup.json"
@@ -0,0 +1,173 @@
+"""
+Stage timing trace of an orchestrator run, saved in the Chrome trace format
+(open it in chrome://tracing or https://ui.perfetto.dev).
+
+Spans are only recorded between start_trace and save_trace; otherwise span and traced do nothing.
+"""
+
+import datetime
+import functools
+import inspect
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Processos do trace: o cliente (orquestrador) e os nós do Batch
+CLIENT_PROCESS = 'client'
+NODES_PROCESS = 'batch nodes'
+
+
+class Trace:
+    """
+    Collects spans as Chrome trace events, with one lane (tid) per thread of the client or per Batch node.
+    """
+
+    def __init__(self, run_id: str):
+        self.run_id = run_id
+        self.events = []
+        self.lanes = {}
+        self.lock = threading.Lock()
+        # Eventos em microssegundos desde a época, para alinhar os horários medidos nos nós do Batch
+        self.offset = time.time() - time.perf_counter()
+
+    def _lane(self, process: str, lane: str) -> tuple:
+        with self.lock:
+            pid = (CLIENT_PROCESS, NODES_PROCESS).index(process) + 1
+            if (process, lane) not in self.lanes:
+                self.lanes[(process, lane)] = len(self.lanes) + 1
+                self.events.append({'ph': 'M', 'name': 'thread_name', 'pid': pid, 'tid': self.lanes[(process, lane)], 'args': {'name': lane}})
+            return pid, self.lanes[(process, lane)]
+
+    def add(self, name: str, category: str, start: float, end: float, process: str = CLIENT_PROCESS, lane: str = None, **args):
+        """
+        Adds a span.
+
+        Args:
+            name (str): The name of the span.
+            category (str): The stage of the span (split, upload, pool, queue, compute...).
+            start (float): The start time, in seconds since the epoch.
+            end (float): The end time, in seconds since the epoch.
+            process (str): CLIENT_PROCESS or NODES_PROCESS.
+            lane (str): The lane of the span (default: the current thread).
+            **args: Extra fields shown with the span.
+        """
+        pid, tid = self._lane(process, lane or threading.current_thread().name)
+        event = {'ph': 'X', 'name': name, 'cat': category, 'pid': pid, 'tid': tid,
+                 'ts': start * 1e6, 'dur': max(end - start, 0.0) * 1e6, 'args': args}
+        with self.lock:
+            self.events.append(event)
+
+    def now(self) -> float:
+        return self.offset + time.perf_counter()
+
+    def to_chrome(self) -> dict:
+        with self.lock:
+            events = list(self.events)
+        processes = [{'ph': 'M', 'name': 'process_name', 'pid': pid, 'args': {'name': name}}
+                     for pid, name in enumerate((CLIENT_PROCESS, NODES_PROCESS), start=1)]
+        return {'traceEvents': processes + events, 'displayTimeUnit': 'ms', 'otherData': {'run_id': self.run_id}}
+
+
+TRACE = None
+
+
+def start_trace(run_id: str = None) -> Trace:
+    """
+    Starts recording spans for a run.
+
+    Args:
+        run_id (str): The ID of the run (default: the current timestamp).
+
+    Returns:
+        Trace: The trace of the run.
+    """
+    global TRACE
+    TRACE = Trace(run_id or datetime.datetime.now().strftime('%Y%m%d-%H%M%S'))
+    return TRACE
+
+
+def save_trace(trace_dir: str) -> str:
+    """
+    Stops recording and writes the trace of the run to trace_dir/trace_<run_id>.json.
+
+    Args:
+        trace_dir (str): The directory of the trace files.
+
+    Returns:
+        str: The path of the trace file, or None if no trace was started.
+    """
+    global TRACE
+    if TRACE is None:
+        return None
+    trace, TRACE = TRACE, None
+    os.makedirs(trace_dir, exist_ok=True)
+    trace_file = os.path.join(trace_dir, f'trace_{trace.run_id}.json')
+    with open(trace_file, 'w') as file:
+        json.dump(trace.to_chrome(), file)
+    logger.info(f'Trace saved to {trace_file}')
+    return trace_file
+
+
+@contextmanager
+def span(name: str, category: str, **args):
+    """
+    Records the time spent in a block as a span of the client.
+
+    Args:
+        name (str): The name of the span.
+        category (str): The stage of the span.
+        **args: Extra fields shown with the span.
+    """
+    trace = TRACE
+    if trace is None:
+        yield
+        return
+    start = trace.now()
+    try:
+        yield
+    finally:
+        trace.add(name, category, start, trace.now(), **args)
+
+
+def add_span(name: str, category: str, start: datetime.datetime, end: datetime.datetime, process: str = NODES_PROCESS, lane: str = None, **args):
+    """
+    Records a span measured elsewhere (e.g. the execution_info of a Batch task).
+
+    Args:
+        name (str): The name of the span.
+        category (str): The stage of the span.
+        start (datetime.datetime): The start time (timezone-aware).
+        end (datetime.datetime): The end time (timezone-aware).
+        process (str): CLIENT_PROCESS or NODES_PROCESS.
+        lane (str): The lane of the span (e.g. the node ID).
+        **args: Extra fields shown with the span.
+    """
+    if TRACE is not None and start is not None and end is not None:
+        TRACE.add(name, category, start.timestamp(), end.timestamp(), process, lane, **args)
+
+
+def traced(category: str, *arg_names: str):
+    """
+    Decorator that records each call of a function as a span named after it.
+
+    Args:
+        category (str): The stage of the span.
+        *arg_names (str): Arguments of the function recorded with the span (e.g. the blob name).
+    """
+    def decorator(function):
+        signature = inspect.signature(function)
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if TRACE is None:
+                return function(*args, **kwargs)
+            bound = signature.bind(*args, **kwargs)
+            with span(function.__name__, category, **{name: str(bound.arguments.get(name)) for name in arg_names}):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
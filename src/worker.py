@@ -8,13 +8,15 @@ import logging
 
 import azure.batch.models as batchmodels
 
-import config, azure_impl.storage_impl as storage_impl, azure_impl.batch_impl as batch_impl
+import config
+import tracing
+from backend import storage_impl, batch_impl
 
 # Configuração básica do logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-def run_batch_process(input_file_paths):
+def run_batch_process(input_file_paths, input_files=None, on_task_completed=None, pool_plan=None):
     start_time = datetime.datetime.now().replace(microsecond=0)
     logger.info(f'Sample start: {start_time}')
     print()
@@ -23,12 +25,11 @@ def run_batch_process(input_file_paths):
     input_container_name = 'temp'
     storage_impl.create_container_if_not_exists(input_container_name)  # Use the new function
     
-    # Upload the data files.
-    logger.info('Uploading files to Azure Storage')
-    input_files = [
-        storage_impl.upload_file_to_container(input_container_name, file_path)
-        for file_path in input_file_paths]
-    print()
+    # Upload the data files (unless they were already uploaded while splitting).
+    if input_files is None:
+        logger.info('Uploading files to Azure Storage')
+        input_files = storage_impl.upload_files_to_container(input_container_name, input_file_paths)
+        print()
 
     try:
         timestap  = int(datetime.datetime.now().timestamp())
@@ -39,21 +40,38 @@ def run_batch_process(input_file_paths):
         job_id = f'{config.JOB_ID}'
         
         # Create the pool that will contain the compute nodes that will execute the tasks.        
-        batch_impl.create_pool(pool_id)
+        # The pool is sized by the workload plan, when one is given.
+        if pool_plan is None:
+            batch_impl.create_pool(pool_id)
+        else:
+            batch_impl.create_pool(pool_id, pool_plan['node_count'], pool_plan['autoscale_formula'], pool_plan['low_priority_node_count'])
 
         # Create the job that will run the tasks.
         batch_impl.create_job(job_id, pool_id)
 
         # Add the tasks to the job.
-        batch_impl.add_tasks(job_id, input_files, timestap)
+        task_ids = batch_impl.add_tasks(job_id, input_files, timestap)
 
-        # Pause execution until tasks reach Completed state.
-        batch_impl.wait_for_tasks_to_complete(job_id, datetime.timedelta(minutes=30))
+        with tracing.span('wait_for_tasks', 'wait', job_id=job_id):
+            if on_task_completed is None:
+                # Pause execution until tasks reach Completed state.
+                batch_impl.wait_for_tasks_to_complete(job_id, datetime.timedelta(minutes=30))
+            else:
+                # Notify each completed task (by the index of its input file) while the others are still running.
+                task_indexes = {task_id: idx for idx, task_id in enumerate(task_ids)}
+                for task in batch_impl.iter_completed_tasks(job_id, datetime.timedelta(minutes=30)):
+                    if task.id in task_indexes:
+                        on_task_completed(task_indexes[task.id])
         
         print()
         logger.info("Success! All tasks reached the 'Completed' state within the specified timeout period.")
         print()
 
+        # Node startup time (start task) of each node in the pool, and the queueing and compute time of each task
+        batch_impl.report_start_task_durations(pool_id)
+        batch_impl.trace_task_execution(job_id, task_ids)
+        print()
+
         # Print the stdout.txt and stderr.txt files for each task to the console
         batch_impl.print_task_output(job_id, timestap)
 
@@ -0,0 +1,35 @@
+import importlib.util
+import os
+import sys
+
+import pytest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC_DIR = os.path.join(ROOT_DIR, 'src')
+APP_PATH = os.path.join(SRC_DIR, 'src-montecarlo-app', 'montecarlo_app_template.py')
+
+# Os módulos do cliente são importados como no orquestrador (a partir de src/), no backend local e sem credenciais reais
+sys.path.insert(0, SRC_DIR)
+os.environ.setdefault('XVA_BACKEND', 'local')
+os.environ.setdefault('BATCH_ACCOUNT_URL', 'https://batch.invalid')
+os.environ.setdefault('STORAGE_ACCOUNT_NAME', 'devstoreaccount1')
+os.environ.setdefault('STORAGE_ACCOUNT_KEY', 'a2V5')
+
+
+@pytest.fixture(scope='session')
+def app():
+    # O app é carregado do template, registrado como montecarlo_app para que os processos filhos o encontrem
+    spec = importlib.util.spec_from_file_location('montecarlo_app', APP_PATH)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules['montecarlo_app'] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    # Os caminhos do pipeline (src/files/..., backend local) são relativos ao diretório corrente
+    for directory in ('input', 'temp', 'output'):
+        os.makedirs(tmp_path / 'src' / 'files' / directory)
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+# Call muito fora do dinheiro: com lotes de 100 caminhos, quase todos os primeiros lotes têm payoffs zerados
+DEEP_OTM = {
+    "num_simulations": 100,
+    "num_steps": 1,
+    "stock_price": 100,
+    "strike_price": 200,
+    "risk_free_rate": 0.03,
+    "volatility": 0.2,
+    "time_to_maturity": 1.0,
+    "target_ci_halfwidth": 0.001,
+}
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_zero_variance_batches_do_not_stop_the_adaptive_loop(app, seed):
+    params = {**DEEP_OTM, "max_simulations": 1_000_000}
+    result = app.monte_carlo_option_pricing(params, seed_sequence=np.random.SeedSequence(seed))
+    low, high = result["confidence_interval"]
+    price = app.black_scholes_price(100, 200, 0.03, 0.2, 1.0)
+
+    assert result["num_simulations_used"] >= app.DEFAULT_MIN_SIMULATIONS
+    assert result["expected_option_value"] > 0
+    assert 0 < (high - low) / 2 <= 0.001
+    assert abs(result["expected_option_value"] - price) < 3 * 0.001
+
+
+def test_minimum_sample_count_applies_before_the_stopping_rule(app):
+    params = {**DEEP_OTM, "strike_price": 100, "target_ci_halfwidth": 10.0, "min_simulations": 5000}
+    result = app.monte_carlo_option_pricing(params, seed_sequence=np.random.SeedSequence(0))
+    assert result["num_simulations_used"] == 5000
+
+
+def test_adaptive_loop_stops_at_max_simulations_without_variance(app):
+    params = {**DEEP_OTM, "strike_price": 1000, "max_simulations": 20000}
+    result = app.monte_carlo_option_pricing(params, seed_sequence=np.random.SeedSequence(0))
+    assert result["num_simulations_used"] == 20000
@@ -0,0 +1,63 @@
+import json
+import os
+
+import pytest
+
+from agreggator import ResultAggregator, aggregate_and_save
+from backend import storage_impl
+
+
+def write_result_part(name, simulations):
+    path = os.path.join('src/files/temp', name)
+    with open(path, 'w') as file:
+        json.dump({'seed': 1, 'simulations': simulations}, file)
+    storage_impl.upload_file_to_container('temp', path)
+
+
+def result(index, value, path_range=None, shard_count=None):
+    params = {'risk_free_rate': 0.0, 'time_to_maturity': 1.0}
+    simulation = {'simulation_index': index, 'parameters': params, 'results': {'option_values': [value, value]}}
+    if path_range is not None:
+        simulation['parameters'] = {**params, 'path_range': path_range}
+        simulation['shard_count'] = shard_count
+    return simulation
+
+
+def test_aggregated_file_follows_input_order(workdir):
+    # Partes com as simulações fora de ordem (LPT) e uma simulação dividida em faixas entre duas partes
+    write_result_part('part_1.json', [result(3, 3.0), result(0, 0.0), result(2, 2.0, [0, 2], 2)])
+    write_result_part('part_2.json', [result(4, 4.0), result(2, 2.0, [2, 4], 2), result(1, 1.0)])
+
+    aggregate_and_save(['part_1.json', 'part_2.json'])
+
+    with open('src/files/output/monte_carlo_result_aggregated.json') as file:
+        simulations = json.load(file)['simulations']
+    assert [simulation['simulation_index'] for simulation in simulations] == [0, 1, 2, 3, 4]
+    assert simulations[2]['results']['option_values'] == [2.0] * 4
+    assert storage_impl.get_blob_bytes('output', 'monte_carlo_result_aggregated.json') == open('src/files/output/monte_carlo_result_aggregated.json', 'rb').read()
+
+
+def test_output_is_written_while_later_parts_are_pending(workdir):
+    write_result_part('part_1.json', [result(0, 0.0), result(1, 1.0), result(4, 4.0)])
+    write_result_part('part_2.json', [result(2, 2.0), result(3, 3.0), result(5, 5.0)])
+
+    with ResultAggregator() as aggregator:
+        aggregator.add_part('part_1.json')
+        aggregator.wait_for_parts()
+        # O prefixo contíguo da primeira parte já foi gravado; só a simulação 4 espera pela segunda parte
+        assert aggregator.count == 2
+        assert list(aggregator.spooled) == [4]
+        aggregator.add_part('part_2.json')
+
+    assert aggregator.count == 6 and not aggregator.spooled
+    with open('src/files/output/monte_carlo_result_aggregated.json') as file:
+        simulations = json.load(file)['simulations']
+    assert [simulation['simulation_index'] for simulation in simulations] == [0, 1, 2, 3, 4, 5]
+
+
+def test_missing_shard_fails_the_aggregation(workdir):
+    write_result_part('part_1.json', [result(0, 0.0), result(1, 1.0, [0, 2], 3), result(1, 1.0, [4, 6], 3)])
+
+    with pytest.raises(ValueError, match=r'simulation_index 1: 3 shards expected, 2 read'):
+        aggregate_and_save(['part_1.json'])
+    assert not storage_impl.blob_exists('output', 'monte_carlo_result_aggregated.json')
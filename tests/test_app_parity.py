@@ -0,0 +1,51 @@
+import itertools
+import json
+
+import numpy as np
+import pytest
+
+import agreggator
+import client
+
+EXPOSURE = {
+    'stock_price': 100.0, 'strike_price': 105.0, 'volatility': 0.3, 'risk_free_rate': 0.03,
+    'time_to_maturity': 2.0, 'num_simulations': 5000, 'num_steps': 24, 'option_type': 'call',
+    'exposure_grid': 8, 'pfe_quantiles': [0.5, 0.95, 0.99], 'recovery_rate': 0.35,
+}
+
+
+def test_effective_num_steps_agrees_with_the_client(app):
+    # O cliente estima custos e agrupa caminhos com a sua cópia; o app simula com a dele
+    for option_type, exposure_grid, full_paths in itertools.product(['call', 'put', 'asian_call', 'asian_put'], [None, 0, 4], [None, False, True]):
+        params = {'option_type': option_type, 'num_steps': 52}
+        if exposure_grid is not None:
+            params['exposure_grid'] = exposure_grid
+        if full_paths is not None:
+            params['full_paths'] = full_paths
+        assert app.effective_num_steps(params) == client.effective_num_steps(params), params
+
+
+@pytest.mark.parametrize('hazard_rate', [0.02, [0.01, 0.01, 0.02, 0.02, 0.03, 0.03, 0.04, 0.04]])
+def test_aggregator_recomputes_the_app_exposure_metrics(app, hazard_rate):
+    params = {**EXPOSURE, 'hazard_rate': hazard_rate}
+    result = app.monte_carlo_option_pricing(params, seed_sequence=np.random.SeedSequence(8), result_mode='statistics')
+    # O perfil chega ao agregador pelo JSON do resultado da parte
+    profile = json.loads(json.dumps(result['exposure']))
+
+    merged = agreggator.merge_exposure_profiles([profile], params)
+
+    assert merged['cva'] == pytest.approx(profile['cva'], rel=1e-12)
+    np.testing.assert_allclose(merged['discounted_expected_exposure'], profile['discounted_expected_exposure'], rtol=1e-12)
+    assert merged['pfe'] == profile['pfe']
+
+
+def test_sketch_quantiles_agree_with_the_app(app):
+    rng = np.random.default_rng(12)
+    exposures = np.maximum(rng.lognormal(0.0, 1.0, size=(20000, 4)) - [0.0, 0.5, 1.0, 3.0], 0.0)
+    for relative_accuracy in (0.005, 0.02):
+        sketch = json.loads(json.dumps({
+            'relative_accuracy': relative_accuracy, 'min_value': app.EXPOSURE_SKETCH_MIN_VALUE,
+            **app.exposure_statistics(exposures, relative_accuracy)['sketch'],
+        }, default=lambda value: value.tolist()))
+        for quantile in (0.0, 0.25, 0.5, 0.9, 0.999, 1.0):
+            assert agreggator.exposure_sketch_quantiles(sketch, quantile) == app.exposure_sketch_quantiles(sketch, quantile, relative_accuracy)
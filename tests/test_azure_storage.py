@@ -0,0 +1,188 @@
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from azure.core.exceptions import ResourceNotFoundError
+
+from azure_impl import storage_impl
+
+
+class FakeDownloader:
+    """
+    Downloader of a blob, like StorageStreamDownloader: readinto writes the content in chunks.
+    """
+
+    def __init__(self, path: str, chunk_size: int):
+        self.path = path
+        self.chunk_size = chunk_size
+
+    def readinto(self, stream) -> int:
+        size = 0
+        with open(self.path, 'rb') as file:
+            while chunk := file.read(self.chunk_size):
+                stream.write(chunk)
+                size += len(chunk)
+        return size
+
+    def readall(self) -> bytes:
+        with open(self.path, 'rb') as file:
+            return file.read()
+
+
+class FakeBlobClient:
+    """
+    Blob client backed by a directory: committed blobs are files, staged blocks stay in memory until committed.
+    """
+
+    def __init__(self, service, container_name: str, blob_name: str):
+        self.service = service
+        self.path = os.path.join(service.root, container_name, blob_name)
+
+    def upload_blob(self, data, overwrite=False, max_concurrency=1):
+        self.service.calls.append(('upload_blob', os.path.basename(self.path), max_concurrency))
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, 'wb') as file:
+            file.write(data if isinstance(data, bytes) else data.read())
+
+    def stage_block(self, block_id: str, data: bytes):
+        with self.service.lock:
+            self.service.in_flight += 1
+            self.service.max_in_flight = max(self.service.max_in_flight, self.service.in_flight)
+        # Blocos terminam fora de ordem, como nas requisições paralelas
+        time.sleep(random.uniform(0, 0.005))
+        with self.service.lock:
+            self.service.staged[(self.path, block_id)] = bytes(data)
+            self.service.in_flight -= 1
+
+    def commit_block_list(self, blocks):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, 'wb') as file:
+            for block in blocks:
+                file.write(self.service.staged.pop((self.path, block.id)))
+        self.service.committed_block_ids[self.path] = [block.id for block in blocks]
+
+    def download_blob(self, max_concurrency=1):
+        if not os.path.exists(self.path):
+            raise ResourceNotFoundError('BlobNotFound')
+        self.service.calls.append(('download_blob', os.path.basename(self.path), max_concurrency))
+        return FakeDownloader(self.path, chunk_size=1000)
+
+
+class FakeBlobServiceClient:
+
+    def __init__(self, root: str):
+        self.root = root
+        self.lock = threading.Lock()
+        self.staged = {}
+        self.committed_block_ids = {}
+        self.calls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def get_blob_client(self, container_name: str, blob_name: str):
+        return FakeBlobClient(self, container_name, blob_name)
+
+
+@pytest.fixture
+def blob_service(tmp_path, monkeypatch):
+    service = FakeBlobServiceClient(str(tmp_path / 'storage'))
+    monkeypatch.setattr(storage_impl, 'BLOB_SERVICE_CLIENT', service)
+    return service
+
+
+def blob_content(service, container_name, blob_name):
+    with open(os.path.join(service.root, container_name, blob_name), 'rb') as file:
+        return file.read()
+
+
+def test_block_upload_commits_blocks_in_write_order(blob_service):
+    data = os.urandom(10_000)
+    with storage_impl.BlockBlobUploader('output', 'aggregated.json', block_size=1024, max_concurrency=3) as uploader:
+        # Escritas de tamanhos variados, que não coincidem com os limites dos blocos
+        position = 0
+        while position < len(data):
+            size = random.randint(1, 700)
+            uploader.write(data[position:position + size])
+            position += size
+
+    assert blob_content(blob_service, 'output', 'aggregated.json') == data
+    block_ids = blob_service.committed_block_ids[os.path.join(blob_service.root, 'output', 'aggregated.json')]
+    assert len(block_ids) == 10
+    assert len({len(block_id) for block_id in block_ids}) == 1
+    assert blob_service.max_in_flight <= 3
+    assert not blob_service.staged
+
+
+def test_block_upload_of_empty_blob_commits_one_block(blob_service):
+    with storage_impl.BlockBlobUploader('output', 'empty.json'):
+        pass
+    assert blob_content(blob_service, 'output', 'empty.json') == b''
+
+
+def test_block_upload_is_not_committed_on_error(blob_service):
+    with pytest.raises(RuntimeError):
+        with storage_impl.BlockBlobUploader('output', 'failed.json', block_size=16) as uploader:
+            uploader.write(b'x' * 100)
+            raise RuntimeError('aggregation failed')
+    assert not os.path.exists(os.path.join(blob_service.root, 'output', 'failed.json'))
+
+
+def test_block_upload_cancels_queued_blocks_on_error(blob_service, monkeypatch):
+    started, release = threading.Event(), threading.Event()
+    uploader = storage_impl.BlockBlobUploader('output', 'failed.json', block_size=16, max_concurrency=3)
+    # Um envio por vez: o primeiro bloco fica preso até o erro e os demais esperam na fila
+    uploader.executor = ThreadPoolExecutor(max_workers=1)
+    stage_block = uploader.blob_client.stage_block
+    monkeypatch.setattr(uploader.blob_client, 'stage_block', lambda block_id, data: started.set() or release.wait() and stage_block(block_id, data))
+    threading.Timer(0.2, release.set).start()
+
+    with pytest.raises(RuntimeError):
+        with uploader:
+            uploader.write(b'x' * 48)
+            started.wait()
+            raise RuntimeError('aggregation failed')
+
+    assert [future.cancelled() for future in uploader.pending] == [False, True, True]
+    assert not os.path.exists(os.path.join(blob_service.root, 'output', 'failed.json'))
+
+
+def test_batch_upload_and_download_round_trip(blob_service, tmp_path):
+    contents = {f'part_{i}.json': os.urandom(random.randint(0, 5000)) for i in range(12)}
+    file_paths = []
+    for name, content in contents.items():
+        file_paths.append(str(tmp_path / name))
+        with open(file_paths[-1], 'wb') as file:
+            file.write(content)
+
+    resource_files = storage_impl.upload_files_to_container('temp', file_paths, max_workers=4)
+    assert [resource_file.file_path for resource_file in resource_files] == list(contents)
+    assert all(resource_file.http_url.startswith(f'https://devstoreaccount1.blob.core.windows.net/temp/{name}?')
+               for resource_file, name in zip(resource_files, contents))
+
+    os.makedirs(tmp_path / 'downloads')
+    download_paths = [str(tmp_path / 'downloads' / name) for name in contents]
+    downloaded = list(storage_impl.get_files_from_container('temp', list(contents), download_paths, max_workers=4))
+
+    # Os caminhos voltam na ordem pedida, cada um já com o conteúdo completo em disco
+    assert downloaded == download_paths
+    for path, content in zip(downloaded, contents.values()):
+        with open(path, 'rb') as file:
+            assert file.read() == content
+
+
+def test_download_streams_into_file_with_per_blob_concurrency(blob_service, tmp_path):
+    content = os.urandom(123_456)
+    blob_service.get_blob_client('temp', 'result.json').upload_blob(content)
+
+    path = storage_impl.get_file_from_container('temp', 'result.json', str(tmp_path / 'result.json'), max_concurrency=5)
+
+    with open(path, 'rb') as file:
+        assert file.read() == content
+    assert ('download_blob', 'result.json', 5) in blob_service.calls
+
+
+def test_missing_blob_bytes_is_none(blob_service):
+    assert storage_impl.get_blob_bytes('temp', 'missing.json') is None
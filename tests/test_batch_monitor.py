@@ -0,0 +1,84 @@
+import datetime
+import re
+from types import SimpleNamespace
+
+import pytest
+
+from azure_impl import batch_impl
+
+
+class FakeBatchClient:
+    """
+    Batch client whose job completes `per_poll` tasks on each task-counts request and
+    evaluates the state/stateTransitionTime filters of the task list queries.
+    """
+
+    def __init__(self, num_tasks: int, per_poll: int):
+        self.start = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+        self.tasks = [SimpleNamespace(id=f'task_{i}', state='active', state_transition_time=self.start) for i in range(num_tasks)]
+        self.per_poll = per_poll
+        self.polls = 0
+        self.listed = []
+        # Listagens em que cada tarefa concluída ainda não aparece
+        self.hidden = {}
+        self.job = SimpleNamespace(get_task_counts=self.get_task_counts)
+        self.task = SimpleNamespace(list=self.list_tasks)
+
+    def get_task_counts(self, job_id):
+        for task in self.tasks[self.polls * self.per_poll:(self.polls + 1) * self.per_poll]:
+            task.state = 'completed'
+            task.state_transition_time = self.start + datetime.timedelta(minutes=self.polls + 1)
+        self.polls += 1
+        completed = sum(task.state == 'completed' for task in self.tasks)
+        return SimpleNamespace(task_counts=SimpleNamespace(completed=completed, active=len(self.tasks) - completed, running=0))
+
+    def list_tasks(self, job_id, task_list_options):
+        task_filter = task_list_options.filter
+        if task_filter.startswith("state ne 'completed'"):
+            return [task for task in self.tasks if task.state != 'completed']
+        tasks = [task for task in self.tasks if task.state == 'completed']
+        since = re.search(r"stateTransitionTime gt datetime'([^']+)'", task_filter)
+        if since:
+            since = datetime.datetime.strptime(since.group(1), '%Y-%m-%dT%H:%M:%S.%fZ').replace(tzinfo=datetime.timezone.utc)
+            tasks = [task for task in tasks if task.state_transition_time > since]
+        visible = [task for task in tasks if self.hidden.get(task.id, 0) <= 0]
+        for task in tasks:
+            self.hidden[task.id] = self.hidden.get(task.id, 0) - 1
+        tasks = visible
+        self.listed.append(len(tasks))
+        return tasks
+
+
+def test_completed_tasks_are_listed_incrementally(monkeypatch):
+    client = FakeBatchClient(num_tasks=50, per_poll=5)
+    monkeypatch.setattr(batch_impl, 'BATCH_CLIENT', client)
+    monkeypatch.setattr(batch_impl.time, 'sleep', lambda seconds: None)
+
+    completed = [task.id for task in batch_impl.iter_completed_tasks('job', datetime.timedelta(minutes=1))]
+
+    assert sorted(completed) == sorted(task.id for task in client.tasks)
+    assert len(completed) == len(set(completed))
+    # Cada listagem devolve só as conclusões da última janela, não todas as tarefas concluídas do job
+    assert max(client.listed) <= 2 * client.per_poll
+    assert sum(client.listed) <= 2 * len(client.tasks)
+
+
+def test_late_visible_completion_of_the_last_poll_is_yielded(monkeypatch):
+    client = FakeBatchClient(num_tasks=10, per_poll=5)
+    # A última tarefa concluída só aparece na terceira listagem depois de concluir
+    client.hidden['task_9'] = 2
+    monkeypatch.setattr(batch_impl, 'BATCH_CLIENT', client)
+    monkeypatch.setattr(batch_impl.time, 'sleep', lambda seconds: None)
+
+    completed = [task.id for task in batch_impl.iter_completed_tasks('job', datetime.timedelta(minutes=1))]
+
+    assert sorted(completed) == sorted(task.id for task in client.tasks)
+
+
+def test_timeout_raises(monkeypatch):
+    client = FakeBatchClient(num_tasks=5, per_poll=0)
+    monkeypatch.setattr(batch_impl, 'BATCH_CLIENT', client)
+    monkeypatch.setattr(batch_impl.time, 'sleep', lambda seconds: None)
+
+    with pytest.raises(RuntimeError):
+        list(batch_impl.iter_completed_tasks('job', datetime.timedelta(milliseconds=10)))
@@ -0,0 +1,33 @@
+from types import SimpleNamespace
+
+import azure.batch.models as batchmodels
+import pytest
+
+import config
+from azure_impl import batch_impl
+
+
+@pytest.fixture
+def added_pools(monkeypatch):
+    pools = []
+    monkeypatch.setattr(batch_impl, 'BATCH_CLIENT', SimpleNamespace(pool=SimpleNamespace(add=pools.append)))
+    monkeypatch.setattr(batch_impl, 'get_lastest_version_batch_application', lambda application_id: '1.0')
+    return pools
+
+
+@pytest.mark.parametrize('scheduling', ['spread', 'pack'])
+def test_pool_has_one_slot_per_task_and_the_scheduling_policy(added_pools, monkeypatch, scheduling):
+    monkeypatch.setattr(config, 'POOL_TASK_SLOTS_PER_NODE', 4)
+    monkeypatch.setattr(config, 'POOL_TASK_SCHEDULING', scheduling)
+
+    batch_impl.create_pool('pool', node_count=3, low_priority_node_count=1)
+
+    [pool] = added_pools
+    assert pool.task_slots_per_node == 4
+    assert pool.task_scheduling_policy.node_fill_type == batchmodels.ComputeNodeFillType(scheduling)
+    assert (pool.target_dedicated_nodes, pool.target_low_priority_nodes) == (3, 1)
+
+
+def test_default_slots_fill_the_cores_of_the_vm():
+    assert config.POOL_TASK_SLOTS_PER_NODE * config.POOL_CORES_PER_TASK == config.POOL_VM_CORES
+    assert config.NUM_PARTS == config.POOL_NODE_COUNT * config.POOL_TASK_SLOTS_PER_NODE
@@ -0,0 +1,32 @@
+import json
+import sys
+
+import benchmark
+from generate_portfolio import iter_synthetic_simulations, write_portfolio
+
+
+def test_generator_is_reproducible():
+    first = list(iter_synthetic_simulations(50, seed=4))
+    assert first == list(iter_synthetic_simulations(50, seed=4))
+    assert first != list(iter_synthetic_simulations(50, seed=5))
+
+
+def test_kernel_path_steps_count_a_single_step_for_european_trades(app, workdir, monkeypatch):
+    # O estágio recarrega o app; o módulo da sessão é restaurado no fim do teste
+    monkeypatch.setitem(sys.modules, 'montecarlo_app', app)
+    write_portfolio(f'src/files/input/{benchmark.PORTFOLIO_FILE_NAME}', 40, seed=1, path_counts=(1000, 2000), step_counts=(12, 52))
+
+    metrics = benchmark.bench_kernel({'kernel_trades': 16, 'seed': 0, 'result_mode': 'statistics'})
+
+    simulations = list(iter_synthetic_simulations(40, seed=1, path_counts=(1000, 2000), step_counts=(12, 52)))[:16]
+    effective = [params['num_simulations'] * (1 if params['option_type'] in ('call', 'put') else params['num_steps'])
+                 for params in (simulation['parameters'] for simulation in simulations)]
+    assert any(simulation['parameters']['option_type'] in ('call', 'put') for simulation in simulations)
+    assert metrics['trades'] == 16
+    assert metrics['path_steps'] == sum(effective)
+    assert metrics['path_steps_per_second'] == metrics['path_steps'] / metrics['seconds']
+
+    with open(benchmark.KERNEL_RESULTS_FILE) as file:
+        results = json.load(file)
+    assert [result['parameters'] for result in results] == [simulation['parameters'] for simulation in simulations]
+    assert all('statistics' in result['results'] for result in results)
@@ -0,0 +1,128 @@
+import json
+import os
+from types import SimpleNamespace
+
+import pytest
+
+import config
+from azure_impl import batch_impl as azure_batch_impl
+from backend import storage_impl
+from local_impl import batch_impl as local_batch_impl
+
+PART = 'src/files/temp/monte_carlo_input_part_1.json'
+
+
+class Killed(BaseException):
+    """
+    Stands for the task being killed (e.g. a preempted node): nothing pending is flushed.
+    """
+
+
+def write_part():
+    simulations = []
+    for index, option_type in enumerate(['call', 'asian_put', 'put', 'asian_call', 'call', 'put']):
+        simulations.append({'simulation_index': index, 'seed_key': 1000 + index, 'parameters': {
+            'stock_price': 100.0, 'strike_price': 90.0 + 4 * index, 'volatility': 0.2, 'risk_free_rate': 0.05,
+            'time_to_maturity': 1.0, 'num_simulations': 3000, 'num_steps': 12, 'option_type': option_type,
+        }})
+    with open(PART, 'w') as file:
+        json.dump({'seed': 42, 'result_mode': 'statistics', 'raw_payoffs': True, 'simulations': simulations}, file)
+
+
+def read_outputs():
+    with open(PART.replace('input', 'result'), 'rb') as file:
+        result = file.read()
+    with open(PART.replace('input', 'result').replace('.json', '.npy'), 'rb') as file:
+        return result, file.read()
+
+
+@pytest.fixture
+def storage_dir(workdir, monkeypatch):
+    monkeypatch.setenv('MONTECARLO_LOCAL_STORAGE_DIR', os.path.abspath(storage_impl.STORAGE_DIR))
+    return os.path.abspath(storage_impl.STORAGE_DIR)
+
+
+def test_interrupted_run_resumes_to_identical_outputs(app, storage_dir, monkeypatch):
+    write_part()
+    app.process_monte_carlo_simulations(PART, workers=1, checkpoint_interval=3600)
+    clean = read_outputs()
+
+    # Antes de cada precificação grava o checkpoint das anteriores; na quarta a tarefa morre com 3 checkpoints gravados
+    original_pricing, original_enter, original_flush = app.monte_carlo_option_pricing, app.Checkpointer.__enter__, app.Checkpointer.flush
+    checkpointers, calls, killed = [], [], []
+
+    def enter(self):
+        checkpointers.append(self)
+        return original_enter(self)
+
+    def flush(self):
+        if killed:
+            self.pending = []
+            return
+        original_flush(self)
+
+    def pricing(*args, **kwargs):
+        if calls:
+            checkpointers[-1].flush()
+        if len(calls) == 3:
+            killed.append(True)
+            raise Killed()
+        calls.append(True)
+        return original_pricing(*args, **kwargs)
+
+    monkeypatch.setattr(app.Checkpointer, '__enter__', enter)
+    monkeypatch.setattr(app.Checkpointer, 'flush', flush)
+    monkeypatch.setattr(app, 'monte_carlo_option_pricing', pricing)
+    os.remove(PART.replace('input', 'result'))
+    with pytest.raises(Killed):
+        app.process_monte_carlo_simulations(PART, workers=1, checkpoint_interval=3600)
+    assert not os.path.exists(PART.replace('input', 'result'))
+    assert len(os.listdir(os.path.join(storage_dir, 'temp', checkpointers[-1].prefix))) == 3
+
+    # A reexecução precifica só as simulações que não estavam no checkpoint
+    monkeypatch.setattr(app.Checkpointer, 'flush', original_flush)
+    repriced = []
+    monkeypatch.setattr(app, 'monte_carlo_option_pricing', lambda *args, **kwargs: repriced.append(True) or original_pricing(*args, **kwargs))
+    app.process_monte_carlo_simulations(PART, workers=1, checkpoint_interval=3600)
+
+    assert len(repriced) == 3
+    assert read_outputs() == clean
+    # O checkpoint é apagado por inteiro, sem deixar o diretório checkpoint/ vazio
+    assert not os.path.exists(os.path.join(storage_dir, 'temp', 'checkpoint'))
+    assert not os.path.exists(os.path.join(os.path.dirname(PART), 'checkpoint'))
+
+
+def test_azure_tasks_are_retried_and_resume_from_checkpoint(monkeypatch):
+    added = []
+    client = SimpleNamespace(task=SimpleNamespace(add_collection=lambda job_id, tasks: added.extend(tasks)))
+    monkeypatch.setattr(azure_batch_impl, 'BATCH_CLIENT', client)
+    monkeypatch.setattr(azure_batch_impl, 'get_lastest_version_batch_application', lambda application_id: '1.0')
+    input_files = [SimpleNamespace(file_path=f'monte_carlo_input_part_{i}.json') for i in range(1, 3)]
+
+    task_ids = azure_batch_impl.add_tasks('job', input_files, 123)
+
+    assert task_ids == ['Task-123-0', 'Task-123-1']
+    for task in added:
+        assert task.constraints.max_task_retry_count == config.TASK_MAX_RETRY_COUNT
+        assert f'--checkpoint-interval {config.CHECKPOINT_INTERVAL}' in task.command_line
+
+
+@pytest.mark.parametrize('returncodes, expected', [([1, -9, 0], 0), ([1] * 10, 1)])
+def test_local_task_is_retried_up_to_max_retry_count(workdir, monkeypatch, returncodes, expected):
+    monkeypatch.setattr(config, 'TASK_MAX_RETRY_COUNT', 3)
+    runs = []
+
+    def run(command, **kwargs):
+        runs.append(command)
+        return SimpleNamespace(returncode=returncodes[len(runs) - 1])
+
+    monkeypatch.setattr(local_batch_impl.subprocess, 'run', run)
+    with open(PART, 'w') as file:
+        file.write('{}')
+    resource_file = local_batch_impl.storage_impl.ResourceFile(http_url=os.path.abspath(PART), file_path=os.path.basename(PART))
+    task = local_batch_impl.LocalTask('Task-0')
+
+    assert local_batch_impl.run_task(task, str(workdir / 'task'), resource_file) == expected
+    assert len(runs) == min(len(returncodes), config.TASK_MAX_RETRY_COUNT + 1)
+    assert all(command[-2:] == ['--checkpoint-interval', str(config.CHECKPOINT_INTERVAL)] for command in runs)
+    assert task.end_time is not None
@@ -0,0 +1,105 @@
+import json
+
+import numpy as np
+
+import client
+
+EUROPEAN = {
+    "num_simulations": 10000,
+    "num_steps": 252,
+    "stock_price": 100,
+    "strike_price": 100,
+    "risk_free_rate": 0.03,
+    "volatility": 0.2,
+    "time_to_maturity": 1.0,
+    "option_type": "call",
+}
+ASIAN = {**EUROPEAN, "option_type": "asian_call"}
+
+
+def simulation(index, params):
+    return {"project": f"trade {index}", "simulation_index": index, "parameters": params}
+
+
+def test_european_cost_uses_the_single_exact_step():
+    assert client.estimate_cost(EUROPEAN) == 10000
+    assert client.estimate_cost({**EUROPEAN, "option_type": "put"}) == 10000
+    assert client.estimate_cost(ASIAN) == 10000 * 252
+
+
+def test_full_paths_and_exposure_grid_cost_every_step():
+    assert client.estimate_cost({**EUROPEAN, "full_paths": True}) == 10000 * 252
+    assert client.estimate_cost({**EUROPEAN, "exposure_grid": 12}) == 10000 * 252
+
+
+def test_path_range_cost_counts_only_its_paths():
+    assert client.estimate_cost({**ASIAN, "path_range": [0, 2500]}) == 2500 * 252
+
+
+def test_partitions_balance_european_and_asian_trades():
+    # Um trade asiático custa tanto quanto 252 europeus: com o custo por num_steps, os europeus pesariam igual
+    simulations = [simulation(0, ASIAN)] + [simulation(i, {**EUROPEAN, "strike_price": 90 + i}) for i in range(1, 11)]
+    parts, report = client.plan_partitions(simulations, 2)
+    assert sum(report['part_costs']) == 10000 * 252 + 10 * 10000
+    assert report['imbalance'] < 1.05
+
+
+def grouped(simulations):
+    for simulation in simulations:
+        simulation.setdefault("seed_key", client.seed_key(simulation["parameters"]))
+    client.assign_path_groups(simulations)
+    return [simulation["parameters"].get("path_group") for simulation in simulations]
+
+
+def test_path_groups_join_only_trades_over_the_same_paths():
+    small = {**EUROPEAN, "num_steps": 12}
+    groups = grouped([
+        simulation(0, small),
+        simulation(1, {**small, "strike_price": 110, "option_type": "put"}),
+        # Mesmo mercado, mas outra grade de passos (asiática) ou outro número de caminhos
+        simulation(2, {**small, "option_type": "asian_call"}),
+        simulation(3, {**small, "option_type": "asian_put", "strike_price": 95}),
+        simulation(4, {**small, "num_simulations": 20000}),
+        # Outro subjacente, variáveis antitéticas e gregas não entram no grupo
+        simulation(5, {**small, "volatility": 0.3}),
+        simulation(6, {**small, "variance_reduction": "antithetic"}),
+        simulation(7, {**small, "greeks": "pathwise"}),
+    ])
+    assert groups[0] == groups[1] is not None
+    assert groups[2] == groups[3] is not None
+    assert groups[0] != groups[2]
+    assert groups[4:] == [None] * 4
+
+
+def test_adding_a_trade_keeps_the_path_group():
+    trades = [simulation(1, {**EUROPEAN, "strike_price": 100}), simulation(2, {**EUROPEAN, "strike_price": 105})]
+    before = grouped([dict(trade, parameters=dict(trade["parameters"])) for trade in trades])
+    # O novo trade tem a menor seed_key: com o grupo derivado dos membros, ele mudaria o path_group dos outros
+    new = simulation(0, {**EUROPEAN, "strike_price": 90})
+    new["seed_key"] = 0
+    after = grouped([new] + trades)
+    assert after[1:] == before
+    assert after[0] == before[0]
+
+
+def test_group_member_prices_like_a_standalone_trade_with_the_group_seed(app, workdir, monkeypatch):
+    monkeypatch.setenv("MONTECARLO_LOCAL_STORAGE_DIR", str(workdir / "storage"))
+    small = {**EUROPEAN, "num_steps": 12, "option_type": "asian_call"}
+    simulations = [simulation(i, {**small, "strike_price": strike}) for i, strike in enumerate([90, 100, 110])]
+    simulations.append(simulation(3, {**small, "option_type": "asian_put"}))
+    group = grouped(simulations)[0]
+    part = "src/files/temp/monte_carlo_input_part_1.json"
+    with open(part, "w") as file:
+        json.dump({"seed": 5, "simulations": simulations}, file)
+
+    app.process_monte_carlo_simulations(part, workers=1)
+
+    with open(part.replace("input", "result")) as file:
+        results = json.load(file)["simulations"]
+    group_seed = app.child_seed(np.random.SeedSequence(5), group)
+    for result in results:
+        params = {key: value for key, value in result["parameters"].items() if key != "path_group"}
+        standalone = app.monte_carlo_option_pricing(params, app.MAX_CHUNK_BYTES, group_seed)
+        assert result["results"]["option_values"] == standalone["option_values"]
+        for key, value in result["results"].items():
+            assert standalone[key] == value, key
@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+from agreggator import merge_exposure_profiles
+
+PARAMS = {
+    'stock_price': 100.0, 'strike_price': 110.0, 'volatility': 0.3, 'risk_free_rate': 0.03,
+    'time_to_maturity': 1.0, 'num_simulations': 20000, 'num_steps': 12, 'option_type': 'call',
+    'exposure_grid': 4, 'pfe_quantiles': [0.5, 0.95, 0.99],
+}
+
+
+def exposure(app, params, max_chunk_bytes, seed_sequence=None):
+    result = app.monte_carlo_option_pricing(params, max_chunk_bytes, seed_sequence=seed_sequence, result_mode='statistics')
+    return result['exposure']
+
+
+@pytest.mark.parametrize('max_chunk_bytes', [1 << 14, 1 << 16, 1 << 18])
+def test_pfe_does_not_depend_on_chunk_count(app, max_chunk_bytes):
+    # Sem semente, os caminhos vêm do gerador global em ordem: as mesmas amostras em um único bloco ou em dezenas de blocos
+    np.random.seed(0)
+    single = exposure(app, PARAMS, app.MAX_CHUNK_BYTES)
+    np.random.seed(0)
+    chunked = exposure(app, PARAMS, max_chunk_bytes)
+    assert chunked['pfe'] == single['pfe']
+    assert chunked['sketch'] == single['sketch']
+
+
+def test_pfe_of_merged_path_ranges_matches_single_run(app):
+    seed_sequence = np.random.SeedSequence(7)
+    single = exposure(app, PARAMS, 1 << 16, seed_sequence)
+    ranges = [[0, 5000], [5000, 12000], [12000, 20000]]
+    profiles = [exposure(app, {**PARAMS, 'path_range': path_range}, 1 << 16, seed_sequence) for path_range in ranges]
+    merged = merge_exposure_profiles(profiles, PARAMS)
+    assert merged['pfe'] == single['pfe']
+    np.testing.assert_allclose(merged['expected_exposure'], single['expected_exposure'])
+
+
+def test_sketch_quantiles_are_within_relative_accuracy(app):
+    rng = np.random.default_rng(3)
+    # Exposições com massa em zero (opção fora do dinheiro) e cauda longa
+    exposures = np.maximum(rng.lognormal(0.0, 1.5, size=(50000, 3)) - [0.5, 1.0, 2.0], 0.0)
+    for relative_accuracy in (0.01, 0.05):
+        statistics = app.exposure_statistics(exposures, relative_accuracy)
+        for quantile in (0.1, 0.5, 0.9, 0.99, 1.0):
+            expected = np.quantile(exposures, quantile, axis=0, method='lower')
+            actual = app.exposure_sketch_quantiles(statistics['sketch'], quantile, relative_accuracy)
+            np.testing.assert_allclose(actual, expected, rtol=relative_accuracy, atol=app.EXPOSURE_SKETCH_MIN_VALUE)
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+from scipy.stats import norm
+
+from agreggator import merge_greeks
+
+PARAMS = {
+    'stock_price': 100.0, 'strike_price': 105.0, 'volatility': 0.25, 'risk_free_rate': 0.03,
+    'time_to_maturity': 1.0, 'num_simulations': 200000, 'num_steps': 12, 'option_type': 'call',
+}
+
+
+def black_scholes_call_greeks(S, K, sigma, r, T):
+    d1 = (np.log(S / K) + (r + 0.5 * sigma**2) * T) / (sigma * np.sqrt(T))
+    return {
+        'delta': norm.cdf(d1),
+        'gamma': norm.pdf(d1) / (S * sigma * np.sqrt(T)),
+        'vega': S * norm.pdf(d1) * np.sqrt(T),
+    }
+
+
+def greeks(app, params, seed=11, max_chunk_bytes=1 << 20):
+    result = app.monte_carlo_option_pricing(params, max_chunk_bytes, seed_sequence=np.random.SeedSequence(seed), result_mode='statistics')
+    return result['greeks']
+
+
+@pytest.mark.parametrize('method', ['pathwise', 'bump'])
+def test_european_call_greeks_match_black_scholes(app, method):
+    expected = black_scholes_call_greeks(PARAMS['stock_price'], PARAMS['strike_price'], PARAMS['volatility'], PARAMS['risk_free_rate'], PARAMS['time_to_maturity'])
+    result = greeks(app, {**PARAMS, 'greeks': method})
+    for name, value in expected.items():
+        assert result[name]['std_error'] > 0
+        assert abs(result[name]['value'] - value) < 4 * result[name]['std_error'], name
+
+
+def test_bump_and_pathwise_greeks_agree(app):
+    pathwise = greeks(app, {**PARAMS, 'greeks': 'pathwise'})
+    bump = greeks(app, {**PARAMS, 'greeks': 'bump'})
+    for name in ('delta', 'gamma', 'vega'):
+        tolerance = 4 * np.hypot(pathwise[name]['std_error'], bump[name]['std_error'])
+        assert abs(pathwise[name]['value'] - bump[name]['value']) < tolerance, name
+
+
+@pytest.mark.parametrize('method', ['pathwise', 'bump'])
+def test_merged_shard_greeks_equal_unsplit_estimate(app, method):
+    params = {**PARAMS, 'option_type': 'asian_call', 'num_simulations': 20000, 'greeks': method}
+    unsplit = greeks(app, params)
+    shards = [greeks(app, {**params, 'path_range': path_range}) for path_range in ([0, 6000], [6000, 13000], [13000, 20000])]
+    discount_factor = np.exp(-params['risk_free_rate'] * params['time_to_maturity'])
+    merged = merge_greeks(shards, discount_factor)
+
+    assert merged['count'] == unsplit['count']
+    for name in ('delta', 'gamma', 'vega'):
+        assert merged[name]['value'] == pytest.approx(unsplit[name]['value'], rel=1e-10)
+        assert merged[name]['std_error'] == pytest.approx(unsplit[name]['std_error'], rel=1e-8)
@@ -0,0 +1,54 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+import config
+import orchestrator
+from backend import batch_impl, storage_impl
+
+
+def trades():
+    simulations = []
+    for index, option_type in enumerate(['call', 'put', 'asian_call', 'asian_put'] * 3):
+        simulations.append({'project': f'trade {index}', 'parameters': {
+            'stock_price': 100.0 + index, 'strike_price': 100.0, 'volatility': 0.2, 'risk_free_rate': 0.03,
+            'time_to_maturity': 1.0, 'num_simulations': 2000, 'num_steps': 12, 'option_type': option_type,
+        }})
+    return simulations
+
+
+@pytest.fixture
+def local_backend(workdir, monkeypatch):
+    assert config.BACKEND == 'local'
+    # Os diretórios de trabalho das tarefas ficam no diretório do teste
+    monkeypatch.setattr(batch_impl, 'TASKS_DIR', str(workdir / 'src' / 'files' / 'local' / 'tasks'))
+    os.makedirs(os.path.join(storage_impl.STORAGE_DIR, 'input'))
+    with open(os.path.join(storage_impl.STORAGE_DIR, 'input', 'portfolio.json'), 'w') as file:
+        json.dump({'seed': 3, 'simulations': trades()}, file)
+    yield workdir
+    batch_impl.delete_all_jobs()
+    batch_impl.delete_all_pools()
+
+
+@pytest.mark.parametrize('streaming, pipelined', [(False, False), (True, True)])
+def test_orchestrate_runs_end_to_end_on_the_local_backend(app, local_backend, streaming, pipelined):
+    orchestrator.orchestrate('portfolio.json', streaming=streaming, pipelined=pipelined, pool_sizing='fixed')
+
+    with open('src/files/output/monte_carlo_result_aggregated.json') as file:
+        simulations = json.load(file)['simulations']
+    assert [simulation['simulation_index'] for simulation in simulations] == list(range(len(trades())))
+    # Cada tarefa rodou o montecarlo_app em um processo próprio, com a subsequência do seed_key de cada trade
+    for simulation, trade in zip(simulations, trades()):
+        assert simulation['project'] == trade['project']
+        params = {key: value for key, value in simulation['parameters'].items() if key != 'path_group'}
+        seed_sequence = app.child_seed(np.random.SeedSequence(3), simulation['parameters'].get('path_group', simulation['seed_key']))
+        expected = app.monte_carlo_option_pricing(params, app.MAX_CHUNK_BYTES, seed_sequence)
+        assert simulation['results']['expected_option_value'] == expected['expected_option_value']
+        assert simulation['results']['option_values'] == expected['option_values']
+
+    # As partes e os resultados passaram pelos containers locais, e as tarefas deixaram sua saída
+    assert os.path.exists(os.path.join(storage_impl.STORAGE_DIR, 'output', 'monte_carlo_result_aggregated.json'))
+    task_dirs = [root for root, _, files in os.walk(batch_impl.TASKS_DIR) if 'stdout.txt' in files]
+    assert len(task_dirs) == config.NUM_PARTS
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from agreggator import merge_shard_group, merge_statistics
+
+PARAMS = {
+    'stock_price': 100.0, 'strike_price': 100.0, 'volatility': 0.2, 'risk_free_rate': 0.03,
+    'time_to_maturity': 1.0, 'num_simulations': 20000, 'num_steps': 12, 'option_type': 'asian_call',
+}
+
+
+def statistics(values):
+    return {'count': len(values), 'sum': float(values.sum()), 'm2': float(((values - values.mean())**2).sum()),
+            'min': float(values.min()), 'max': float(values.max())}
+
+
+@pytest.mark.parametrize('mean', [0.0, 1e8])
+def test_merged_statistics_equal_the_unsplit_sample(mean):
+    # Com média grande e variância pequena, a soma dos quadrados perderia todos os dígitos da variância
+    values = mean + np.random.default_rng(0).standard_normal(10001)
+    pieces = np.split(values, [1, 700, 5000, 5001])
+    merged = merge_statistics([statistics(piece) for piece in pieces])
+    expected = statistics(values)
+
+    assert merged['count'] == expected['count']
+    assert merged['sum'] == pytest.approx(expected['sum'], rel=1e-12)
+    assert merged['m2'] == pytest.approx(expected['m2'], rel=1e-9)
+    assert (merged['min'], merged['max']) == (expected['min'], expected['max'])
+
+
+@pytest.mark.parametrize('variance_reduction', [None, 'antithetic'])
+def test_merged_shards_give_the_unsplit_price(app, variance_reduction):
+    params = {**PARAMS, 'variance_reduction': variance_reduction}
+    seed_sequence = np.random.SeedSequence(21)
+
+    def price(params):
+        return app.monte_carlo_option_pricing(params, 1 << 16, seed_sequence, result_mode='statistics')
+
+    unsplit = price(params)
+    ranges = [[0, 4000], [4000, 4002], [4002, 15000], [15000, 20000]]
+    shards = [{'simulation_index': 0, 'shard_count': len(ranges), 'parameters': {**params, 'path_range': path_range},
+               'results': price({**params, 'path_range': path_range})} for path_range in ranges[::-1]]
+    merged = merge_shard_group(shards)
+
+    assert merged['parameters'] == params and 'shard_count' not in merged
+    assert merged['results']['statistics']['count'] == unsplit['statistics']['count']
+    for key in ('sum', 'm2', 'min', 'max'):
+        assert merged['results']['statistics'][key] == pytest.approx(unsplit['statistics'][key], rel=1e-10), key
+    assert merged['results']['expected_option_value'] == pytest.approx(unsplit['expected_option_value'], rel=1e-12)
+    assert merged['results']['confidence_interval'] == pytest.approx(unsplit['confidence_interval'], rel=1e-10)
@@ -0,0 +1,47 @@
+import datetime
+import json
+
+import config
+from pool_planner import plan_pool
+
+TRADE = {
+    "num_simulations": 100000,
+    "num_steps": 252,
+    "stock_price": 100,
+    "strike_price": 100,
+    "risk_free_rate": 0.03,
+    "volatility": 0.2,
+    "time_to_maturity": 1.0,
+}
+
+
+def write_input(path, option_types):
+    simulations = [{"parameters": {**TRADE, "option_type": option_type}} for option_type in option_types]
+    with open(path, 'w') as file:
+        json.dump({"simulations": simulations}, file)
+    return str(path)
+
+
+def test_european_trades_are_sized_by_a_single_step(tmp_path):
+    input_file = write_input(tmp_path / 'input.json', ['call'] * 90 + ['asian_call'] * 10)
+    plan = plan_pool(input_file, 'workload', datetime.timedelta(seconds=100), node_throughput=1e7, max_nodes=1000)
+
+    assert plan['total_path_steps'] == 90 * 100000 + 10 * 100000 * 252
+    # 2.529e8 passos a 1e7 por segundo cabem em 100 s em um nó; contando num_steps nas europeias seriam 3 nós
+    assert plan['node_count'] == 1
+
+
+def test_plan_splits_dedicated_and_low_priority_nodes(tmp_path):
+    input_file = write_input(tmp_path / 'input.json', ['asian_call'] * 400)
+    plan = plan_pool(input_file, 'workload', datetime.timedelta(seconds=100), node_throughput=1e7, max_nodes=1000, low_priority_share=0.5)
+
+    assert plan['node_count'] + plan['low_priority_node_count'] == 11
+    assert plan['low_priority_node_count'] == 5
+
+
+def test_workload_plan_has_one_part_per_task_slot(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, 'POOL_TASK_SLOTS_PER_NODE', 4)
+    input_file = write_input(tmp_path / 'input.json', ['asian_call'] * 400)
+    for pool_sizing in ('workload', 'autoscale'):
+        plan = plan_pool(input_file, pool_sizing, datetime.timedelta(seconds=100), node_throughput=1e7, max_nodes=1000)
+        assert plan['num_parts'] == plan['node_count'] * 4
@@ -0,0 +1,24 @@
+import numpy as np
+import pytest
+from scipy.stats import t as student_t
+
+PARAMS = {
+    "num_simulations": 4096,
+    "num_steps": 8,
+    "stock_price": 100,
+    "strike_price": 100,
+    "risk_free_rate": 0.03,
+    "volatility": 0.2,
+    "time_to_maturity": 1.0,
+    "option_type": "asian_call",
+    "generator": "sobol",
+}
+
+
+@pytest.mark.parametrize("scrambles", [4, 8])
+def test_sobol_confidence_interval_uses_student_t(app, scrambles):
+    result = app.monte_carlo_option_pricing({**PARAMS, "qmc_scrambles": scrambles}, seed_sequence=np.random.SeedSequence(3))
+    scramble_means = np.asarray(result["option_values"]).reshape(scrambles, -1).mean(axis=1)
+    std_error = np.std(scramble_means, ddof=1) / np.sqrt(scrambles)
+    low, high = result["confidence_interval"]
+    np.testing.assert_allclose((high - low) / 2, student_t.ppf(0.975, scrambles - 1) * std_error, rtol=1e-9)
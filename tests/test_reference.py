@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+PARAMS = {
+    "num_simulations": 2000,
+    "num_steps": 12,
+    "stock_price": 100,
+    "strike_price": 105,
+    "risk_free_rate": 0.03,
+    "volatility": 0.25,
+    "time_to_maturity": 1.0,
+}
+
+
+def monte_carlo_option_pricing_reference(params):
+    # Implementação original do app (laço por caminho e por passo), usada como referência de equivalência
+    S0 = params["stock_price"]
+    K = params["strike_price"]
+    r = params["risk_free_rate"]
+    sigma = params["volatility"]
+    T = params["time_to_maturity"]
+    num_simulations = params["num_simulations"]
+    num_steps = params["num_steps"]
+
+    dt = T / num_steps
+    discount_factor = np.exp(-r * T)
+
+    option_values = np.zeros(num_simulations)
+
+    for i in range(num_simulations):
+        prices = np.zeros(num_steps + 1)
+        prices[0] = S0
+
+        for t in range(1, num_steps + 1):
+            z = np.random.standard_normal()
+            prices[t] = prices[t-1] * np.exp((r - 0.5 * sigma**2) * dt + sigma * np.sqrt(dt) * z)
+
+        option_values[i] = max(prices[-1] - K, 0)
+
+    expected_option_value = np.mean(option_values) * discount_factor
+    std_error = np.std(option_values) / np.sqrt(num_simulations)
+    confidence_interval = (expected_option_value - 1.96 * std_error, expected_option_value + 1.96 * std_error)
+
+    return {
+        "expected_option_value": expected_option_value,
+        "confidence_interval": list(confidence_interval),
+        "option_values": option_values.tolist()
+    }
+
+
+@pytest.mark.parametrize("max_chunk_bytes", [32 * 1024 * 1024, 8 * 12 * 300])
+def test_vectorized_engine_matches_reference_loop(app, max_chunk_bytes):
+    # Com a mesma semente do gerador global, o motor vetorizado (caminhos completos, em blocos) consome as normais
+    # na mesma ordem do laço original
+    np.random.seed(0)
+    result = app.monte_carlo_option_pricing({**PARAMS, "full_paths": True}, max_chunk_bytes)
+    np.random.seed(0)
+    reference = monte_carlo_option_pricing_reference(PARAMS)
+
+    np.testing.assert_allclose(result["option_values"], reference["option_values"], rtol=1e-9)
+    np.testing.assert_allclose(result["expected_option_value"], reference["expected_option_value"], rtol=1e-9)
+    np.testing.assert_allclose(result["confidence_interval"], reference["confidence_interval"], rtol=1e-9)
@@ -0,0 +1,76 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from agreggator import aggregate_and_save
+from backend import storage_impl
+from client import split_json
+from result_cache import LocalCacheStore, ResultCache
+
+
+def trade(option_type, strike_price, stock_price=100.0):
+    return {'parameters': {
+        'stock_price': stock_price, 'strike_price': strike_price, 'volatility': 0.2, 'risk_free_rate': 0.05,
+        'time_to_maturity': 1.0, 'num_simulations': 2000, 'num_steps': 12, 'option_type': option_type,
+    }}
+
+
+@pytest.fixture
+def run(app, workdir, monkeypatch):
+    # Divide, precifica cada parte com o worker no backend local e agrega, como o orquestrador
+    monkeypatch.setenv('MONTECARLO_LOCAL_STORAGE_DIR', os.path.abspath(storage_impl.STORAGE_DIR))
+
+    def run(trades, cache=None):
+        with open('src/files/input/portfolio.json', 'w') as file:
+            json.dump({'result_mode': 'statistics', 'raw_payoffs': True, 'simulations': trades}, file)
+        result_files = []
+        for part in split_json('portfolio.json', num_parts=2, cache=cache, download=False):
+            app.process_monte_carlo_simulations(part, workers=1)
+            result_files.append(os.path.basename(part).replace('input', 'result'))
+        aggregate_and_save(result_files, cache)
+        with open('src/files/output/monte_carlo_result_aggregated.json') as file:
+            return json.load(file)['simulations']
+    return run
+
+
+def raw_payoffs(simulation):
+    reference = simulation['results']['raw_payoffs']
+    references = reference if isinstance(reference, list) else [reference]
+    arrays = []
+    for item in references:
+        path = storage_impl.get_file_from_container('temp', item['file'], f"src/files/temp/check_{item['file']}")
+        arrays.append(np.load(path)[item['offset']:item['offset'] + item['count']])
+    return np.concatenate(arrays)
+
+
+def test_seedless_input_hits_cache_after_inserting_a_trade(run, workdir):
+    trades = [trade('call', 95.0), trade('asian_put', 105.0), trade('put', 100.0, stock_price=80.0)]
+    first = run(trades, ResultCache(LocalCacheStore(str(workdir / 'cache'))))
+    first_payoffs = [raw_payoffs(simulation) for simulation in first]
+
+    # A semente é derivada do conteúdo: a mesma entrada sem seed encontra todos os resultados no cache
+    cache = ResultCache(LocalCacheStore(str(workdir / 'cache')))
+    second = run(trades, cache)
+    assert cache.report()['hits'] == 3
+    assert [simulation['results']['statistics'] for simulation in second] == [simulation['results']['statistics'] for simulation in first]
+    for simulation, payoffs in zip(second, first_payoffs):
+        np.testing.assert_array_equal(raw_payoffs(simulation), payoffs)
+
+    # Um trade novo no início desloca os simulation_index, mas não a chave dos demais
+    cache = ResultCache(LocalCacheStore(str(workdir / 'cache')))
+    third = run([trade('call', 110.0, stock_price=120.0)] + trades, cache)
+    assert cache.report()['hits'] == 3 and cache.report()['misses'] == 1
+    assert [simulation['simulation_index'] for simulation in third] == [0, 1, 2, 3]
+    assert [simulation['results']['statistics'] for simulation in third[1:]] == [simulation['results']['statistics'] for simulation in first]
+    for simulation, payoffs in zip(third[1:], first_payoffs):
+        np.testing.assert_array_equal(raw_payoffs(simulation), payoffs)
+
+
+def test_trade_result_does_not_depend_on_its_position(run):
+    trades = [trade('call', 95.0), trade('put', 100.0, stock_price=80.0)]
+    forward = run(trades)
+    backward = run(trades[::-1])
+    assert forward[0]['results']['statistics'] == backward[1]['results']['statistics']
+    assert forward[1]['results']['statistics'] == backward[0]['results']['statistics']
@@ -0,0 +1,57 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from agreggator import aggregate_and_save
+from backend import storage_impl
+
+PART = 'src/files/temp/monte_carlo_input_part_1.json'
+
+TRADES = [
+    {'option_type': 'call', 'strike_price': 95.0},
+    {'option_type': 'asian_put', 'strike_price': 105.0},
+    {'option_type': 'put', 'strike_price': 100.0, 'variance_reduction': 'antithetic'},
+]
+
+
+def parameters(trade):
+    return {
+        'stock_price': 100.0, 'volatility': 0.2, 'risk_free_rate': 0.05, 'time_to_maturity': 1.0,
+        'num_simulations': 3000, 'num_steps': 12, **trade,
+    }
+
+
+def test_statistics_mode_and_sidecar_round_trip(app, workdir, monkeypatch):
+    monkeypatch.setenv('MONTECARLO_LOCAL_STORAGE_DIR', os.path.abspath(storage_impl.STORAGE_DIR))
+    simulations = [{'simulation_index': i, 'seed_key': 100 + i, 'parameters': parameters(trade)} for i, trade in enumerate(TRADES)]
+    with open(PART, 'w') as file:
+        json.dump({'seed': 9, 'result_mode': 'statistics', 'raw_payoffs': True, 'simulations': simulations}, file)
+
+    app.process_monte_carlo_simulations(PART, workers=1)
+    aggregate_and_save([os.path.basename(PART).replace('input', 'result')])
+
+    with open('src/files/output/monte_carlo_result_aggregated.json') as file:
+        aggregated = json.load(file)['simulations']
+    assert [simulation['simulation_index'] for simulation in aggregated] == [0, 1, 2]
+    for simulation in aggregated:
+        # O mesmo trade no modo "full", com a mesma subsequência aleatória
+        seed_sequence = app.child_seed(np.random.SeedSequence(9), simulation['seed_key'])
+        full = app.monte_carlo_option_pricing(simulation['parameters'], app.MAX_CHUNK_BYTES, seed_sequence)
+        values = np.asarray(full['option_values'])
+        results = simulation['results']
+
+        assert 'option_values' not in results
+        assert results['expected_option_value'] == pytest.approx(full['expected_option_value'], rel=1e-12)
+        assert results['confidence_interval'] == pytest.approx(full['confidence_interval'], rel=1e-12)
+        statistics = results['statistics']
+        assert statistics['count'] == len(values)
+        assert statistics['sum'] == pytest.approx(values.sum(), rel=1e-12)
+        assert statistics['m2'] == pytest.approx(((values - values.mean())**2).sum(), rel=1e-9)
+        assert (statistics['min'], statistics['max']) == (values.min(), values.max())
+
+        # Os payoffs brutos vão em float32 para o .npy da parte, referenciados por offset
+        reference = results['raw_payoffs']
+        sidecar = storage_impl.get_file_from_container('temp', reference['file'], f"src/files/temp/check_{reference['file']}")
+        np.testing.assert_array_equal(np.load(sidecar)[reference['offset']:reference['offset'] + reference['count']], values.astype(np.float32))
@@ -0,0 +1,89 @@
+import json
+
+import pytest
+
+import client
+
+METADATA = {'project_name': 'portfolio', 'seed': 17, 'result_mode': 'statistics'}
+
+
+def simulations():
+    trades = []
+    for index in range(12):
+        trades.append({'project': f'trade {index}', 'parameters': {
+            'stock_price': 100.0 + index % 3, 'strike_price': 90.0 + index, 'volatility': 0.2, 'risk_free_rate': 0.03,
+            'time_to_maturity': 1.0, 'num_simulations': 1000, 'num_steps': 12,
+            'option_type': ['call', 'asian_put', 'put'][index % 3],
+        }})
+    # Um trade maior que uma parte é dividido por faixa de caminhos
+    trades[5]['parameters'] = {**trades[5]['parameters'], 'option_type': 'asian_call', 'num_simulations': 40000}
+    return trades
+
+
+def write_input(name):
+    path = f'src/files/input/{name}'
+    with open(path, 'w') as file:
+        if name.endswith('.ndjson'):
+            file.write(json.dumps(METADATA) + '\n')
+            file.writelines(json.dumps(simulation) + '\n' for simulation in simulations())
+        else:
+            json.dump({**METADATA, 'simulations': simulations()}, file, indent=2)
+    return path
+
+
+def read_parts(name):
+    parts, uploads = client.split_json_streaming(name, num_parts=4, upload=False, download=False)
+    assert uploads == []
+    contents = []
+    for part in parts:
+        with open(part) as file:
+            contents.append(json.load(file))
+    return contents
+
+
+@pytest.mark.parametrize('name', ['portfolio.json', 'portfolio.ndjson'])
+def test_parts_cover_every_simulation_once_and_keep_the_metadata(workdir, name):
+    write_input(name)
+    parts = read_parts(name)
+    assert len(parts) == 4
+
+    covered = {}
+    for part in parts:
+        assert {key: value for key, value in part.items() if key != 'simulations'} == METADATA
+        for simulation in part['simulations']:
+            params = dict(simulation['parameters'])
+            path_range = params.pop('path_range', None)
+            params.pop('path_group', None)
+            original = simulations()[simulation['simulation_index']]
+            assert params == original['parameters']
+            assert simulation['project'] == original['project']
+            covered.setdefault(simulation['simulation_index'], []).append(path_range or [0, params['num_simulations']])
+
+    assert sorted(covered) == list(range(len(simulations())))
+    for index, ranges in covered.items():
+        ranges.sort()
+        assert ranges[0][0] == 0 and ranges[-1][1] == simulations()[index]['parameters']['num_simulations']
+        assert all(previous[1] == current[0] for previous, current in zip(ranges, ranges[1:])), index
+    assert len(covered[5]) > 1
+
+
+def test_json_and_ndjson_inputs_give_the_same_parts(workdir):
+    write_input('portfolio.json')
+    write_input('portfolio.ndjson')
+    assert read_parts('portfolio.json') == read_parts('portfolio.ndjson')
+
+
+@pytest.mark.parametrize('buffer_size', [1, 7, 1 << 16])
+def test_truncated_json_raises_a_decode_error_with_its_offset(tmp_path, buffer_size):
+    text = json.dumps({**METADATA, 'simulations': simulations()[:2]}, indent=1)
+    path = tmp_path / 'truncated.json'
+    for end in range(len(text)):
+        path.write_text(text[:end])
+        with pytest.raises(json.JSONDecodeError) as error:
+            list(client.iter_json_simulations(str(path), {}, buffer_size))
+        assert error.value.pos <= end
+
+    path.write_text(text[:text.rindex(']') + 1])
+    with pytest.raises(json.JSONDecodeError, match=f'char {text.rindex("]") + 1}') as error:
+        list(client.iter_json_simulations(str(path), {}, buffer_size))
+    assert error.value.pos == text.rindex(']') + 1
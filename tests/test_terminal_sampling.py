@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+from scipy.stats import norm
+
+PARAMS = {
+    "num_simulations": 200000,
+    "num_steps": 252,
+    "stock_price": 100,
+    "strike_price": 105,
+    "risk_free_rate": 0.03,
+    "volatility": 0.25,
+    "time_to_maturity": 1.0,
+}
+
+
+def black_scholes(S, K, sigma, r, T, option_type):
+    d1 = (np.log(S / K) + (r + 0.5 * sigma**2) * T) / (sigma * np.sqrt(T))
+    d2 = d1 - sigma * np.sqrt(T)
+    if option_type == "call":
+        return S * norm.cdf(d1) - K * np.exp(-r * T) * norm.cdf(d2)
+    return K * np.exp(-r * T) * norm.cdf(-d2) - S * norm.cdf(-d1)
+
+
+def price(app, params, seed=5):
+    return app.monte_carlo_option_pricing(params, seed_sequence=np.random.SeedSequence(seed), result_mode="statistics")
+
+
+@pytest.mark.parametrize("option_type", ["call", "put"])
+def test_exact_terminal_sampling_matches_black_scholes(app, option_type):
+    result = price(app, {**PARAMS, "option_type": option_type})
+    low, high = result["confidence_interval"]
+    std_error = (high - low) / (2 * 1.96)
+    expected = black_scholes(100, 105, 0.25, 0.03, 1.0, option_type)
+    assert abs(result["expected_option_value"] - expected) < 4 * std_error
+
+
+def test_european_result_does_not_depend_on_num_steps(app):
+    # S_T é amostrado exatamente em um passo: num_steps não muda nem as amostras
+    params = {**PARAMS, "num_simulations": 5000, "option_type": "call"}
+    assert price(app, {**params, "num_steps": 1}) == price(app, params)
+
+
+@pytest.mark.parametrize("extra", [{"option_type": "asian_call"}, {"option_type": "call", "full_paths": True}])
+def test_path_dependent_or_full_path_requests_walk_every_step(app, extra):
+    params = {**PARAMS, "num_simulations": 5000, **extra}
+    assert not app.is_path_independent(params)
+    assert price(app, {**params, "num_steps": 1}) != price(app, {**params, "num_steps": 12})
@@ -0,0 +1,90 @@
+import datetime
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import tracing
+from azure_impl import batch_impl
+
+START = datetime.datetime(2024, 1, 1, 12, 0, tzinfo=datetime.timezone.utc)
+
+
+def at(seconds):
+    return START + datetime.timedelta(seconds=seconds)
+
+
+@pytest.fixture
+def trace(tmp_path):
+    tracing.start_trace('test-run')
+
+    def save():
+        with open(tracing.save_trace(str(tmp_path))) as file:
+            return json.load(file)
+    yield save
+    tracing.TRACE = None
+
+
+def spans(chrome):
+    return {event['name']: event for event in chrome['traceEvents'] if event['ph'] == 'X'}
+
+
+def lanes(chrome):
+    return {(event['pid'], event['tid']): event['args']['name'] for event in chrome['traceEvents'] if event['name'] == 'thread_name'}
+
+
+@tracing.traced('upload', 'container_name', 'file_path')
+def upload(container_name, file_path, size=0):
+    return size
+
+
+def test_client_spans_nest_and_record_their_arguments(trace):
+    with tracing.span('split', 'split', parts=4):
+        assert upload('temp', 'part_1.json', size=3) == 3
+
+    chrome = trace()
+    assert chrome['otherData'] == {'run_id': 'test-run'}
+    split, uploaded = spans(chrome)['split'], spans(chrome)['upload']
+    assert (split['cat'], split['args']) == ('split', {'parts': 4})
+    assert (uploaded['cat'], uploaded['args']) == ('upload', {'container_name': 'temp', 'file_path': 'part_1.json'})
+    # O envio está dentro da divisão, na mesma lane do cliente
+    assert split['ts'] <= uploaded['ts'] and uploaded['ts'] + uploaded['dur'] <= split['ts'] + split['dur']
+    assert split['pid'] == uploaded['pid'] == 1 and split['tid'] == uploaded['tid']
+
+
+def test_nothing_is_recorded_without_a_trace(tmp_path):
+    assert tracing.TRACE is None
+    with tracing.span('split', 'split'):
+        assert upload('temp', 'part_1.json') == 0
+    assert tracing.save_trace(str(tmp_path)) is None
+
+
+def test_batch_task_and_node_times_become_node_spans(trace, monkeypatch):
+    tasks = [
+        SimpleNamespace(id='Task-1-0', creation_time=at(0), node_info=SimpleNamespace(node_id='node-a'),
+                        execution_info=SimpleNamespace(start_time=at(5), end_time=at(65), exit_code=0)),
+        # Tarefa de outra execução do mesmo job, fora do trace
+        SimpleNamespace(id='Task-0-0', creation_time=at(0), node_info=None,
+                        execution_info=SimpleNamespace(start_time=at(1), end_time=at(2), exit_code=0)),
+    ]
+    nodes = [SimpleNamespace(id='node-a', allocation_time=at(-120),
+                             start_task_info=SimpleNamespace(state='completed', start_time=at(-100), end_time=at(-40)))]
+    monkeypatch.setattr(batch_impl, 'BATCH_CLIENT', SimpleNamespace(
+        task=SimpleNamespace(list=lambda job_id, task_list_options: tasks),
+        compute_node=SimpleNamespace(list=lambda pool_id, compute_node_list_options: nodes),
+    ))
+
+    report = batch_impl.report_start_task_durations('pool')
+    batch_impl.trace_task_execution('job', ['Task-1-0'])
+
+    assert report == [{'node_id': 'node-a', 'state': 'completed', 'seconds': 60.0}]
+    chrome = trace()
+    events = spans(chrome)
+    assert set(events) == {'node_allocation', 'start_task', 'queued', 'compute'}
+    expected = {'node_allocation': (-120, 20), 'start_task': (-100, 60), 'queued': (0, 5), 'compute': (5, 60)}
+    for name, (start, duration) in expected.items():
+        assert events[name]['ts'] == pytest.approx(at(start).timestamp() * 1e6)
+        assert events[name]['dur'] == pytest.approx(duration * 1e6)
+        assert events[name]['pid'] == 2
+        assert lanes(chrome)[(2, events[name]['tid'])] == 'node-a'
+    assert events['compute']['args'] == {'task_id': 'Task-1-0', 'exit_code': 0}
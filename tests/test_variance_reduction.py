@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+PARAMS = {
+    "num_simulations": 20000,
+    "num_steps": 12,
+    "stock_price": 100,
+    "strike_price": 100,
+    "risk_free_rate": 0.03,
+    "volatility": 0.2,
+    "time_to_maturity": 1.0,
+}
+
+
+@pytest.mark.parametrize("option_type", ["call", "put"])
+def test_black_scholes_control_is_rejected_for_european_payoffs(app, option_type):
+    params = {**PARAMS, "option_type": option_type, "variance_reduction": "control_variate_black_scholes"}
+    with pytest.raises(ValueError):
+        app.monte_carlo_option_pricing(params, seed_sequence=np.random.SeedSequence(1))
+
+
+def test_black_scholes_control_keeps_a_monte_carlo_error_for_asian_options(app):
+    params = {**PARAMS, "option_type": "asian_call", "variance_reduction": "control_variate_black_scholes"}
+    result = app.monte_carlo_option_pricing(params, seed_sequence=np.random.SeedSequence(1))
+    low, high = result["confidence_interval"]
+    assert 0 < high - low
+    assert 1 < result["variance_reduction_factor"] < 1e3
+
+
+def test_stock_control_on_european_call_reduces_variance(app):
+    params = {**PARAMS, "option_type": "call", "variance_reduction": "control_variate_stock"}
+    result = app.monte_carlo_option_pricing(params, seed_sequence=np.random.SeedSequence(1))
+    price = app.black_scholes_price(100, 100, 0.03, 0.2, 1.0)
+    low, high = result["confidence_interval"]
+    assert low < price < high
+    assert 1 < result["variance_reduction_factor"] < 1e3
@@ -0,0 +1,85 @@
+import hashlib
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+import zipfile
+from types import SimpleNamespace
+
+import pytest
+
+APP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src', 'src-montecarlo-app')
+
+
+@pytest.fixture
+def apppackage(monkeypatch):
+    # O script do pacote importa o config do diretório do app, não o do cliente
+    modules = {}
+    for name in ('config', 'montecarlo_app_apppackage'):
+        spec = importlib.util.spec_from_file_location(name, os.path.join(APP_DIR, f'{name}.py'))
+        modules[name] = importlib.util.module_from_spec(spec)
+        monkeypatch.setitem(sys.modules, name, modules[name])
+        spec.loader.exec_module(modules[name])
+    return modules['montecarlo_app_apppackage']
+
+
+def fake_wheel(path, module, source):
+    with zipfile.ZipFile(path, 'w') as wheel:
+        wheel.writestr(f'{module}.py', source)
+
+
+def build(apppackage, wheelhouse_dir, monkeypatch):
+    # pip download é substituído por wheels locais, baixadas para o diretório de destino
+    def pip_download(command, check):
+        assert command[command.index('--platform') + 1] == apppackage.config.RUNTIME_PLATFORM
+        assert command[command.index('--python-version') + 1] == apppackage.config.RUNTIME_PYTHON_VERSION
+        dest = command[command.index('--dest') + 1]
+        fake_wheel(os.path.join(dest, 'numpy-1.0-py3-none-any.whl'), 'fake_numpy', 'VALUE = 1\n')
+        fake_wheel(os.path.join(dest, 'scipy-1.0-py3-none-any.whl'), 'fake_scipy', 'VALUE = 2\n')
+
+    monkeypatch.setattr(apppackage, 'subprocess', SimpleNamespace(run=pip_download))
+    return apppackage.build_wheelhouse(str(wheelhouse_dir))
+
+
+def setup_runtime(package_dir, shared_dir):
+    env = {**os.environ, 'AZ_BATCH_NODE_SHARED_DIR': str(shared_dir)}
+    return subprocess.run(['bash', os.path.join(APP_DIR, 'setup_runtime.sh'), str(package_dir)], env=env, capture_output=True, text=True)
+
+
+def test_wheelhouse_checksums_match_the_wheels(apppackage, tmp_path, monkeypatch):
+    wheelhouse = tmp_path / 'wheelhouse'
+    wheelhouse.mkdir()
+    # Wheels de builds anteriores são removidas antes do download
+    fake_wheel(wheelhouse / 'stale-0.1-py3-none-any.whl', 'stale', '')
+
+    files = build(apppackage, wheelhouse, monkeypatch)
+
+    assert [os.path.basename(path) for path in files] == ['numpy-1.0-py3-none-any.whl', 'scipy-1.0-py3-none-any.whl', 'SHA256SUMS']
+    lines = (wheelhouse / 'SHA256SUMS').read_text().splitlines()
+    assert lines == [f"{hashlib.sha256(open(path, 'rb').read()).hexdigest()}  {os.path.basename(path)}" for path in files[:-1]]
+
+
+def test_runtime_is_installed_once_and_verified(apppackage, tmp_path, monkeypatch):
+    package_dir = tmp_path / 'package'
+    (package_dir / 'wheelhouse').mkdir(parents=True)
+    build(apppackage, package_dir / 'wheelhouse', monkeypatch)
+
+    shared_dir = tmp_path / 'shared'
+    shared_dir.mkdir()
+    first = setup_runtime(package_dir, shared_dir)
+    assert first.returncode == 0, first.stderr
+    assert json.loads((shared_dir / 'montecarlo-runtime-setup.json').read_text())['runtime'] == 'installed'
+    assert (shared_dir / 'montecarlo-runtime' / 'site-packages' / 'fake_numpy.py').exists()
+
+    # O nó que reinicia encontra o runtime com o mesmo checksum
+    second = setup_runtime(package_dir, shared_dir)
+    assert second.returncode == 0, second.stderr
+    assert json.loads((shared_dir / 'montecarlo-runtime-setup.json').read_text())['runtime'] == 'cached'
+
+    # Em um nó novo, uma wheel que não confere com o SHA256SUMS interrompe a instalação
+    fake_wheel(package_dir / 'wheelhouse' / 'scipy-1.0-py3-none-any.whl', 'fake_scipy', 'VALUE = 3\n')
+    fresh_dir = tmp_path / 'fresh'
+    fresh_dir.mkdir()
+    assert setup_runtime(package_dir, fresh_dir).returncode != 0
+    assert not (fresh_dir / 'montecarlo-runtime').exists()
@@ -0,0 +1,43 @@
+import json
+import os
+
+import pytest
+
+PART = 'src/files/temp/monte_carlo_input_part_1.json'
+
+BASE = {
+    'stock_price': 100.0, 'strike_price': 100.0, 'volatility': 0.2, 'risk_free_rate': 0.03,
+    'time_to_maturity': 1.0, 'num_simulations': 4096, 'num_steps': 8,
+}
+
+TRADES = [
+    {**BASE, 'option_type': 'call', 'variance_reduction': 'antithetic'},
+    # Grande o bastante para ter mais blocos que processos: os blocos são distribuídos entre os processos
+    {**BASE, 'option_type': 'asian_call', 'num_simulations': 100000, 'num_steps': 256},
+    {**BASE, 'option_type': 'asian_put', 'num_simulations': 100000, 'num_steps': 256, 'variance_reduction': 'antithetic'},
+    {**BASE, 'option_type': 'asian_call', 'generator': 'sobol', 'qmc_scrambles': 4},
+    {**BASE, 'option_type': 'put', 'strike_price': 95.0},
+]
+
+
+@pytest.fixture
+def run(app, workdir, monkeypatch):
+    monkeypatch.setenv('MONTECARLO_LOCAL_STORAGE_DIR', str(workdir / 'storage'))
+
+    def run(workers):
+        simulations = [{'simulation_index': index, 'seed_key': 7 * index + 1, 'parameters': params} for index, params in enumerate(TRADES)]
+        with open(PART, 'w') as file:
+            json.dump({'seed': 2024, 'result_mode': 'statistics', 'raw_payoffs': True, 'simulations': simulations}, file)
+        app.process_monte_carlo_simulations(PART, workers=workers)
+        with open(PART.replace('input', 'result'), 'rb') as result, open(PART.replace('input', 'result').replace('.json', '.npy'), 'rb') as sidecar:
+            return result.read(), sidecar.read()
+    return run
+
+
+def test_results_do_not_depend_on_the_number_of_workers(app, run):
+    assert all(app.is_chunk_parallel(params, 4) for params in TRADES[1:3])
+    assert not any(app.is_chunk_parallel(params, 2) for params in TRADES[:1] + TRADES[3:])
+
+    single = run(workers=1)
+    for workers in (2, 4):
+        assert run(workers) == single, workers